@@ -0,0 +1,213 @@
+"""
+Benchmark do parser de parcelas (src/finance_analyzer.analyze_parcelas)
+Compara o parser atual (uma passada por linha, padrões pré-compilados) com a implementação
+anterior (cinco buscas por linha e setlocale a cada parcela) sobre as descrições de
+'ACORDOS - JUNHO.csv', replicadas até o tamanho pedido. Antes de medir, confere que os
+dois produzem o mesmo resultado para todas as descrições.
+
+Uso: python benchmark_parcelas.py [--arquivo "ACORDOS - JUNHO.csv"] [--copias 500] [--repeticoes 3] [--processos 4]
+"""
+
+import argparse
+import locale
+import os
+import re
+import time
+from datetime import datetime
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from src.finance_analyzer import _to_float, analyze_parcelas, analyze_parcelas_batch
+
+
+# Linhas no formato usado pela planilha (e pela exibição do relatório) com honorários,
+# líquido e pagamento, que não aparecem no CSV de junho
+EXEMPLOS_ADICIONAIS = [
+    "1ª parcela: R$ 1.000,00 - R$ 300,00 (honorários) = R$ 700,00 até 10/06/2025 - Pago em 12/06/2025\n"
+    "2ª parcela: R$ 1.000,00 - R$ 300,00 (honorários) - R$ 50,00 (honorários adicionais) = R$ 650,00 até 10/07/2025",
+    "1ª parcela de R$ 2.500,00 até o dia 05/06/2025, realizado em 05/06/2025\n"
+    "2ª parcela de R$ 2.500,00 até dia 05/07/2025 pix 04/07/2025",
+    "6 parcelas de R$ 2.000,00, sendo vencível a primeira dia 10/06/2025 e as demais no mesmo dia dos meses subsequentes",
+]
+
+
+# --- Implementação anterior (referência) ---
+
+def legacy_extract_parcela_info(texto_parcela):
+    try:
+        locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
+    except:
+        pass
+
+    numero_pattern = re.search(r'(\d+)[ªº°]?\s*parcela', texto_parcela, re.IGNORECASE)
+    data_pattern = re.search(r'até\s*(?:o\s+dia\s+|dia\s+)?(\d{2}\/\d{2}\/\d{4})', texto_parcela, re.IGNORECASE)
+    realizado_pattern = re.search(r'(?:realizado|reliazado|pago|efetuado|pix)\s*(?:em)?\s*(\d{2}\/\d{2}\/\d{4})', texto_parcela, re.IGNORECASE)
+
+    valores = re.findall(r'R\$\s*([\d.,]*\d)', texto_parcela)
+    valores_float = [_to_float(v) for v in valores]
+
+    parcela_info = {
+        'numero': int(numero_pattern.group(1)) if numero_pattern else None,
+        'valor_acordo': None, 'valor_honorarios': None, 'valor_honorarios_adicionais': [], 'valor_liquido': None,
+        'data_vencimento': datetime.strptime(data_pattern.group(1), '%d/%m/%Y').date() if data_pattern else None,
+        'status': 'Pendente', 'data_pagamento': None
+    }
+
+    if realizado_pattern:
+        parcela_info['status'] = 'Pago'
+        if realizado_pattern.group(1):
+            try:
+                parcela_info['data_pagamento'] = datetime.strptime(realizado_pattern.group(1), '%d/%m/%Y').date()
+            except (ValueError, IndexError):
+                pass
+
+    if valores_float:
+        parcela_info['valor_acordo'] = valores_float[0]
+
+        liquido_match = re.search(r'=\s*R\$\s*([\d.,]*\d)', texto_parcela)
+        if liquido_match:
+            parcela_info['valor_liquido'] = _to_float(liquido_match.group(1))
+
+        honorarios_candidatos = []
+        if len(valores_float) > 1:
+            outros_valores = valores_float[1:]
+            if parcela_info['valor_liquido'] is not None:
+                honorarios_candidatos = [v for v in outros_valores if v != parcela_info['valor_liquido']]
+            else:
+                honorarios_candidatos = outros_valores
+
+        if honorarios_candidatos:
+            parcela_info['valor_honorarios'] = honorarios_candidatos[0]
+            if len(honorarios_candidatos) > 1:
+                parcela_info['valor_honorarios_adicionais'] = honorarios_candidatos[1:]
+
+        if parcela_info['valor_liquido'] is None and parcela_info['valor_acordo'] and parcela_info['valor_honorarios']:
+            total_honorarios = parcela_info['valor_honorarios'] + sum(parcela_info['valor_honorarios_adicionais'])
+            parcela_info['valor_liquido'] = parcela_info['valor_acordo'] - total_honorarios
+
+    return parcela_info
+
+
+def legacy_parse_summary_format(texto):
+    try:
+        texto_limpo = texto.replace('\n', ' ').replace('\r', ' ')
+
+        summary_pattern = re.search(r'(\d+)\s*parcelas\s+de\s+R\$\s*([\d.,]*\d)', texto_limpo, re.IGNORECASE)
+        if not summary_pattern:
+            return []
+
+        date_pattern = re.search(r'venc[íi]vel\s+a\s+primeira\s*(?:dia)?\s*(\d{2}\/\d{2}\/\d{4})', texto_limpo, re.IGNORECASE)
+        if not date_pattern:
+            return []
+
+        num_parcelas = int(summary_pattern.group(1))
+        valor = _to_float(summary_pattern.group(2))
+        data_inicio = datetime.strptime(date_pattern.group(1), '%d/%m/%Y').date()
+
+        parcelas = []
+        for i in range(num_parcelas):
+            parcelas.append({
+                'numero': i + 1,
+                'valor_acordo': valor,
+                'valor_honorarios': None,
+                'valor_honorarios_adicionais': [],
+                'valor_liquido': None,
+                'data_vencimento': data_inicio + relativedelta(months=i),
+                'status': 'Pendente',
+                'data_pagamento': None
+            })
+        return parcelas
+    except (ValueError, IndexError):
+        return []
+
+
+def legacy_analyze_parcelas(texto):
+    if not isinstance(texto, str):
+        return []
+
+    parcelas = []
+    for linha in texto.split('\n'):
+        linha_strip = linha.strip()
+        if not linha_strip:
+            continue
+
+        if 'parcela' in linha_strip.lower():
+            parcela_info = legacy_extract_parcela_info(linha_strip)
+            if parcela_info.get('numero') and parcela_info.get('data_vencimento'):
+                parcelas.append(parcela_info)
+
+    if parcelas:
+        parcelas.sort(key=lambda x: x['numero'])
+        return parcelas
+
+    parcelas_resumo = legacy_parse_summary_format(texto)
+    if parcelas_resumo:
+        return parcelas_resumo
+
+    return []
+
+
+# --- Benchmark ---
+
+def carregar_descricoes(filepath, copias):
+    """Descrições do CSV (mais os exemplos adicionais) replicadas; cada cópia muda os centavos dos valores"""
+    df = pd.read_csv(filepath, header=1)
+    base = [texto for texto in df['PARCELAS DESCRITIVAS'] if isinstance(texto, str)] + EXEMPLOS_ADICIONAIS
+
+    descricoes = []
+    for copia in range(copias):
+        centavos = f"{copia % 100:02d}"
+        descricoes.extend(re.sub(r'(R\$\s*[\d.]+),\d{2}', rf'\g<1>,{centavos}', texto) for texto in base)
+    return descricoes
+
+
+def medir(funcao, descricoes, repeticoes):
+    """Menor tempo (s) entre as repetições para analisar todas as descrições"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for texto in descricoes:
+            funcao(texto)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do parser de parcelas")
+    parser.add_argument("--arquivo", default="ACORDOS - JUNHO.csv")
+    parser.add_argument("--copias", type=int, default=500)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--processos", type=int, default=0, help="mede também analyze_parcelas_batch com N processos")
+    args = parser.parse_args()
+
+    descricoes = carregar_descricoes(args.arquivo, args.copias)
+    linhas = sum(len(texto.split('\n')) for texto in descricoes)
+
+    divergentes = [texto for texto in descricoes if analyze_parcelas(texto) != legacy_analyze_parcelas(texto)]
+    if divergentes:
+        print(f"ATENÇÃO: {len(divergentes)} descrições com resultado diferente. Primeira:\n{divergentes[0]}")
+        return
+
+    tempo_anterior = medir(legacy_analyze_parcelas, descricoes, args.repeticoes)
+    tempo_atual = medir(analyze_parcelas, descricoes, args.repeticoes)
+
+    print(f"Descrições: {len(descricoes)} ({linhas} linhas) · resultados idênticos")
+    print(f"Implementação anterior: {tempo_anterior:.3f}s ({tempo_anterior / len(descricoes) * 1e6:.1f} µs/descrição)")
+    print(f"Parser atual:           {tempo_atual:.3f}s ({tempo_atual / len(descricoes) * 1e6:.1f} µs/descrição)")
+    print(f"Ganho: {tempo_anterior / tempo_atual:.1f}x")
+
+    if args.processos > 1:
+        # Lote inteiro em um pool de processos novo a cada repetição (criação do pool incluída)
+        if analyze_parcelas_batch(descricoes, workers=args.processos, min_parallel=0) != [analyze_parcelas(texto) for texto in descricoes]:
+            print("ATENÇÃO: resultado do modo paralelo diferente do sequencial")
+            return
+        inicio = time.perf_counter()
+        analyze_parcelas_batch(descricoes, workers=args.processos, min_parallel=0)
+        tempo_paralelo = time.perf_counter() - inicio
+        processos = min(args.processos, os.cpu_count() or 1)
+        print(f"Parser atual, {processos} processo(s): {tempo_paralelo:.3f}s · ganho sobre o sequencial: {tempo_atual / tempo_paralelo:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
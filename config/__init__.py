@@ -2,6 +2,6 @@
 Configurações do sistema JusGestante
 """
 
-from .funis_config import FunilConfig, Stage, Category
+from .funis_config import FunilConfig, FunilRegistry, Stage, Category
 
-__all__ = ['FunilConfig', 'Stage', 'Category'] 
\ No newline at end of file
+__all__ = ['FunilConfig', 'FunilRegistry', 'Stage', 'Category'] 
\ No newline at end of file
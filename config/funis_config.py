@@ -4,12 +4,34 @@ Seguindo Object Calisthenics: encapsulamento de tipos primitivos e evitando núm
 """
 
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Mapping, Optional, Tuple
 
 
-@dataclass
-class Stage:
+SEMANTIC_WON = "S"
+SEMANTIC_LOST = "F"
+
+
+class _FrozenSlots:
+    """
+    Base das dataclasses congeladas com __slots__ declarado à mão (dataclass(slots=True)
+    exige Python 3.10+). O pickle e o copy padrão restauram os slots com setattr, o que a
+    dataclass congelada recusa, então o estado vai e volta como tupla
+    """
+    __slots__ = ()
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
+
+
+@dataclass(frozen=True)
+class Stage(_FrozenSlots):
     """Representa um estágio do funil"""
+    __slots__ = ('id', 'stage_id', 'stage_name', 'sort_order', 'semantics', 'semantics_description')
     id: int
     stage_id: str
     stage_name: str
@@ -18,14 +40,45 @@ class Stage:
     semantics_description: str
 
 
-@dataclass
-class Category:
+@dataclass(frozen=True)
+class Category(_FrozenSlots):
     """Representa uma categoria/funil do Bitrix24"""
+    __slots__ = ('category_id', 'category_name', 'total_stages', 'description', 'stages')
     category_id: int
     category_name: str
     total_stages: int
     description: str
-    stages: List[Stage]
+    stages: Tuple[Stage, ...]
+
+
+@dataclass(frozen=True)
+class FunilRegistry(_FrozenSlots):
+    """Funis e estágios indexados para consultas O(1); imutável e montado uma única vez"""
+    __slots__ = ('categories', 'categories_by_id', 'stages_by_id', 'stage_names_by_category',
+                 'won_stage_ids', 'lost_stage_ids')
+    categories: Mapping[str, Category]
+    categories_by_id: Mapping[int, Category]
+    stages_by_id: Mapping[str, Stage]
+    stage_names_by_category: Mapping[int, Tuple[str, ...]]
+    won_stage_ids: FrozenSet[str]
+    lost_stage_ids: FrozenSet[str]
+
+    @classmethod
+    def build(cls, categories: Dict[str, Category]) -> "FunilRegistry":
+        all_stages = [stage for category in categories.values() for stage in category.stages]
+        return cls(
+            categories=MappingProxyType(dict(categories)),
+            categories_by_id=MappingProxyType({category.category_id: category for category in categories.values()}),
+            stages_by_id=MappingProxyType({stage.stage_id: stage for stage in all_stages}),
+            stage_names_by_category=MappingProxyType({
+                category.category_id: tuple(dict.fromkeys(
+                    stage.stage_name for stage in sorted(category.stages, key=lambda stage: stage.sort_order)
+                ))
+                for category in categories.values()
+            }),
+            won_stage_ids=frozenset(stage.stage_id for stage in all_stages if stage.semantics == SEMANTIC_WON),
+            lost_stage_ids=frozenset(stage.stage_id for stage in all_stages if stage.semantics == SEMANTIC_LOST)
+        )
 
 
 class FunilConfig:
@@ -39,9 +92,9 @@ class FunilConfig:
     ENTREVISTA_ID = 11
     
     @classmethod
-    def get_comercial_config(cls) -> Category:
-        """Retorna configuração do funil comercial"""
-        stages = [
+    def _build_comercial_config(cls) -> Category:
+        """Monta a configuração do funil comercial"""
+        stages = (
             Stage(101, "NEW", "EM ESPERA DE ATENDIMENTO", 10, None, "Neutro"),
             Stage(103, "PREPARATION", "NÃO INTERAGIU", 20, None, "Neutro"),
             Stage(105, "PREPAYMENT_INVOICE", "QUEBRA NA COMUNICAÇÃO", 30, None, "Neutro"),
@@ -56,7 +109,7 @@ class FunilConfig:
             Stage(111, "WON", "NEGÓCIO FECHADO", 120, "S", "Sucesso"),
             Stage(113, "LOSE", "OUTROS ADVOGADOS", 130, "F", "Falha"),
             Stage(115, "APOLOGY", "NÃO HÁBIL", 140, "F", "Falha")
-        ]
+        )
         
         return Category(
             category_id=cls.COMERCIAL_ID,
@@ -67,9 +120,9 @@ class FunilConfig:
         )
     
     @classmethod
-    def get_tramites_config(cls) -> Category:
-        """Retorna configuração do funil de trâmites administrativos"""
-        stages = [
+    def _build_tramites_config(cls) -> Category:
+        """Monta a configuração do funil de trâmites administrativos"""
+        stages = (
             Stage(186, "C2:NEW", "FILA", 10, None, "Neutro"),
             Stage(188, "C2:PREPARATION", "PENDENTE DOCUMENTOS", 20, None, "Neutro"),
             Stage(190, "C2:PREPAYMENT_INVOICE", "PENDENTE FORMALIZAÇÃO DE CÁLCULO", 30, None, "Neutro"),
@@ -78,7 +131,7 @@ class FunilConfig:
             Stage(284, "C2:UC_U7A8AF", "REVERSÃO", 60, None, "Neutro"),
             Stage(196, "C2:WON", "PROTOCOLADO COM SUCESSO", 70, "S", "Sucesso"),
             Stage(198, "C2:LOSE", "CANCELAMENTO", 80, "F", "Falha")
-        ]
+        )
         
         return Category(
             category_id=cls.TRAMITES_ID,
@@ -89,9 +142,9 @@ class FunilConfig:
         )
     
     @classmethod
-    def get_audiencia_config(cls) -> Category:
-        """Retorna configuração do funil de audiências"""
-        stages = [
+    def _build_audiencia_config(cls) -> Category:
+        """Monta a configuração do funil de audiências"""
+        stages = (
             Stage(218, "C4:NEW", "PEND. HORÁRIO E LOCAL", 10, None, "Neutro"),
             Stage(244, "C4:UC_K7MNY3", "CLIENTE AVISADO", 20, None, "Neutro"),
             Stage(220, "C4:PREPARATION", "1º AUDIÊNCIA MARCADA", 30, None, "Neutro"),
@@ -103,7 +156,7 @@ class FunilConfig:
             Stage(230, "C4:LOSE", "RECURSO", 90, "F", "Falha"),
             Stage(301, "C4:UC_PP1J4N", "CANCELADOS", 100, "F", "Falha"),
             Stage(305, "C4:UC_QK3BDP", "SENTENÇA PROCEDENTE", 110, "F", "Falha")
-        ]
+        )
         
         return Category(
             category_id=cls.AUDIENCIA_ID,
@@ -114,9 +167,9 @@ class FunilConfig:
         )
         
     @classmethod
-    def get_entrevista_config(cls) -> Category:
-        """Retorna configuração do funil de entrevista"""
-        stages = [
+    def _build_entrevista_config(cls) -> Category:
+        """Monta a configuração do funil de entrevista"""
+        stages = (
             Stage(313, "C11:NEW", "ENTREVISTA PENDENTE", 10, None, "Neutro"),
             Stage(329, "C11:UC_RA8DBB", "ENTREVISTA AGENDADA", 20, None, "Neutro"),
             Stage(331, "C11:UC_7TNBPV", "ENTREVISTA REALIZADA", 30, None, "Neutro"),
@@ -126,7 +179,7 @@ class FunilConfig:
             Stage(325, "C11:LOSE", "APENAS AUXILO", 70, "F", "Falha"),
             Stage(339, "C11:UC_ASF49M", "RECUSADO", 80, "F", "Falha"),
             Stage(341, "C11:UC_VDDDMG", "DESQUALIFICADO", 90, "F", "Falha"),
-        ]
+        )
         
         return Category(
             category_id=cls.ENTREVISTA_ID,
@@ -137,22 +190,66 @@ class FunilConfig:
         )
     
     @classmethod
-    def get_all_categories(cls) -> Dict[str, Category]:
+    def _build_registry(cls) -> FunilRegistry:
+        return FunilRegistry.build({
+            "COMERCIAL": cls._build_comercial_config(),
+            "TRAMITES": cls._build_tramites_config(),
+            "AUDIENCIA": cls._build_audiencia_config(),
+            "ENTREVISTA": cls._build_entrevista_config()
+        })
+    
+    @classmethod
+    def registry(cls) -> FunilRegistry:
+        """Registro único dos funis, montado na importação do módulo"""
+        return _REGISTRY
+    
+    @classmethod
+    def get_comercial_config(cls) -> Category:
+        """Retorna configuração do funil comercial"""
+        return _REGISTRY.categories_by_id[cls.COMERCIAL_ID]
+    
+    @classmethod
+    def get_tramites_config(cls) -> Category:
+        """Retorna configuração do funil de trâmites administrativos"""
+        return _REGISTRY.categories_by_id[cls.TRAMITES_ID]
+    
+    @classmethod
+    def get_audiencia_config(cls) -> Category:
+        """Retorna configuração do funil de audiências"""
+        return _REGISTRY.categories_by_id[cls.AUDIENCIA_ID]
+    
+    @classmethod
+    def get_entrevista_config(cls) -> Category:
+        """Retorna configuração do funil de entrevista"""
+        return _REGISTRY.categories_by_id[cls.ENTREVISTA_ID]
+    
+    @classmethod
+    def get_all_categories(cls) -> Mapping[str, Category]:
         """Retorna todas as categorias disponíveis"""
-        return {
-            "COMERCIAL": cls.get_comercial_config(),
-            "TRAMITES": cls.get_tramites_config(),
-            "AUDIENCIA": cls.get_audiencia_config(),
-            "ENTREVISTA": cls.get_entrevista_config()
-        }
+        return _REGISTRY.categories
     
     @classmethod
     def get_category_by_id(cls, category_id: int) -> Optional[Category]:
         """Retorna categoria por ID"""
-        category_map = {
-            cls.COMERCIAL_ID: cls.get_comercial_config(),
-            cls.TRAMITES_ID: cls.get_tramites_config(),
-            cls.AUDIENCIA_ID: cls.get_audiencia_config(),
-            cls.ENTREVISTA_ID: cls.get_entrevista_config()
-        }
-        return category_map.get(category_id) 
\ No newline at end of file
+        return _REGISTRY.categories_by_id.get(category_id)
+    
+    @classmethod
+    def get_stage(cls, stage_id: str) -> Optional[Stage]:
+        """Retorna o estágio pelo STAGE_ID (os IDs são únicos entre os funis)"""
+        return _REGISTRY.stages_by_id.get(stage_id)
+    
+    @classmethod
+    def get_stage_names(cls, category_id: int) -> Tuple[str, ...]:
+        """Nomes dos estágios do funil, na ordem do funil e sem repetição"""
+        return _REGISTRY.stage_names_by_category.get(category_id, ())
+    
+    @classmethod
+    def is_won_stage(cls, stage_id: str) -> bool:
+        return stage_id in _REGISTRY.won_stage_ids
+    
+    @classmethod
+    def is_lost_stage(cls, stage_id: str) -> bool:
+        return stage_id in _REGISTRY.lost_stage_ids
+
+
+_REGISTRY = FunilConfig._build_registry()
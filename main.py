@@ -7,6 +7,8 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 sys.path.append(os.path.join(os.path.dirname(__file__), 'config'))
 
 from src.data_service import DataService
+from src.refresh_scheduler import get_background_refresher
+from src.instrumentation import finish_trace, sampling_requested, start_trace
 from config.funis_config import FunilConfig
 
 # --- Configuração de Roteamento ---
@@ -192,6 +194,9 @@ def main():
     setup_page()
     load_styles()
     
+    # Inicia (uma vez por processo) a atualização dos dados em segundo plano
+    get_background_refresher()
+    
     # --- Lógica de Roteamento ---
     url_page_param = st.query_params.get("pagina", None)
 
@@ -222,6 +227,20 @@ def main():
     # Carrega o dashboard selecionado com base no st.session_state
     pagina_atual = st.session_state.get('pagina_selecionada')
 
+    # Com ?perf=1 na URL, as etapas da página são medidas e exibidas no fim
+    trace = start_trace(pagina_atual or "") if sampling_requested() else None
+    try:
+        render_pagina(pagina_atual)
+    finally:
+        if trace is not None:
+            finish_trace(trace)
+    if trace is not None:
+        from views.perf_panel import render_timing_panel
+        render_timing_panel(trace)
+
+
+def render_pagina(pagina_atual):
+    """Renderiza o relatório da página selecionada"""
     if pagina_atual == "🏢 Relatório Comercial":
         try:
             from views.comercial.relatorio_comercial import render_relatorio_comercial
@@ -0,0 +1,191 @@
+"""
+Leitura em streaming das respostas do BI Connector
+As respostas têm o formato [cabeçalho, linha, linha, ...]. Em vez de carregar o corpo
+inteiro com response.json() e montar uma lista de listas, o array é lido aos poucos e as
+linhas são acumuladas em buffers por coluna, bloco a bloco
+"""
+
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import requests
+
+
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+
+
+class UnexpectedBiResponse(Exception):
+    """A resposta não é um array JSON; o conteúdo decodificado fica em payload"""
+
+    def __init__(self, payload: Any):
+        super().__init__(f"Resposta inesperada do BI Connector: {payload}")
+        self.payload = payload
+
+
+class _StreamingArrayReader:
+    """Lê os elementos de um array JSON de nível superior a partir de blocos de texto"""
+
+    def __init__(self, response: requests.Response, chunk_bytes: int):
+        self._chunks = response.iter_content(chunk_size=chunk_bytes)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._position = 0
+        self._exhausted = False
+
+    def _read_more(self) -> bool:
+        if self._exhausted:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._exhausted = True
+            self._buffer += self._decoder.decode(b"", final=True)
+            return False
+
+        # Descarta o texto já consumido antes de acrescentar o novo bloco
+        self._buffer = self._buffer[self._position:] + self._decoder.decode(chunk)
+        self._position = 0
+        return True
+
+    def _skip_whitespace(self) -> Optional[str]:
+        """Avança até o próximo caractere significativo (None no fim do corpo)"""
+        while True:
+            self._position = _WHITESPACE.match(self._buffer, self._position).end()
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._read_more():
+                return None
+
+    def read_rest(self) -> str:
+        while self._read_more():
+            pass
+        return self._buffer[self._position:]
+
+    def start_array(self) -> bool:
+        """Consome o '[' inicial; retorna False se o corpo não começar com um array"""
+        if self._skip_whitespace() != "[":
+            return False
+        self._position += 1
+        return True
+
+    def iter_elements(self) -> Iterator[Any]:
+        """Gera os elementos do array até o ']' final"""
+        decode = self._json_decoder.raw_decode
+        skip_whitespace = _WHITESPACE.match
+        expect_separator = False
+
+        while True:
+            position = skip_whitespace(self._buffer, self._position).end()
+            if position == len(self._buffer):
+                self._position = position
+                if not self._read_more():
+                    raise self._decode_error("Array JSON incompleto")
+                continue
+
+            char = self._buffer[position]
+            if char == "]":
+                self._position = position + 1
+                return
+            if expect_separator:
+                if char != ",":
+                    raise self._decode_error("Esperado ',' entre os elementos do array")
+                self._position = position + 1
+                expect_separator = False
+                continue
+
+            self._position = position
+
+            # Caminho rápido: todos os elementos completos do bloco em uma única chamada ao
+            # decodificador. Se o corte cair dentro de uma string ou de um array aninhado o
+            # trecho é inválido e a leitura segue elemento a elemento
+            cut = self._buffer.rfind("],", position)
+            if cut != -1:
+                try:
+                    elements = json.loads("[" + self._buffer[position:cut + 1] + "]")
+                except json.JSONDecodeError:
+                    elements = None
+                if elements is not None:
+                    self._position = cut + 1
+                    expect_separator = True
+                    yield from elements
+                    continue
+
+            try:
+                element, end = decode(self._buffer, position)
+            except json.JSONDecodeError as e:
+                # O elemento pode estar cortado entre dois blocos; tenta com mais dados
+                if self._read_more():
+                    continue
+                raise self._decode_error(e.msg)
+
+            # Um escalar no fim do bloco (ex.: número) pode continuar no próximo
+            if end == len(self._buffer) and not isinstance(element, (list, dict)) and self._read_more():
+                continue
+
+            self._position = end
+            expect_separator = True
+            yield element
+
+    def _decode_error(self, message: str) -> requests.exceptions.JSONDecodeError:
+        return requests.exceptions.JSONDecodeError(message, self._buffer, self._position)
+
+
+def read_bi_frame(response: requests.Response, chunk_rows: int = 20000,
+                  chunk_bytes: int = 1 << 16) -> pd.DataFrame:
+    """
+    Converte uma resposta do BI Connector (requisição feita com stream=True) em DataFrame.
+    A cada chunk_rows linhas, os valores são movidos para arrays por coluna, de modo que o
+    pico de memória fica próximo do tamanho do DataFrame final.
+    Respostas com apenas o cabeçalho (ou vazias) geram um DataFrame vazio; respostas que
+    não são arrays levantam UnexpectedBiResponse.
+    """
+    reader = _StreamingArrayReader(response, chunk_bytes)
+    if not reader.start_array():
+        rest = reader.read_rest()
+        try:
+            payload = json.loads(rest)
+        except json.JSONDecodeError as e:
+            raise requests.exceptions.JSONDecodeError(e.msg, e.doc, e.pos)
+        raise UnexpectedBiResponse(payload)
+
+    elements = reader.iter_elements()
+    column_names = next(elements, None)
+    if column_names is None:
+        return pd.DataFrame()
+
+    column_count = len(column_names)
+    column_chunks: List[List[np.ndarray]] = [[] for _ in range(column_count)]
+    pending_rows: List[list] = []
+
+    def flush_pending_rows():
+        # Conversão do bloco feita pelo pandas (em C), com as mesmas regras de
+        # pd.DataFrame(linhas, columns=cabeçalho) para linhas curtas ou longas
+        chunk = pd.DataFrame(pending_rows, columns=range(column_count), dtype=object)
+        for index in range(column_count):
+            column_chunks[index].append(chunk[index].to_numpy())
+        pending_rows.clear()
+
+    row_count = 0
+    for row in elements:
+        pending_rows.append(row)
+        row_count += 1
+        if len(pending_rows) >= chunk_rows:
+            flush_pending_rows()
+
+    if row_count == 0:
+        return pd.DataFrame()
+    if pending_rows:
+        flush_pending_rows()
+
+    columns: Dict[int, np.ndarray] = {
+        index: chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+        for index, chunks in enumerate(column_chunks)
+    }
+    frame = pd.DataFrame(columns, copy=False)
+    frame.columns = column_names
+    # Mesma inferência de tipos que pd.DataFrame(linhas, columns=cabeçalho) faria
+    return frame.infer_objects()
@@ -7,9 +7,16 @@ import streamlit as st
 import requests
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 from dataclasses import dataclass
 import json
+import time
+
+from .bi_response import UnexpectedBiResponse, read_bi_frame
+from .concurrent_fetch import fetch_concurrently, get_pooled_session, get_request_timing_log, RequestTiming
+from .shared_cache import get_shared_cache, CacheStats
+from .request_coalescer import get_bi_request_group, SingleFlightStats
+from .instrumentation import span
 
 
 @dataclass
@@ -45,6 +52,8 @@ class BitrixApiError(Exception):
 class BitrixConnector:
     """Conector responsável pela comunicação com a API do Bitrix24"""
     
+    UF_DEAL_ID_BATCH_SIZE = 500 # Quantidade de DEAL_IDs por requisição à tabela crm_deal_uf
+    
     def __init__(self):
         self._credentials = self._load_credentials()
         self._session = self._create_session()
@@ -62,35 +71,43 @@ class BitrixConnector:
             raise BitrixApiError(f"Credencial não encontrada: {e}")
     
     def _create_session(self) -> requests.Session:
-        """Cria sessão HTTP configurada"""
-        session = requests.Session()
-        session.headers.update({
-            'Accept': 'application/json',
-            'Content-Type': 'application/json',
-            'User-Agent': 'Streamlit-JusGestante/1.0'
-        })
-        return session
+        """Retorna a sessão HTTP configurada, com pool de conexões compartilhado pelo processo"""
+        return get_pooled_session()
 
     def _execute_bi_query(self, table_name: str, payload: Dict) -> pd.DataFrame:
-        """Executa uma consulta genérica no BI Connector e retorna um DataFrame."""
+        """
+        Executa uma consulta genérica no BI Connector e retorna um DataFrame.
+        Consultas idênticas (mesma tabela e payload) feitas ao mesmo tempo por sessões
+        diferentes são coalescidas em uma única chamada HTTP.
+        """
+        request_key = f"{table_name}:{json.dumps(payload, sort_keys=True, default=str)}"
+        with span(f"bi_query:{table_name}") as current:
+            result = get_bi_request_group().do(
+                request_key, lambda: self._fetch_bi_query(table_name, payload)
+            )
+            current.record(result)
+        # Cada chamador recebe sua própria cópia rasa, pois o processamento altera colunas
+        return result.copy(deep=False)
+
+    def _fetch_bi_query(self, table_name: str, payload: Dict) -> pd.DataFrame:
+        """Faz a requisição HTTP ao BI Connector, com novas tentativas em caso de falha."""
         url = f"{self._credentials.base_url}?token={self._credentials.token}&table={table_name}"
         
         for attempt in range(self._credentials.max_retries):
+            started_at = time.perf_counter()
             try:
-                response = self._session.post(url, json=payload, timeout=self._credentials.timeout)
-                response.raise_for_status()
-                response_data = response.json()
-
-                if isinstance(response_data, list) and len(response_data) > 1:
-                    column_names = response_data[0]
-                    data_rows = response_data[1:]
-                    return pd.DataFrame(data_rows, columns=column_names)
-                elif isinstance(response_data, list) and len(response_data) <= 1:
-                    return pd.DataFrame()
-                else:
-                    st.warning(f"Resposta inesperada da API para a tabela {table_name}: {response_data}")
-                    return pd.DataFrame()
+                # Corpo lido em streaming: as linhas viram colunas à medida que chegam
+                with self._session.post(url, json=payload, timeout=self._credentials.timeout, stream=True) as response:
+                    response.raise_for_status()
+                    df = read_bi_frame(response)
+
+                if not df.empty:
+                    get_request_timing_log().record(f"bitrix:{table_name}", started_at, len(df))
+                return df
 
+            except UnexpectedBiResponse as e:
+                st.warning(f"Resposta inesperada da API para a tabela {table_name}: {e.payload}")
+                return pd.DataFrame()
             except requests.exceptions.RequestException as e:
                 if attempt == self._credentials.max_retries - 1:
                     raise BitrixApiError(f"Falha na requisição para a tabela {table_name} após {self._credentials.max_retries} tentativas: {e}")
@@ -99,9 +116,16 @@ class BitrixConnector:
         return pd.DataFrame()
 
     def get_deals_data(self, category_ids: Optional[List[int]] = None,
-                      date_range: Optional[DateRange] = None) -> pd.DataFrame:
-        """Obtém dados de negócios (deals), aplicando filtros via API."""
-        payload = {}
+                      date_range: Optional[DateRange] = None,
+                      time_filter_column: str = "DATE_CREATE",
+                      fields: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Obtém dados de negócios (deals), aplicando filtros via API.
+        O date_range é aplicado sobre time_filter_column (DATE_CREATE por padrão,
+        DATE_MODIFY na sincronização incremental).
+        Quando fields é informado, apenas essas colunas são solicitadas à API.
+        """
+        payload = self._build_fields_payload(fields)
         filters = []
 
         if category_ids:
@@ -114,7 +138,7 @@ class BitrixConnector:
                 "endDate": date_range.end_date
             }
             payload["configParams"] = {
-                "timeFilterColumn": "DATE_CREATE"
+                "timeFilterColumn": time_filter_column
             }
         
         if filters:
@@ -122,9 +146,19 @@ class BitrixConnector:
             
         return self._execute_bi_query("crm_deal", payload)
 
-    def get_deals_uf_data(self, date_range: Optional[DateRange] = None) -> pd.DataFrame:
-        """Obtém dados de UF dos negócios, com filtro de data opcional."""
-        payload = {}
+    def get_deals_uf_data(self, date_range: Optional[DateRange] = None,
+                          deal_ids: Optional[List[Any]] = None,
+                          fields: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Obtém dados de UF dos negócios, com filtro de data opcional.
+        Quando deal_ids é informado, o filtro por DEAL_ID é enviado à API em lotes de
+        UF_DEAL_ID_BATCH_SIZE, evitando baixar a tabela crm_deal_uf inteira.
+        Quando fields é informado, apenas essas colunas (e DEAL_ID, usada na mesclagem)
+        são solicitadas à API.
+        """
+        if fields is not None and 'DEAL_ID' not in fields:
+            fields = ['DEAL_ID'] + list(fields)
+        payload = self._build_fields_payload(fields)
         if date_range:
             payload["dateRange"] = {
                 "startDate": date_range.start_date,
@@ -135,12 +169,54 @@ class BitrixConnector:
             # Se isso falhar, o filtro de data terá de ser local para esta tabela.
             # payload["configParams"] = {"timeFilterColumn": "DATE_CREATE"} # Campo incerto
         
-        return self._execute_bi_query("crm_deal_uf", payload)
+        if deal_ids is None:
+            return self._execute_bi_query("crm_deal_uf", payload)
+
+        unique_ids = pd.Series(deal_ids, dtype=object).dropna().astype(str).str.strip().unique().tolist()
+        if not unique_ids:
+            return pd.DataFrame()
+
+        # Os lotes são independentes e são buscados em paralelo
+        batch_tasks = {}
+        for start in range(0, len(unique_ids), self.UF_DEAL_ID_BATCH_SIZE):
+            batch_payload = dict(payload)
+            batch_payload["dimensionsFilters"] = [[{
+                "fieldName": "DEAL_ID",
+                "values": unique_ids[start:start + self.UF_DEAL_ID_BATCH_SIZE],
+                "type": "INCLUDE",
+                "operator": "EQUALS"
+            }]]
+            batch_tasks[f"crm_deal_uf_{start}"] = lambda batch_payload=batch_payload: self._execute_bi_query("crm_deal_uf", batch_payload)
+
+        batch_results, _ = fetch_concurrently(batch_tasks)
+        batches = [batch_df for batch_df in batch_results.values() if not batch_df.empty]
+
+        if not batches:
+            return pd.DataFrame()
+        return pd.concat(batches, ignore_index=True)
+
+    @staticmethod
+    def _build_fields_payload(fields: Optional[List[str]]) -> Dict:
+        """Monta o payload com a seleção de colunas ("fields") do BI Connector"""
+        if not fields:
+            return {}
+        unique_fields = list(dict.fromkeys(fields))
+        return {"fields": [{"name": field} for field in unique_fields]}
 
     def get_users_data(self) -> pd.DataFrame:
         """Obtém dados dos usuários do Bitrix24."""
         return self._execute_bi_query("user", {})
 
+    @staticmethod
+    def get_request_timings(limit: int = 20) -> List[RequestTiming]:
+        """Retorna os tempos das requisições mais recentes (BI Connector e tarefas paralelas)"""
+        return get_request_timing_log().get_recent(limit)
+
+    @staticmethod
+    def get_coalescing_stats() -> SingleFlightStats:
+        """Retorna quantas requisições aguardaram uma chamada idêntica e o tempo de espera"""
+        return get_bi_request_group().get_stats()
+
     def _convert_to_dataframe(self, response_data, fields: List[str]) -> pd.DataFrame:
         """Converte resposta da API em DataFrame (obsoleto com _fetch_all_pages, mas mantido por segurança)"""
         if isinstance(response_data, list):
@@ -168,9 +244,15 @@ class BitrixConnector:
 
 
 class BitrixDataCache:
-    """Gerencia cache de dados do Bitrix"""
+    """
+    Gerencia cache de dados do Bitrix, compartilhado entre todas as sessões do processo.
+    Usa stale-while-revalidate: após o TTL suave (CACHE_DURATION_MINUTES ou o tempo
+    informado) o dado antigo continua sendo servido enquanto uma revalidação roda em
+    segundo plano; só após o TTL rígido a entrada é descartada e o chamador espera a busca.
+    """
     
-    CACHE_DURATION_MINUTES = 30 # Duração padrão do cache em minutos
+    CACHE_DURATION_MINUTES = 30 # TTL suave padrão em minutos
+    HARD_TTL_MINUTES = 240 # TTL rígido padrão em minutos (configurável em [cache] hard_ttl_minutes)
     
     @classmethod
     def get_cache_key(cls, table: str, filters: str = "") -> str:
@@ -179,53 +261,42 @@ class BitrixDataCache:
     
     @classmethod
     def is_cache_valid(cls, cache_key: str) -> bool:
-        """Verifica se cache é válido"""
-        if cache_key not in st.session_state:
-            return False
-        
-        cache_data = st.session_state[cache_key]
-        # Verifica se a estrutura esperada do cache existe
-        if not isinstance(cache_data, dict) or 'timestamp' not in cache_data or 'duration_seconds' not in cache_data:
-            return False 
-        
-        cache_time = cache_data['timestamp']
-        duration_seconds = cache_data['duration_seconds']
-        
-        # Se duration_seconds for None ou inválido, podemos tratar como sempre expirado ou usar um padrão.
-        # Aqui, se for None ou não numérico, consideraremos expirado para segurança.
-        if not isinstance(duration_seconds, (int, float)) or duration_seconds <= 0:
-             # Fallback para a duração padrão da classe se 'duration_seconds' for inválida ou não definida
-             # No entanto, set_cache_data deve sempre definir um valor numérico para duration_seconds.
-             # Se chegou aqui com duration_seconds inválido, é um estado inesperado.
-             # Poderíamos também logar um aviso aqui.
-             # Para simplificar, vamos considerar que duration_seconds sempre será um int positivo.
-             pass # Assume que set_cache_data garante duration_seconds válido.
-
-        expiry_time = cache_time + timedelta(seconds=duration_seconds)
-        return datetime.now() < expiry_time
+        """Verifica se existe dado utilizável (ainda dentro do TTL rígido)"""
+        return get_shared_cache().peek(cache_key) is not None
     
     @classmethod
-    def get_cached_data(cls, cache_key: str) -> Optional[pd.DataFrame]:
-        """Obtém dados do cache"""
-        if not cls.is_cache_valid(cache_key):
-            # Limpar cache inválido/expirado
-            if cache_key in st.session_state:
-                del st.session_state[cache_key]
-            return None
-        
-        return st.session_state[cache_key].get('data') # Usar .get para segurança
+    def get_cached_data(cls, cache_key: str,
+                        revalidate: Optional[Callable[[], Any]] = None) -> Optional[pd.DataFrame]:
+        """
+        Obtém dados do cache. Se estiverem desatualizados e revalidate for informado,
+        devolve o dado antigo e dispara uma única revalidação assíncrona para a chave.
+        """
+        return get_shared_cache().get(cache_key, revalidate=revalidate)
     
     @classmethod
     def set_cache_data(cls, cache_key: str, data: pd.DataFrame, expires_in_seconds: Optional[int] = None) -> None:
-        """Armazena dados no cache com tempo de expiração customizável."""
+        """Armazena dados no cache; expires_in_seconds define o TTL suave (quando o dado passa a ser revalidado)."""
         
         if expires_in_seconds is not None and expires_in_seconds > 0:
-            duration_to_set_seconds = expires_in_seconds
+            stale_after_seconds = expires_in_seconds
         else:
-            duration_to_set_seconds = cls.CACHE_DURATION_MINUTES * 60
-            
-        st.session_state[cache_key] = {
-            'data': data,
-            'timestamp': datetime.now(),
-            'duration_seconds': duration_to_set_seconds
-        } 
\ No newline at end of file
+            stale_after_seconds = cls.CACHE_DURATION_MINUTES * 60
+        
+        hard_ttl_seconds = max(stale_after_seconds, cls._hard_ttl_seconds())
+        get_shared_cache().set(cache_key, data, hard_ttl_seconds, stale_after_seconds=stale_after_seconds)
+
+    @classmethod
+    def get_data_age(cls, cache_key: str) -> Optional[timedelta]:
+        """Retorna há quanto tempo o dado da chave foi buscado (None se não estiver em cache)"""
+        entry = get_shared_cache().peek(cache_key)
+        return entry.age() if entry is not None else None
+
+    @classmethod
+    def get_cache_stats(cls) -> CacheStats:
+        """Retorna contadores de acertos, faltas e remoções do cache compartilhado"""
+        return get_shared_cache().get_stats()
+
+    @classmethod
+    def _hard_ttl_seconds(cls) -> int:
+        cache_settings: Dict[str, Any] = st.secrets.get("cache", {})
+        return int(cache_settings.get("hard_ttl_minutes", cls.HARD_TTL_MINUTES) * 60)
@@ -0,0 +1,134 @@
+"""
+Busca concorrente de dados
+Sessão HTTP com pool de conexões compartilhada pelo processo, execução paralela de
+consultas independentes e registro do tempo de cada requisição
+"""
+
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+
+DEFAULT_MAX_CONCURRENT_REQUESTS = 4
+
+
+@dataclass
+class RequestTiming:
+    """Tempo de uma requisição (ou tarefa) de busca"""
+    label: str
+    seconds: float
+    rows: Optional[int]
+    started_at: datetime
+    thread_name: str
+
+
+class RequestTimingLog:
+    """Guarda os tempos das requisições mais recentes do processo"""
+
+    def __init__(self, max_entries: int = 100):
+        self._entries: deque = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    def record(self, label: str, started_at: float, rows: Optional[int] = None) -> RequestTiming:
+        """Registra uma requisição iniciada em started_at (time.perf_counter())"""
+        seconds = time.perf_counter() - started_at
+        timing = RequestTiming(
+            label=label,
+            seconds=seconds,
+            rows=rows,
+            started_at=datetime.now() - timedelta(seconds=seconds),
+            thread_name=threading.current_thread().name
+        )
+        with self._lock:
+            self._entries.append(timing)
+        return timing
+
+    def get_recent(self, limit: int = 20) -> List[RequestTiming]:
+        """Retorna as últimas requisições, da mais recente para a mais antiga"""
+        with self._lock:
+            return list(self._entries)[-limit:][::-1]
+
+
+def _max_concurrent_requests() -> int:
+    api_settings: Dict[str, Any] = st.secrets.get("api", {})
+    return int(api_settings.get("max_concurrent_requests", DEFAULT_MAX_CONCURRENT_REQUESTS))
+
+
+@st.cache_resource
+def get_request_timing_log() -> RequestTimingLog:
+    """Retorna o registro de tempos único do processo"""
+    return RequestTimingLog()
+
+
+@st.cache_resource
+def get_pooled_session() -> requests.Session:
+    """
+    Sessão HTTP única do processo, com pool de conexões dimensionado para as
+    requisições concorrentes (mantém as conexões abertas entre páginas e sessões)
+    """
+    pool_size = _max_concurrent_requests() * 2
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        'Accept': 'application/json',
+        'Content-Type': 'application/json',
+        'User-Agent': 'Streamlit-JusGestante/1.0'
+    })
+    return session
+
+
+def fetch_concurrently(tasks: Dict[str, Callable[[], Any]],
+                       max_workers: Optional[int] = None) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    Executa as tarefas independentes em paralelo e devolve (resultados, tempos em segundos),
+    ambos indexados pelo nome da tarefa. A exceção da primeira tarefa que falhar é propagada.
+    As threads recebem o contexto da execução atual do Streamlit, então st.warning/st.error
+    chamados dentro das tarefas continuam aparecendo na página, e uma cópia das ContextVars
+    (os spans da instrumentação entram no trace da página).
+    """
+    if not tasks:
+        return {}, {}
+
+    ctx = get_script_run_ctx()
+    timing_log = get_request_timing_log()
+
+    def attach_context():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+
+    def run(name: str, task: Callable[[], Any]) -> Tuple[Any, float]:
+        started_at = time.perf_counter()
+        result = task()
+        rows = len(result) if hasattr(result, '__len__') else None
+        return result, timing_log.record(f"tarefa:{name}", started_at, rows).seconds
+
+    if len(tasks) == 1:
+        # Uma única tarefa roda na própria thread, sem custo de criar o pool
+        (name, task), = tasks.items()
+        result, seconds = run(name, task)
+        return {name: result}, {name: seconds}
+
+    workers = min(max_workers or _max_concurrent_requests(), len(tasks))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch", initializer=attach_context) as executor:
+        futures = {
+            name: executor.submit(contextvars.copy_context().run, run, name, task)
+            for name, task in tasks.items()
+        }
+        results: Dict[str, Any] = {}
+        timings: Dict[str, float] = {}
+        for name, future in futures.items():
+            results[name], timings[name] = future.result()
+
+    return results, timings
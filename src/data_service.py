@@ -5,38 +5,71 @@ Camada de serviço que aplica regras de negócio aos dados do Bitrix24
 
 import pandas as pd
 from datetime import datetime, date
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+from dataclasses import dataclass
+import hashlib
 import streamlit as st
 
 from .bitrix_connector import BitrixConnector, DateRange, BitrixDataCache
-from config.funis_config import FunilConfig, Category
+from .date_index import build_date_indexes, slice_by_date
+from .date_normalization import DateColumn, normalize_date_columns
+from .deal_cube import DealCube, attach_deal_cube, get_deal_cube
+from .deal_schema import DealFrameSchema
+from .instrumentation import span, timed
+from .stage_table import get_stage_table
+from .incremental_sync import DealSnapshot, IncrementalDealSync
+from .snapshot_store import get_snapshot_store
+from config.funis_config import SEMANTIC_LOST, SEMANTIC_WON, FunilConfig, Category
+
+
+@dataclass(frozen=True)
+class ReportColumns:
+    """Colunas de crm_deal e crm_deal_uf que um relatório utiliza"""
+    deal_fields: Tuple[str, ...]
+    uf_fields: Tuple[str, ...] = ()
+
+    def cache_suffix(self) -> str:
+        return "-".join(self.deal_fields + self.uf_fields)
 
 
 class DataService:
     """Serviço responsável por fornecer dados processados para os relatórios"""
     
+    # Colunas de crm_deal usadas pelo processamento (estágios, métricas, sincronização) e pelas views
+    BASE_DEAL_FIELDS = (
+        'ID', 'TITLE', 'CATEGORY_ID', 'STAGE_ID', 'STAGE_SEMANTIC', 'ASSIGNED_BY_NAME',
+        'DATE_CREATE', 'DATE_MODIFY', 'BEGINDATE', 'OPPORTUNITY'
+    )
+    
+    # Colunas necessárias para cada relatório
+    COMERCIAL_COLUMNS = ReportColumns(BASE_DEAL_FIELDS, ('UF_CRM_DATA_FECHAMENTO1',))
+    TRAMITES_COLUMNS = ReportColumns(BASE_DEAL_FIELDS, (
+        'UF_CRM_1742837922053', 'UF_CRM_ASSISTENTE_JURIDICO', 'UF_CRM_DATA_GANHO_ASSISTENTE_JURIDICO'
+    ))
+    AUDIENCIA_COLUMNS = ReportColumns(BASE_DEAL_FIELDS, ('UF_CRM_1731693426655',))
+    ENTREVISTA_COLUMNS = ReportColumns(BASE_DEAL_FIELDS, ('UF_CRM_ID_G7', 'UF_CRM_VALIDADO_DATA'))
+    
+    # Colunas de data normalizadas na ingestão; date_only para campos sem horário relevante
+    DEAL_DATE_COLUMNS = (
+        DateColumn('DATE_CREATE'),
+        DateColumn('DATE_MODIFY'),
+        DateColumn('BEGINDATE', date_only=True, shift=False),
+        DateColumn('UF_CRM_DATA_FECHAMENTO1', date_only=True),
+        DateColumn('UF_CRM_VALIDADO_DATA'),
+        DateColumn('UF_CRM_1731693426655', date_only=True), # Data da audiência
+    )
+    
+    # Colunas de data com índice ordenado no frame em cache (filtros de período das páginas)
+    DATE_INDEX_COLUMNS = ('DATE_CREATE', 'UF_CRM_DATA_FECHAMENTO1', 'UF_CRM_VALIDADO_DATA', 'UF_CRM_1731693426655')
+    
+    # Por quanto tempo um snapshot lido do disco é servido enquanto a atualização roda
+    SNAPSHOT_SERVE_SECONDS = 300
+    
     def __init__(self):
         self._connector = BitrixConnector()
         self._cache = BitrixDataCache()
-        self._stage_mapping = self._build_stage_mapping() # Pré-calcula o stage_mapping
-    
-    def _build_stage_mapping(self) -> Dict[str, str]:
-        """Constrói o mapeamento de stage ID para stage name uma vez."""
-        mapping = {}
-        try:
-            all_categories = FunilConfig.get_all_categories()
-            if all_categories: # Verifica se não é None ou vazio
-                for category in all_categories.values():
-                    if category and hasattr(category, 'stages') and category.stages: # Verifica se category e stages são válidos
-                        for stage in category.stages:
-                            if stage and hasattr(stage, 'stage_id') and hasattr(stage, 'stage_name'): # Verifica atributos do stage
-                                key = f"{category.category_id}_{stage.stage_id}"
-                                mapping[key] = stage.stage_name
-            else:
-                st.warning("FunilConfig.get_all_categories() retornou vazio ou None. Stage mapping estará incompleto.")
-        except Exception as e:
-            st.error(f"Erro ao construir stage_mapping a partir de FunilConfig: {e}")
-        return mapping
+        self._incremental_sync = IncrementalDealSync(self._connector)
+        self._snapshots = get_snapshot_store()
 
     def get_minimal_data_for_selectors(self, category_ids: List[int], 
                                        fields_to_extract: List[str],
@@ -55,10 +88,6 @@ class DataService:
             f"cat_{'-'.join(map(str, category_ids))}_fields_{fields_key}_dates_{start_date}_{end_date}"
         )
         
-        cached_data = self._cache.get_cached_data(cache_key)
-        if cached_data is not None:
-            return cached_data
-
         date_range_obj = None
         if start_date and end_date:
             date_range_obj = DateRange(
@@ -66,12 +95,25 @@ class DataService:
                 end_date=end_date.strftime('%Y-%m-%d')
             )
 
-        # Obtém dados brutos do Bitrix (sem processamento pesado ainda)
-        # O BitrixConnector.get_deals_data atualmente não suporta 'select fields',
-        # então ele sempre traz todas as colunas. Filtramos depois.
+        cached_data = self._cache.get_cached_data(
+            cache_key,
+            revalidate=lambda: self._load_selector_data(cache_key, category_ids, fields_to_extract, date_range_obj)
+        )
+        if cached_data is not None:
+            return cached_data
+
+        return self._load_selector_data(cache_key, category_ids, fields_to_extract, date_range_obj)
+
+    def _load_selector_data(self, cache_key: str, category_ids: List[int],
+                            fields_to_extract: List[str],
+                            date_range_obj: Optional[DateRange]) -> pd.DataFrame:
+        """Busca as colunas dos seletores e publica o resultado no cache"""
+        # Solicita à API apenas as colunas dos seletores. STAGE_NAME é derivado
+        # localmente a partir de CATEGORY_ID e STAGE_ID.
         deals_df_raw = self._connector.get_deals_data(
-            category_ids=category_ids, # O filtro de categoria é aplicado dentro do get_deals_data após o fetch
-            date_range=date_range_obj  # O filtro de data também é aplicado pós-fetch
+            category_ids=category_ids,
+            date_range=date_range_obj,
+            fields=self._selector_deal_fields(fields_to_extract)
         )
 
         if deals_df_raw.empty:
@@ -86,10 +128,8 @@ class DataService:
         # Extrai STAGE_NAME se solicitado e possível
         if 'STAGE_NAME' in fields_to_extract:
             if 'CATEGORY_ID' in deals_df_raw.columns and 'STAGE_ID' in deals_df_raw.columns:
-                # Certificar que são strings para a chave do mapa
-                deals_df_raw['STAGE_KEY_TEMP'] = deals_df_raw['CATEGORY_ID'].astype(str) + '_' + deals_df_raw['STAGE_ID'].astype(str)
-                result_df['STAGE_NAME'] = deals_df_raw['STAGE_KEY_TEMP'].map(self._stage_mapping).fillna('INDEFINIDO')
-                deals_df_raw.drop('STAGE_KEY_TEMP', axis=1, inplace=True)
+                stage_info = get_stage_table().classify(deals_df_raw['CATEGORY_ID'], deals_df_raw['STAGE_ID'])
+                result_df['STAGE_NAME'] = stage_info['STAGE_NAME'].fillna('INDEFINIDO')
                 available_columns.append('STAGE_NAME')
             elif 'STAGE_NAME' in deals_df_raw.columns: # Caso já exista (pouco provável com biconnector puro)
                  result_df['STAGE_NAME'] = deals_df_raw['STAGE_NAME']
@@ -111,23 +151,30 @@ class DataService:
         final_df = result_df[available_columns].copy() # Apenas colunas que foram de fato populadas
 
         self._cache.set_cache_data(cache_key, final_df)
-        return final_df
+        return final_df.copy(deep=False)
+
+    @staticmethod
+    def _selector_deal_fields(fields_to_extract: List[str]) -> List[str]:
+        """Colunas de crm_deal necessárias para montar os campos dos seletores"""
+        deal_fields = []
+        for field in fields_to_extract:
+            if field == 'STAGE_NAME':
+                deal_fields.extend(['CATEGORY_ID', 'STAGE_ID'])
+            else:
+                deal_fields.append(field)
+        return list(dict.fromkeys(deal_fields))
 
     def get_deals_by_category(self, category_ids: List[int], 
                              start_date: Optional[date] = None,
-                             end_date: Optional[date] = None) -> pd.DataFrame:
-        """Obtém deals filtrados por categoria e período"""
+                             end_date: Optional[date] = None,
+                             columns: Optional[ReportColumns] = None) -> pd.DataFrame:
+        """
+        Obtém deals filtrados por categoria e período.
+        Com columns, apenas as colunas declaradas pelo relatório são buscadas na API.
+        """
         
         # Gera chave de cache
-        cache_key = self._cache.get_cache_key(
-            "deals", 
-            f"categories_{'-'.join(map(str, category_ids))}_{start_date}_{end_date}"
-        )
-        
-        # Verifica cache
-        cached_data = self._cache.get_cached_data(cache_key)
-        if cached_data is not None:
-            return cached_data
+        cache_key = self._deals_cache_key(category_ids, start_date, end_date, columns)
         
         # Prepara range de datas
         date_range = None
@@ -137,23 +184,134 @@ class DataService:
                 end_date=end_date.strftime('%Y-%m-%d')
             )
         
-        # Obtém dados do Bitrix
-        deals_df = self._connector.get_deals_data(
-            category_ids=category_ids,
-            date_range=date_range
+        # Verifica cache (dados desatualizados são servidos enquanto revalidam em segundo plano)
+        cached_data = self._cache.get_cached_data(
+            cache_key, revalidate=lambda: self._load_deals(cache_key, category_ids, date_range, columns)
         )
+        if cached_data is not None:
+            return cached_data
         
-        uf_df = self._connector.get_deals_uf_data(
-            date_range=date_range  # Passa o range de datas para filtrar dados UF também
+        # Na partida a frio, serve o snapshot gravado em disco e atualiza em segundo plano
+        if date_range is None:
+            snapshot_name = self._deals_snapshot_name(category_ids, columns)
+            snapshot = self._snapshots.load_on_startup(snapshot_name)
+            if snapshot is not None:
+                # O Parquet não guarda df.attrs: as datas já convertidas são apenas marcadas
+                normalize_date_columns(snapshot.data, self.DEAL_DATE_COLUMNS)
+                build_date_indexes(snapshot.data, self.DATE_INDEX_COLUMNS)
+                attach_deal_cube(snapshot.data)
+                self._cache.set_cache_data(cache_key, snapshot.data, expires_in_seconds=self.SNAPSHOT_SERVE_SECONDS)
+                # A atualização parte dos deals brutos gravados e busca só o delta da marca d'água
+                self._seed_incremental_sync(category_ids, columns)
+                self._snapshots.refresh_in_background(
+                    snapshot_name, lambda: self._load_deals(cache_key, category_ids, None, columns)
+                )
+                return snapshot.data.copy(deep=False)
+        
+        return self._load_deals(cache_key, category_ids, date_range, columns)
+    
+    def refresh_deals(self, category_ids: List[int], columns: Optional[ReportColumns] = None) -> None:
+        """
+        Busca novamente os deals (sem filtro de data) e substitui a entrada do cache,
+        sem passar pela verificação de validade. Usado pela atualização em segundo plano.
+        """
+        cache_key = self._deals_cache_key(category_ids, None, None, columns)
+        self._load_deals(cache_key, category_ids, None, columns)
+    
+    def _deals_cache_key(self, category_ids: List[int], start_date: Optional[date],
+                         end_date: Optional[date], columns: Optional[ReportColumns]) -> str:
+        columns_key = columns.cache_suffix() if columns else "all"
+        return self._cache.get_cache_key(
+            "deals", 
+            f"categories_{'-'.join(map(str, category_ids))}_{start_date}_{end_date}_cols_{columns_key}"
         )
+    
+    def _load_deals(self, cache_key: str, category_ids: List[int],
+                    date_range: Optional[DateRange],
+                    columns: Optional[ReportColumns]) -> pd.DataFrame:
+        """Busca, processa e publica no cache os deals; sem filtro de data, grava também o snapshot"""
+        # Obtém dados do Bitrix. Sem filtro de data, usa a sincronização incremental
+        # (apenas deals alterados desde a última carga) quando habilitada.
+        deal_fields = list(columns.deal_fields) if columns else None
+        if date_range is None and self._incremental_sync.enabled:
+            deal_snapshot = self._incremental_sync.sync_snapshot(category_ids, fields=deal_fields)
+            self._save_raw_deals(category_ids, columns, deal_snapshot)
+            # Cópia rasa para que o processamento não altere as colunas do snapshot
+            deals_df = deal_snapshot.deals.copy(deep=False)
+        else:
+            deals_df = self._connector.get_deals_data(
+                category_ids=category_ids,
+                date_range=date_range,
+                fields=deal_fields
+            )
+        
+        uf_df = self._get_uf_for_deals(deals_df, columns)
         
         # Processa dados
         processed_data = self._process_deals_data(deals_df, uf_df) # Passa uf_df
         
         # Armazena no cache
         self._cache.set_cache_data(cache_key, processed_data)
+        if date_range is None:
+            self._snapshots.save(self._deals_snapshot_name(category_ids, columns), processed_data)
         
-        return processed_data
+        # Cópia rasa: o frame armazenado é compartilhado entre as sessões
+        return processed_data.copy(deep=False)
+    
+    @staticmethod
+    def _deals_snapshot_name(category_ids: List[int], columns: Optional[ReportColumns]) -> str:
+        """Nome do snapshot em disco: um por conjunto de categorias e seleção de colunas"""
+        columns_hash = hashlib.md5((columns.cache_suffix() if columns else "all").encode("utf-8")).hexdigest()[:8]
+        return f"deals_{'-'.join(map(str, sorted(category_ids)))}_{columns_hash}"
+    
+    @classmethod
+    def _raw_deals_snapshot_name(cls, category_ids: List[int], columns: Optional[ReportColumns]) -> str:
+        """Nome do snapshot dos deals brutos da sincronização incremental"""
+        return f"{cls._deals_snapshot_name(category_ids, columns)}_raw"
+
+    def _save_raw_deals(self, category_ids: List[int], columns: Optional[ReportColumns],
+                        deal_snapshot: DealSnapshot) -> None:
+        """
+        Deals brutos, marca d'água e horário da última carga completa em disco: após um
+        reinício a sincronização continua do delta e a reconciliação mantém o prazo
+        """
+        self._snapshots.save(
+            self._raw_deals_snapshot_name(category_ids, columns), deal_snapshot.deals,
+            deal_snapshot.watermark, last_full_sync=deal_snapshot.last_full_sync
+        )
+
+    def _seed_incremental_sync(self, category_ids: List[int], columns: Optional[ReportColumns]) -> None:
+        """Entrega à sincronização incremental os deals brutos e a marca d'água gravados antes do reinício"""
+        if not self._incremental_sync.enabled:
+            return
+        raw_snapshot = self._snapshots.load_on_startup(self._raw_deals_snapshot_name(category_ids, columns))
+        # Sem o horário da última carga completa, a primeira sincronização já é completa
+        if raw_snapshot is None or raw_snapshot.last_full_sync is None:
+            return
+        self._incremental_sync.seed(
+            category_ids, list(columns.deal_fields) if columns else None,
+            raw_snapshot.data, raw_snapshot.watermark, raw_snapshot.last_full_sync
+        )
+
+    @staticmethod
+    def filter_by_date_range(df: pd.DataFrame, column: str,
+                             start_date: date, end_date: Optional[date] = None) -> pd.DataFrame:
+        """
+        Deals com o dia de column entre start_date e end_date (inclusive; sem end_date, a
+        partir de start_date), na ordem original.
+        Sobre o frame vindo do cache (ou uma cópia rasa dele) usa o índice ordenado da coluna:
+        duas buscas binárias e um take das linhas do período. Frames já filtrados usam a
+        máscara sobre a coluna, com o mesmo resultado
+        """
+        return slice_by_date(df, column, start_date, end_date)
+    
+    @staticmethod
+    def get_deal_cube(df: pd.DataFrame) -> DealCube:
+        """
+        Cubo funil × responsável × estágio × ganho × dia de criação × dia de venda do frame
+        vindo do cache, montado junto com os dados. Para outros frames é montado na hora
+        """
+        return get_deal_cube(df)
     
     def get_comercial_data(self, start_date: Optional[date] = None,
                           end_date: Optional[date] = None) -> pd.DataFrame:
@@ -161,7 +319,8 @@ class DataService:
         return self.get_deals_by_category(
             category_ids=[FunilConfig.COMERCIAL_ID],
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            columns=self.COMERCIAL_COLUMNS
         )
     
     def get_tramites_data(self, start_date: Optional[date] = None,
@@ -170,7 +329,8 @@ class DataService:
         return self.get_deals_by_category(
             category_ids=[FunilConfig.TRAMITES_ID],
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            columns=self.TRAMITES_COLUMNS
         )
     
     def get_audiencia_data(self, start_date: Optional[date] = None,
@@ -179,46 +339,25 @@ class DataService:
         return self.get_deals_by_category(
             category_ids=[FunilConfig.AUDIENCIA_ID],
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            columns=self.AUDIENCIA_COLUMNS
         )
     
     def get_entrevista_data(self, start_date: Optional[date] = None,
                            end_date: Optional[date] = None) -> pd.DataFrame:
-        """Obtém dados específicos do funil de entrevista"""
-        # Quando houver filtro de data de criação, buscamos dados frescos (sem cache)
-        # diretamente do conector, processamos e filtramos localmente usando DATE_CREATE ajustada (-6h).
-        if start_date and end_date:
-            # Fetch fresh (no cache): usa diretamente o conector
-            deals_df_raw = self._connector.get_deals_data(
-                category_ids=[FunilConfig.ENTREVISTA_ID],
-                date_range=None
-            )
-            uf_df_raw = self._connector.get_deals_uf_data(date_range=None)
-
-            if deals_df_raw is None or not isinstance(deals_df_raw, pd.DataFrame) or deals_df_raw.empty:
-                return pd.DataFrame()
-
-            # Processa como no fluxo padrão
-            df_processed = self._process_deals_data(deals_df_raw, uf_df_raw if isinstance(uf_df_raw, pd.DataFrame) else pd.DataFrame())
-            if df_processed.empty:
-                return df_processed
-
-            # Filtra por data de criação (DATE_CREATE já ajustada em _calculate_metrics)
-            if 'DATE_CREATE' in df_processed.columns:
-                df_processed['DATE_CREATE'] = pd.to_datetime(df_processed['DATE_CREATE'], errors='coerce')
-                df_processed['DATE_CREATE_DATE'] = df_processed['DATE_CREATE'].dt.date
-                mask = (df_processed['DATE_CREATE_DATE'] >= start_date) & (df_processed['DATE_CREATE_DATE'] <= end_date)
-                df_processed = df_processed[mask].copy()
-                df_processed.drop(columns=['DATE_CREATE_DATE'], inplace=True, errors='ignore')
-
-            return df_processed
-        
-        # Sem filtro de data: usa cache normal
-        return self.get_deals_by_category(
+        """
+        Obtém dados específicos do funil de entrevista.
+        O funil é carregado uma única vez (frame completo do cache); com start_date e
+        end_date, o período de criação é recortado localmente pelo índice de DATE_CREATE,
+        sem nenhuma requisição a mais
+        """
+        df_entrevista = self.get_deals_by_category(
             category_ids=[FunilConfig.ENTREVISTA_ID],
-            start_date=start_date,
-            end_date=end_date
+            columns=self.ENTREVISTA_COLUMNS
         )
+        if start_date and end_date and not df_entrevista.empty and 'DATE_CREATE' in df_entrevista.columns:
+            return self.filter_by_date_range(df_entrevista, 'DATE_CREATE', start_date, end_date)
+        return df_entrevista
 
     def get_raw_comercial_data(self, start_date: Optional[date] = None,
                                end_date: Optional[date] = None) -> (pd.DataFrame, pd.DataFrame):
@@ -238,9 +377,7 @@ class DataService:
             date_range=date_range
         )
         
-        uf_df_raw = self._connector.get_deals_uf_data(
-            date_range=date_range
-        )
+        uf_df_raw = self._get_uf_for_deals(deals_df_raw)
 
         return deals_df_raw, uf_df_raw
 
@@ -262,9 +399,7 @@ class DataService:
             date_range=date_range
         )
         
-        uf_df_raw = self._connector.get_deals_uf_data(
-            date_range=date_range
-        )
+        uf_df_raw = self._get_uf_for_deals(deals_df_raw)
 
         return deals_df_raw, uf_df_raw
 
@@ -285,11 +420,21 @@ class DataService:
         """Obtém dados dos usuários do Bitrix24 e aplica cache."""
         cache_key = self._cache.get_cache_key("users", "all_users_data")
         
-        cached_data = self._cache.get_cached_data(cache_key)
+        cached_data = self._cache.get_cached_data(cache_key, revalidate=lambda: self._load_users(cache_key))
         if cached_data is not None:
             # st.caption("📝 Users data from cache") # Log para debug
             return cached_data
         
+        snapshot = self._snapshots.load_on_startup("users")
+        if snapshot is not None:
+            self._cache.set_cache_data(cache_key, snapshot.data, expires_in_seconds=self.SNAPSHOT_SERVE_SECONDS)
+            self._snapshots.refresh_in_background("users", lambda: self._load_users(cache_key))
+            return snapshot.data.copy(deep=False)
+        
+        return self._load_users(cache_key)
+    
+    def _load_users(self, cache_key: str) -> pd.DataFrame:
+        """Busca os usuários no Bitrix, publica no cache e grava o snapshot"""
         # st.caption("📝 Fetching users data from Bitrix") # Log para debug
         users_df = self._connector.get_users_data()
         
@@ -298,8 +443,26 @@ class DataService:
             users_df = pd.DataFrame() # Retorna DataFrame vazio para evitar erros no merge
             
         self._cache.set_cache_data(cache_key, users_df, expires_in_seconds=3600) # Cache por 1 hora
-        return users_df
+        self._snapshots.save("users", users_df)
+        return users_df.copy(deep=False)
     
+    def _get_uf_for_deals(self, deals_df: pd.DataFrame,
+                          columns: Optional[ReportColumns] = None) -> pd.DataFrame:
+        """
+        Obtém os dados UF apenas dos deals carregados, enviando o filtro DEAL_ID à API.
+        O filtro por ID já restringe o período, então o range de datas não é repassado.
+        Com columns, busca apenas os campos UF do relatório (nenhum, se não houver).
+        """
+        if deals_df is None or deals_df.empty or 'ID' not in deals_df.columns:
+            return pd.DataFrame()
+        if columns is not None and not columns.uf_fields:
+            return pd.DataFrame()
+        return self._connector.get_deals_uf_data(
+            deal_ids=deals_df['ID'].tolist(),
+            fields=list(columns.uf_fields) if columns else None
+        )
+
+    @timed("DataService._process_deals_data")
     def _process_deals_data(self, df: pd.DataFrame, uf_df: pd.DataFrame) -> pd.DataFrame:
         """Processa dados dos deals aplicando regras de negócio"""
         if df.empty:
@@ -307,35 +470,18 @@ class DataService:
 
         # Mescla dados de deals com dados UF
         if not uf_df.empty and 'DEAL_ID' in uf_df.columns:
-            # Garante que as colunas de merge tenham o mesmo tipo
-            df['ID'] = df['ID'].astype(str)
-            uf_df['DEAL_ID'] = uf_df['DEAL_ID'].astype(str)
-            
-            df = pd.merge(df, uf_df, left_on='ID', right_on='DEAL_ID', how='left', suffixes= (' ', '_uf'))
-            
-            # Converte a coluna UF_CRM_DATA_FECHAMENTO1 para datetime após a mesclagem
-            if 'UF_CRM_DATA_FECHAMENTO1' in df.columns:
-                df['UF_CRM_DATA_FECHAMENTO1'] = pd.to_datetime(df['UF_CRM_DATA_FECHAMENTO1'], errors='coerce')
-                if not df['UF_CRM_DATA_FECHAMENTO1'].isna().all():
-                    df['UF_CRM_DATA_FECHAMENTO1'] = df['UF_CRM_DATA_FECHAMENTO1'] - pd.Timedelta(hours=6)
-                df['UF_CRM_DATA_FECHAMENTO1'] = df['UF_CRM_DATA_FECHAMENTO1'].dt.date
-
-            # Converte a coluna UF_CRM_VALIDADO_DATA para datetime
-            if 'UF_CRM_VALIDADO_DATA' in df.columns:
-                df['UF_CRM_VALIDADO_DATA'] = pd.to_datetime(df['UF_CRM_VALIDADO_DATA'], errors='coerce')
-                if not df['UF_CRM_VALIDADO_DATA'].isna().all():
-                    df['UF_CRM_VALIDADO_DATA'] = df['UF_CRM_VALIDADO_DATA'] - pd.Timedelta(hours=6)
-                # Mantém como datetime para filtros precisos, converte para data apenas na exibição se necessário
-                # df['UF_CRM_VALIDADO_DATA'] = df['UF_CRM_VALIDADO_DATA'].dt.date
-
-            # Converter a coluna de Data de Audiência (UF_CRM_1731693426655)
-            DATA_AUDIENCIA_FIELD = 'UF_CRM_1731693426655'
-            if DATA_AUDIENCIA_FIELD in df.columns:
-                df[DATA_AUDIENCIA_FIELD] = pd.to_datetime(df[DATA_AUDIENCIA_FIELD], errors='coerce')
-                if not df[DATA_AUDIENCIA_FIELD].isna().all():
-                    df[DATA_AUDIENCIA_FIELD] = df[DATA_AUDIENCIA_FIELD] - pd.Timedelta(hours=6)
-                df[DATA_AUDIENCIA_FIELD] = df[DATA_AUDIENCIA_FIELD].dt.date
-
+            with span("merge_uf") as current:
+                # Garante que as colunas de merge tenham o mesmo tipo
+                df['ID'] = df['ID'].astype(str)
+                uf_df['DEAL_ID'] = uf_df['DEAL_ID'].astype(str)
+                
+                df = pd.merge(df, uf_df, left_on='ID', right_on='DEAL_ID', how='left', suffixes= (' ', '_uf'))
+                current.record(df)
+
+        # Datas convertidas uma única vez (formato explícito e ajuste de fuso configurado)
+        with span("normalize_dates"):
+            df = normalize_date_columns(df, self.DEAL_DATE_COLUMNS)
+        
         # Enriquece com informações dos funis
         df = self._enrich_with_category_info(df)
         
@@ -345,8 +491,18 @@ class DataService:
         # Calcula métricas adicionais
         df = self._calculate_metrics(df)
         
-        return df
+        # Tipos declarados (categóricos, IDs inteiros, flags booleanas), aplicados uma única vez
+        with span("apply_schema") as current:
+            df = DealFrameSchema.apply(df)
+            current.record(df)
+        
+        # Índices de data e cubo por responsável montados por último, sobre as colunas definitivas
+        with span("build_date_indexes"):
+            df = build_date_indexes(df, self.DATE_INDEX_COLUMNS)
+        with span("build_deal_cube"):
+            return attach_deal_cube(df)
     
+    @timed()
     def _enrich_with_category_info(self, df: pd.DataFrame) -> pd.DataFrame:
         """Adiciona informações das categorias aos dados"""
         if 'CATEGORY_ID' not in df.columns:
@@ -358,110 +514,72 @@ class DataService:
             FunilConfig.AUDIENCIA_ID: 'AUDIÊNCIA'
         }
         
-        df['CATEGORY_NAME'] = df['CATEGORY_ID'].map(category_mapping)
+        # CATEGORY_ID pode chegar como texto do BI Connector
+        df['CATEGORY_NAME'] = pd.to_numeric(df['CATEGORY_ID'], errors='coerce').map(category_mapping)
         
         return df
     
+    @timed()
     def _enrich_with_stage_info(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Adiciona informações dos estágios aos dados"""
+        """
+        Adiciona nome, ordem e status (ganho/perda/ativo) dos estágios.
+        A classificação vem da tabela de estágios de FunilConfig, em uma única junção
+        vetorizada para todos os funis; estágios fora da configuração usam STAGE_SEMANTIC.
+        """
         if df.empty:
             return df
-        
-        # Se já temos STAGE_SEMANTICS da API, usa para criar flags básicas
-        if 'STAGE_SEMANTIC' in df.columns:
-            # Mapeia semânticas para nomes mais legíveis
-            semantic_mapping = {
-                'WON': 'NEGÓCIO FECHADO',
-                'LOST': 'NEGÓCIO PERDIDO', 
-                'PROCESS': 'EM ANDAMENTO'
-            }
-            
-            # Se não temos STAGE_NAME, cria baseado na semântica
-            if 'STAGE_NAME' not in df.columns:
-                df['STAGE_NAME'] = df['STAGE_SEMANTIC'].map(semantic_mapping).fillna('INDEFINIDO')
-        
-        # Se temos CATEGORY_ID e STAGE_ID, tenta mapear com configuração
+
+        # Mapeia semânticas da API para nomes mais legíveis (estágios fora da configuração)
+        semantic_mapping = {
+            'WON': 'NEGÓCIO FECHADO',
+            'LOST': 'NEGÓCIO PERDIDO', 
+            'PROCESS': 'EM ANDAMENTO'
+        }
+        api_semantics = (
+            df['STAGE_SEMANTIC'].astype(str).str.strip().str.upper()
+            if 'STAGE_SEMANTIC' in df.columns else pd.Series(None, index=df.index, dtype=object)
+        )
+
         if 'CATEGORY_ID' in df.columns and 'STAGE_ID' in df.columns:
-            # stage_mapping = {} # Removida a criação local
-            
-            # for category in FunilConfig.get_all_categories().values():
-            #     for stage in category.stages:
-            #         key = f"{category.category_id}_{stage.stage_id}"
-            #         stage_mapping[key] = stage.stage_name
-            
-            # Aplica mapeamento se disponível
-            # Usa o self._stage_mapping pré-calculado
-            df['STAGE_KEY'] = df['CATEGORY_ID'].astype(str) + '_' + df['STAGE_ID'].astype(str)
-            mapped_names = df['STAGE_KEY'].map(self._stage_mapping) 
-            
-            # Usa mapeamento da configuração se disponível, senão mantém o existente
+            df['STAGE_ID'] = df['STAGE_ID'].astype(str).str.strip()
+            stage_info = get_stage_table().classify(df['CATEGORY_ID'], df['STAGE_ID'])
+
             if 'STAGE_NAME' in df.columns:
-                df['STAGE_NAME'] = mapped_names.fillna(df['STAGE_NAME'])
+                fallback_names = df['STAGE_NAME']
+            elif 'STAGE_SEMANTIC' in df.columns:
+                fallback_names = df['STAGE_SEMANTIC'].map(semantic_mapping).fillna('INDEFINIDO')
             else:
-                df['STAGE_NAME'] = mapped_names.fillna('INDEFINIDO')
-            
-            # Remove coluna auxiliar
-            df = df.drop('STAGE_KEY', axis=1)
+                fallback_names = 'INDEFINIDO'
+            df['STAGE_NAME'] = stage_info['STAGE_NAME'].fillna(fallback_names)
+            df['STAGE_SORT_ORDER'] = stage_info['STAGE_SORT_ORDER']
+            semantics = stage_info['STAGE_SEMANTICS'].where(stage_info['IN_CONFIG'], api_semantics)
+
+        elif 'STAGE_SEMANTIC' in df.columns: # Fallback se STAGE_ID ou CATEGORY_ID não estiverem disponíveis
+            st.info("Usando fallback para STAGE_SEMANTIC pois STAGE_ID ou CATEGORY_ID não foram encontrados ou não cobriram todos os casos.")
+            if 'STAGE_NAME' not in df.columns:
+                df['STAGE_NAME'] = df['STAGE_SEMANTIC'].map(semantic_mapping).fillna('INDEFINIDO')
+            semantics = api_semantics
+        else:
+            st.warning("Colunas 'STAGE_ID'/'CATEGORY_ID' ou 'STAGE_SEMANTIC' não encontradas. Métricas IS_WON/IS_LOST podem estar incompletas.")
+            semantics = api_semantics
+
+        df['IS_WON'] = semantics == SEMANTIC_WON
+        df['IS_LOST'] = semantics == SEMANTIC_LOST
+        # Define IS_ACTIVE: qualquer deal que não é WON nem LOST é considerado ativo.
+        df['IS_ACTIVE'] = (~df['IS_WON']) & (~df['IS_LOST'])
         
         return df
     
+    @timed()
     def _calculate_metrics(self, df: pd.DataFrame) -> pd.DataFrame:
         """Calcula métricas adicionais"""
         if df.empty:
             return df
         
-        # Converte datas se necessário
-        if 'DATE_CREATE' in df.columns:
-            df['DATE_CREATE'] = pd.to_datetime(df['DATE_CREATE'], errors='coerce')
-            # AJUSTE DE FUSO HORÁRIO: Subtrai 6 horas para corrigir a diferença do servidor
-            if not df['DATE_CREATE'].isna().all():
-                df['DATE_CREATE'] = df['DATE_CREATE'] - pd.Timedelta(hours=6)
-        
-        if 'DATE_MODIFY' in df.columns:
-            df['DATE_MODIFY'] = pd.to_datetime(df['DATE_MODIFY'], errors='coerce')
-            if not df['DATE_MODIFY'].isna().all():
-                df['DATE_MODIFY'] = df['DATE_MODIFY'] - pd.Timedelta(hours=6)
-        
         # Calcula tempo no funil
         if 'DATE_CREATE' in df.columns:
             df['DAYS_IN_FUNNEL'] = (datetime.now() - df['DATE_CREATE']).dt.days
         
-        # Inicializa colunas de status
-        df['IS_WON'] = False
-        df['IS_LOST'] = False
-
-        # Define IS_WON e IS_LOST baseado em STAGE_ID, condicionado pela CATEGORY_ID
-        if 'STAGE_ID' in df.columns and 'CATEGORY_ID' in df.columns:
-            df['STAGE_ID'] = df['STAGE_ID'].astype(str).str.strip()
-            
-            # Lógica para o Funil Comercial
-            comercial_mask = df['CATEGORY_ID'] == FunilConfig.COMERCIAL_ID
-            df.loc[comercial_mask & (df['STAGE_ID'] == 'WON'), 'IS_WON'] = True
-            df.loc[comercial_mask & (df['STAGE_ID'] == 'LOSE'), 'IS_LOST'] = True
-            
-            # Lógica para o Funil de Trâmites Administrativos
-            tramites_mask = df['CATEGORY_ID'] == FunilConfig.TRAMITES_ID
-            df.loc[tramites_mask & (df['STAGE_ID'] == 'C2:WON'), 'IS_WON'] = True
-            df.loc[tramites_mask & (df['STAGE_ID'] == 'C2:LOSE'), 'IS_LOST'] = True
-            
-            # Lógica para o Funil de Audiências
-            audiencia_mask = df['CATEGORY_ID'] == FunilConfig.AUDIENCIA_ID
-            df.loc[audiencia_mask & (df['STAGE_ID'] == 'C4:WON'), 'IS_WON'] = True
-            df.loc[audiencia_mask & (df['STAGE_ID'].isin(['C4:LOSE', 'C4:UC_PP1J4N', 'C4:UC_QK3BDP'])), 'IS_LOST'] = True
-
-        elif 'STAGE_SEMANTIC' in df.columns: # Fallback se STAGE_ID ou CATEGORY_ID não estiverem disponíveis
-            st.info("Usando fallback para STAGE_SEMANTIC pois STAGE_ID ou CATEGORY_ID não foram encontrados ou não cobriram todos os casos.")
-            df['__TEMP_SEMANTIC__'] = df['STAGE_SEMANTIC'].astype(str).str.strip().str.upper()
-            df.loc[df['__TEMP_SEMANTIC__'] == 'S', 'IS_WON'] = True
-            df.loc[df['__TEMP_SEMANTIC__'] == 'F', 'IS_LOST'] = True
-            if '__TEMP_SEMANTIC__' in df.columns:
-                df.drop(columns=['__TEMP_SEMANTIC__'], inplace=True)
-        else:
-            st.warning("Colunas 'STAGE_ID'/'CATEGORY_ID' ou 'STAGE_SEMANTIC' não encontradas. Métricas IS_WON/IS_LOST podem estar incompletas.")
-
-        # Define IS_ACTIVE: qualquer deal que não é WON nem LOST é considerado ativo.
-        df['IS_ACTIVE'] = (~df['IS_WON']) & (~df['IS_LOST'])
-        
         # Converte e limpa valores de oportunidade
         if 'OPPORTUNITY' in df.columns:
             df['OPPORTUNITY'] = pd.to_numeric(df['OPPORTUNITY'], errors='coerce').fillna(0)
@@ -527,7 +645,7 @@ class DataService:
         if df.empty or 'STAGE_NAME' not in df.columns:
             return pd.DataFrame()
         
-        stage_counts = df.groupby('STAGE_NAME').agg({
+        stage_counts = df.groupby('STAGE_NAME', observed=True).agg({
             'ID': 'count',
             'OPPORTUNITY': 'sum'
         }).rename(columns={'ID': 'COUNT', 'OPPORTUNITY': 'TOTAL_VALUE'})
@@ -0,0 +1,93 @@
+"""
+Índices ordenados das colunas de data
+Para cada coluna de data filtrada pelas páginas, o frame em cache guarda as posições das
+linhas ordenadas pela data. Um intervalo de datas vira duas buscas binárias (searchsorted)
+e um take das k linhas do intervalo, em vez de uma máscara sobre todas as linhas
+"""
+
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .date_normalization import between_dates, date_bounds, date_series
+
+
+DATE_INDEXES_ATTR = 'date_indexes'
+
+
+class DateIndex:
+    """Posições das linhas com data (NaT excluído) em ordem crescente da coluna"""
+
+    __slots__ = ('_sorted_values', '_positions', '_source')
+
+    def __init__(self, values: pd.Series):
+        array = values.to_numpy(dtype='datetime64[ns]', copy=False)
+        valid_positions = np.flatnonzero(~np.isnat(array))
+        order = np.argsort(array[valid_positions], kind='stable')
+        self._positions = valid_positions[order]
+        self._sorted_values = array[self._positions]
+        self._source = self._source_key(values)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __deepcopy__(self, memo) -> 'DateIndex':
+        # Imutável: cópias do frame (e de df.attrs) compartilham o mesmo índice
+        return self
+
+    @staticmethod
+    def _source_key(values: pd.Series) -> Tuple[int, int, Tuple[int, ...]]:
+        array = values.to_numpy(copy=False)
+        return array.__array_interface__['data'][0], len(array), array.strides
+
+    def covers(self, values: pd.Series) -> bool:
+        """
+        Indica se o índice foi montado sobre exatamente estes valores: o mesmo buffer, já
+        congelado pelo cache compartilhado (portanto sem escritas depois da montagem).
+        Frames filtrados ou colunas reatribuídas têm outro buffer e caem na máscara comum
+        """
+        if values.to_numpy(copy=False).flags.writeable:
+            return False
+        return self._source == self._source_key(values)
+
+    def positions_between(self, start: date, end: Optional[date]) -> np.ndarray:
+        """Posições (em ordem original) das linhas cujo dia está entre start e end (sem end, a partir de start)"""
+        lower, upper = date_bounds(start, end)
+        first = self._sorted_values.searchsorted(lower.to_datetime64(), side='left')
+        if upper is None:
+            last = len(self._sorted_values)
+        else:
+            last = self._sorted_values.searchsorted(upper.to_datetime64(), side='left')
+        return np.sort(self._positions[first:last])
+
+
+def build_date_indexes(df: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+    """Monta os índices das colunas de data presentes e os guarda em df.attrs['date_indexes']"""
+    indexes: Dict[str, DateIndex] = {}
+    for column in columns:
+        if column in df.columns and pd.api.types.is_datetime64_dtype(df[column].dtype):
+            indexes[column] = DateIndex(df[column])
+    df.attrs[DATE_INDEXES_ATTR] = indexes
+    return df
+
+
+def get_date_index(df: pd.DataFrame, column: str) -> Optional[DateIndex]:
+    """Índice da coluna, se o frame ainda for o mesmo sobre o qual ele foi montado"""
+    index = df.attrs.get(DATE_INDEXES_ATTR, {}).get(column)
+    if index is None or column not in df.columns or not index.covers(df[column]):
+        return None
+    return index
+
+
+def slice_by_date(df: pd.DataFrame, column: str, start: date, end: Optional[date] = None) -> pd.DataFrame:
+    """
+    Linhas de df com o dia de column entre start e end (inclusive; sem end, a partir de
+    start), na ordem original.
+    Usa o índice ordenado quando disponível; senão, a máscara sobre a coluna
+    """
+    index = get_date_index(df, column)
+    if index is not None:
+        return df.take(index.positions_between(start, end))
+    return df[between_dates(date_series(df, column), start, end)]
@@ -0,0 +1,167 @@
+"""
+Normalização das colunas de data
+As datas chegam do Bitrix como texto no horário do servidor. Cada coluna é convertida
+uma única vez, com formato explícito e um único ajuste de fuso configurável, e fica
+marcada em df.attrs para que as páginas usem o valor convertido sem refazer o parse
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import pandas as pd
+import streamlit as st
+
+
+NORMALIZED_ATTR = 'normalized_date_columns'
+
+# Formato do BI Connector; os demais são tentados apenas quando ele não reconhece os valores
+DEFAULT_FORMAT = "%Y-%m-%d %H:%M:%S"
+CANDIDATE_FORMATS = (
+    DEFAULT_FORMAT,
+    "%Y-%m-%d",
+    "%Y-%m-%dT%H:%M:%S",
+    "%d.%m.%Y %H:%M:%S",
+    "%d.%m.%Y",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y",
+)
+DEFAULT_OFFSET_HOURS = -6 # Diferença entre o horário do servidor do Bitrix e o local
+
+# Formato reconhecido por coluna, para não repetir a inferência a cada atualização
+_inferred_formats: Dict[str, str] = {}
+
+
+@dataclass(frozen=True)
+class DateColumn:
+    """
+    Coluna de data a normalizar. date_only zera o horário depois do ajuste de fuso;
+    shift=False para campos de data pura, que o servidor não grava com horário
+    """
+    name: str
+    date_only: bool = False
+    shift: bool = True
+
+
+def get_offset_hours() -> float:
+    """Ajuste de fuso aplicado às datas do servidor ([dates] timezone_offset_hours)"""
+    return float(st.secrets.get("dates", {}).get("timezone_offset_hours", DEFAULT_OFFSET_HOURS))
+
+
+def parse_dates(values: pd.Series, column: Optional[str] = None) -> pd.Series:
+    """
+    Converte texto em datetime64 usando o formato do BI Connector. Valores que ele não
+    reconhece são convertidos com o formato inferido para a coluna (guardado por nome);
+    o que nenhum formato reconhece vira NaT, como em errors='coerce'
+    """
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values
+
+    parsed = pd.to_datetime(values, format=DEFAULT_FORMAT, errors='coerce')
+    if not parsed.hasnans:
+        return parsed
+
+    leftovers = values[parsed.isna() & values.notna()].astype(str).str.strip()
+    leftovers = leftovers[leftovers != '']
+    tried = {DEFAULT_FORMAT}
+    while not leftovers.empty:
+        date_format = _infer_format(leftovers, column, tried)
+        if date_format is None:
+            break
+        tried.add(date_format)
+        converted = pd.to_datetime(leftovers, format=date_format, errors='coerce')
+        parsed.loc[converted.index] = converted
+        leftovers = leftovers[converted.isna()]
+    return parsed
+
+
+def _infer_format(values: pd.Series, column: Optional[str], tried: Set[str]) -> Optional[str]:
+    """Formato candidato que reconhece mais valores da amostra (o da coluna, se ainda servir)"""
+    sample = values.iloc[:50]
+    cached = _inferred_formats.get(column) if column else None
+    if cached is not None and cached not in tried:
+        if pd.to_datetime(sample, format=cached, errors='coerce').notna().all():
+            return cached
+
+    best_format, best_count = None, 0
+    for date_format in CANDIDATE_FORMATS:
+        if date_format in tried:
+            continue
+        count = int(pd.to_datetime(sample, format=date_format, errors='coerce').notna().sum())
+        if count > best_count:
+            best_format, best_count = date_format, count
+
+    if best_format is not None and column and cached is None:
+        _inferred_formats[column] = best_format
+    return best_format
+
+
+def normalize_date_columns(df: pd.DataFrame, columns: Iterable[DateColumn],
+                           offset_hours: Optional[float] = None) -> pd.DataFrame:
+    """
+    Converte as colunas presentes em df para datetime64, aplica o ajuste de fuso uma única
+    vez e registra os nomes em df.attrs['normalized_date_columns']. Colunas já marcadas ou
+    que já contêm datas (ex.: lidas de um snapshot, que não guarda attrs) não recebem o
+    ajuste de novo
+    """
+    if offset_hours is None:
+        offset_hours = get_offset_hours()
+    offset = pd.Timedelta(hours=offset_hours)
+
+    normalized = set(df.attrs.get(NORMALIZED_ATTR, ()))
+    for column in columns:
+        if column.name not in df.columns or column.name in normalized:
+            continue
+        if _holds_converted_dates(df[column.name]):
+            df[column.name] = pd.to_datetime(df[column.name], errors='coerce')
+            normalized.add(column.name)
+            continue
+        values = parse_dates(df[column.name], column.name)
+        if column.shift:
+            values = values + offset
+        if column.date_only:
+            values = values.dt.normalize()
+        df[column.name] = values
+        normalized.add(column.name)
+
+    df.attrs[NORMALIZED_ATTR] = tuple(sorted(normalized))
+    return df
+
+
+def _holds_converted_dates(values: pd.Series) -> bool:
+    """datetime64 ou objetos date/datetime: valores que já passaram pela normalização"""
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return True
+    return pd.api.types.infer_dtype(values, skipna=True) in ('date', 'datetime', 'datetime64')
+
+
+def is_normalized(df: pd.DataFrame, column: str) -> bool:
+    """Indica se a coluna já passou por normalize_date_columns"""
+    return column in df.attrs.get(NORMALIZED_ATTR, ())
+
+
+def date_series(df: pd.DataFrame, column: str, date_only: bool = False) -> pd.Series:
+    """
+    Coluna de data pronta para uso nas páginas: a própria coluna quando já normalizada,
+    senão o resultado da mesma normalização (formato explícito e ajuste de fuso)
+    """
+    if is_normalized(df, column):
+        return df[column]
+    if _holds_converted_dates(df[column]):
+        return pd.to_datetime(df[column], errors='coerce')
+    values = parse_dates(df[column], column) + pd.Timedelta(hours=get_offset_hours())
+    return values.dt.normalize() if date_only else values
+
+
+def date_bounds(start: date, end: Optional[date]) -> Tuple[pd.Timestamp, Optional[pd.Timestamp]]:
+    """Limites [início, fim + 1 dia) para filtrar datetimes pelos dias de start a end (sem end, sem limite superior)"""
+    upper = None if end is None else pd.Timestamp(end) + pd.Timedelta(days=1)
+    return pd.Timestamp(start), upper
+
+
+def between_dates(values: pd.Series, start: date, end: Optional[date]) -> pd.Series:
+    """Máscara dos valores cujo dia está entre start e end (inclusive; sem end, a partir de start)"""
+    lower, upper = date_bounds(start, end)
+    if upper is None:
+        return values >= lower
+    return (values >= lower) & (values < upper)
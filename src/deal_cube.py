@@ -0,0 +1,148 @@
+"""
+Cubo pré-agregado dos deals
+Contagem de deals e soma de OPPORTUNITY por funil, responsável, estágio, flag de ganho,
+dia de criação e dia de venda. É montado uma vez por atualização dos dados; as tabelas
+por responsável das páginas são respondidas filtrando e somando as células do cubo.
+Sem filtro de período, as consultas usam a consolidação sem as dimensões de dia, com
+poucas centenas de células; com filtro, as células diárias
+"""
+
+from datetime import date
+from typing import Iterable, Optional, Tuple
+
+import pandas as pd
+
+from .date_normalization import between_dates
+
+
+DEAL_CUBE_ATTR = 'deal_cube'
+
+DateRangeFilter = Tuple[date, Optional[date]]
+
+
+class DealCube:
+    """Células (dimensões + DEALS + OPPORTUNITY) agregadas a partir de um frame de deals"""
+
+    DIMENSIONS = ('CATEGORY_ID', 'ASSIGNED_BY_NAME', 'STAGE_ID', 'STAGE_NAME', 'IS_WON', 'CREATE_DAY', 'SALE_DAY')
+    DAY_DIMENSIONS = ('CREATE_DAY', 'SALE_DAY')
+    MEASURES = ('DEALS', 'OPPORTUNITY')
+
+    __slots__ = ('_cells', '_rollup', '_source')
+
+    def __init__(self, cells: pd.DataFrame, rollup: Optional[pd.DataFrame] = None,
+                 source: Optional[Tuple[int, int]] = None):
+        self._cells = cells
+        self._rollup = rollup
+        self._source = source
+
+    @classmethod
+    def build(cls, df: pd.DataFrame) -> 'DealCube':
+        """Agrega o frame de deals (já processado pelo DataService) nas dimensões do cubo"""
+        keys = pd.DataFrame({
+            'CATEGORY_ID': df['CATEGORY_ID'] if 'CATEGORY_ID' in df.columns else pd.NA,
+            'ASSIGNED_BY_NAME': df['ASSIGNED_BY_NAME'] if 'ASSIGNED_BY_NAME' in df.columns else pd.NA,
+            'STAGE_ID': df['STAGE_ID'] if 'STAGE_ID' in df.columns else pd.NA,
+            'STAGE_NAME': df['STAGE_NAME'] if 'STAGE_NAME' in df.columns else pd.NA,
+            'IS_WON': df['IS_WON'] if 'IS_WON' in df.columns else False,
+            'CREATE_DAY': cls._days(df, 'DATE_CREATE'),
+            'SALE_DAY': cls._days(df, 'UF_CRM_DATA_FECHAMENTO1'),
+            'OPPORTUNITY': df['OPPORTUNITY'] if 'OPPORTUNITY' in df.columns else 0.0,
+        }, index=df.index)
+
+        cells = keys.groupby(list(cls.DIMENSIONS), observed=True, dropna=False, sort=False).agg(
+            DEALS=('OPPORTUNITY', 'size'),
+            OPPORTUNITY=('OPPORTUNITY', 'sum')
+        ).reset_index()
+
+        rollup_dimensions = [dimension for dimension in cls.DIMENSIONS if dimension not in cls.DAY_DIMENSIONS]
+        rollup = cells.groupby(rollup_dimensions, observed=True, dropna=False, sort=False)[list(cls.MEASURES)].sum().reset_index()
+        return cls(cells, rollup, cls._source_key(df))
+
+    @staticmethod
+    def _days(df: pd.DataFrame, column: str) -> pd.Series:
+        if column not in df.columns or not pd.api.types.is_datetime64_dtype(df[column].dtype):
+            return pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+        return df[column].dt.normalize()
+
+    @staticmethod
+    def _source_key(df: pd.DataFrame) -> Optional[Tuple[int, int]]:
+        if 'ID' not in df.columns:
+            return None
+        ids = df['ID'].to_numpy(copy=False)
+        return ids.__array_interface__['data'][0], len(ids)
+
+    def covers(self, df: pd.DataFrame) -> bool:
+        """Indica se o cubo foi montado sobre exatamente este frame (mesmo buffer congelado de ID)"""
+        if self._source is None or 'ID' not in df.columns:
+            return False
+        if df['ID'].to_numpy(copy=False).flags.writeable:
+            return False
+        return self._source == self._source_key(df)
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def __deepcopy__(self, memo) -> 'DealCube':
+        # Imutável: cópias do frame (e de df.attrs) compartilham o mesmo cubo
+        return self
+
+    @property
+    def cells(self) -> pd.DataFrame:
+        return self._cells
+
+    def filter(self, stages: Optional[Iterable[str]] = None,
+               responsaveis: Optional[Iterable[str]] = None,
+               created: Optional[DateRangeFilter] = None,
+               sold: Optional[DateRangeFilter] = None) -> 'DealCube':
+        """
+        Cubo restrito às células dos estágios e responsáveis informados e aos períodos de
+        criação e de venda ((início, fim) inclusive; fim None para "a partir de"),
+        com a mesma semântica dos filtros das páginas sobre o frame de deals
+        """
+        # Sem filtro de período as células diárias não são necessárias
+        cells = self._rollup if created is None and sold is None and self._rollup is not None else self._cells
+        mask = pd.Series(True, index=cells.index)
+        if stages:
+            mask &= cells['STAGE_NAME'].isin(list(stages))
+        if responsaveis:
+            mask &= cells['ASSIGNED_BY_NAME'].isin(list(responsaveis))
+        if created is not None:
+            mask &= between_dates(cells['CREATE_DAY'], *created)
+        if sold is not None:
+            mask &= between_dates(cells['SALE_DAY'], *sold)
+        return DealCube(cells[mask])
+
+    def without_missing(self, dimension: str) -> 'DealCube':
+        """Cubo sem as células com a dimensão vazia (ex.: deals sem responsável)"""
+        return DealCube(self._cells[self._cells[dimension].notna()])
+
+    def where(self, **values) -> 'DealCube':
+        """Cubo restrito às células com as dimensões iguais aos valores (ex.: IS_WON=True)"""
+        mask = pd.Series(True, index=self._cells.index)
+        for dimension, value in values.items():
+            mask &= self._cells[dimension] == value
+        return DealCube(self._cells[mask])
+
+    def totals(self, by: str, measure: str = 'DEALS') -> pd.Series:
+        """Soma da medida por valor da dimensão (equivalente a groupby(by).size() para DEALS)"""
+        return self._cells.groupby(by, observed=True)[measure].sum()
+
+    def pivot(self, index: str, columns: str, measure: str = 'DEALS') -> pd.DataFrame:
+        """Tabela index × columns com a soma da medida (equivalente ao pivot_table aggfunc='size')"""
+        table = self._cells.groupby([index, columns], observed=True)[measure].sum().unstack(fill_value=0)
+        table.columns.name = columns
+        return table
+
+
+def attach_deal_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """Monta o cubo do frame e o guarda em df.attrs['deal_cube']"""
+    df.attrs[DEAL_CUBE_ATTR] = DealCube.build(df)
+    return df
+
+
+def get_deal_cube(df: pd.DataFrame) -> DealCube:
+    """Cubo pré-agregado do frame, se ainda for o mesmo sobre o qual foi montado; senão, montado agora"""
+    cube = df.attrs.get(DEAL_CUBE_ATTR)
+    if cube is not None and cube.covers(df):
+        return cube
+    return DealCube.build(df)
@@ -0,0 +1,141 @@
+"""
+Esquema de tipos dos DataFrames de deals processados
+Cada coluna conhecida tem um tipo declarado: estágios e funis viram categóricos com as
+categorias de FunilConfig, responsáveis viram categóricos, IDs são inteiros, flags são
+booleanas e os numéricos são reduzidos ao menor tipo que comporta os valores
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from config.funis_config import FunilConfig
+
+
+@dataclass(frozen=True)
+class ColumnType:
+    """Tipo declarado de uma coluna"""
+    kind: str # 'id', 'small_int', 'category', 'bool', 'money', 'count'
+    required: bool = False
+
+
+class DealFrameSchema:
+    """Aplica e valida o esquema dos deals processados (uma vez, na ingestão)"""
+
+    # Nomes de estágio usados quando o STAGE_ID não está na configuração dos funis
+    FALLBACK_STAGE_NAMES = ('NEGÓCIO FECHADO', 'NEGÓCIO PERDIDO', 'EM ANDAMENTO', 'INDEFINIDO')
+    STAGE_SEMANTICS = ('P', 'S', 'F')
+
+    COLUMNS: Dict[str, ColumnType] = {
+        'ID': ColumnType('id', required=True),
+        'DEAL_ID': ColumnType('id'),
+        'CATEGORY_ID': ColumnType('small_int'),
+        'STAGE_ID': ColumnType('category'),
+        'STAGE_NAME': ColumnType('category'),
+        'STAGE_SEMANTIC': ColumnType('category'),
+        'CATEGORY_NAME': ColumnType('category'),
+        'ASSIGNED_BY_NAME': ColumnType('category'),
+        'UF_CRM_ASSISTENTE_JURIDICO': ColumnType('category'),
+        'IS_WON': ColumnType('bool'),
+        'IS_LOST': ColumnType('bool'),
+        'IS_ACTIVE': ColumnType('bool'),
+        # Valores monetários continuam float64: float32 perde os centavos a partir de ~100 mil
+        'OPPORTUNITY': ColumnType('money'),
+        'DAYS_IN_FUNNEL': ColumnType('count'),
+        'STAGE_SORT_ORDER': ColumnType('count'),
+    }
+
+    @classmethod
+    def known_categories(cls, column: str) -> Tuple[str, ...]:
+        """Categorias conhecidas de antemão (FunilConfig); responsáveis vêm apenas dos dados"""
+        registry = FunilConfig.registry()
+        if column == 'STAGE_ID':
+            values = list(registry.stages_by_id)
+        elif column == 'STAGE_NAME':
+            values = [name for names in registry.stage_names_by_category.values() for name in names]
+            values.extend(cls.FALLBACK_STAGE_NAMES)
+        elif column == 'CATEGORY_NAME':
+            values = [category.category_name for category in registry.categories.values()]
+        elif column == 'STAGE_SEMANTIC':
+            values = list(cls.STAGE_SEMANTICS)
+        else:
+            values = []
+        return tuple(dict.fromkeys(values))
+
+    @classmethod
+    def apply(cls, df: pd.DataFrame) -> pd.DataFrame:
+        """Converte as colunas declaradas e avisa (st.warning) se o resultado não passar na validação"""
+        if df.empty:
+            return df
+
+        for column, column_type in cls.COLUMNS.items():
+            if column in df.columns:
+                df[column] = cls._convert(df[column], column, column_type.kind)
+
+        problems = cls.validate(df)
+        if problems:
+            st.warning("Dados de deals fora do esquema esperado: " + "; ".join(problems))
+        return df
+
+    @classmethod
+    def validate(cls, df: pd.DataFrame) -> List[str]:
+        """Retorna a lista de divergências entre o DataFrame e o esquema declarado"""
+        problems = []
+        for column, column_type in cls.COLUMNS.items():
+            if column not in df.columns:
+                if column_type.required:
+                    problems.append(f"coluna obrigatória '{column}' ausente")
+                continue
+
+            series = df[column]
+            if column_type.kind == 'id' and series.isna().any():
+                problems.append(f"{int(series.isna().sum())} valores inválidos em '{column}'")
+            if not cls._has_declared_dtype(series, column_type.kind):
+                problems.append(f"'{column}' com tipo {series.dtype}")
+        return problems
+
+    @classmethod
+    def _convert(cls, series: pd.Series, column: str, kind: str) -> pd.Series:
+        if kind == 'id':
+            values = pd.to_numeric(series, errors='coerce')
+            return values.astype('Int64' if values.isna().any() else 'int64')
+        if kind == 'small_int':
+            return pd.to_numeric(series, errors='coerce', downcast='integer')
+        if kind == 'category':
+            return cls._to_category(series, cls.known_categories(column))
+        if kind == 'bool':
+            return series.fillna(False).astype(bool)
+        if kind == 'money':
+            return pd.to_numeric(series, errors='coerce').astype('float64')
+        if kind == 'count':
+            values = pd.to_numeric(series, errors='coerce')
+            return pd.to_numeric(values, downcast='float' if values.isna().any() else 'integer')
+        return series
+
+    @staticmethod
+    def _to_category(series: pd.Series, known: Tuple[str, ...]) -> pd.Series:
+        """Categórico com as categorias conhecidas seguidas das demais presentes nos dados"""
+        present = pd.unique(series.dropna().astype(object))
+        known_set = set(known)
+        extras = sorted((value for value in present if value not in known_set), key=str)
+        return pd.Series(
+            pd.Categorical(series.astype(object), categories=list(known) + extras),
+            index=series.index,
+            name=series.name
+        )
+
+    @staticmethod
+    def _has_declared_dtype(series: pd.Series, kind: str) -> bool:
+        if kind == 'id':
+            return pd.api.types.is_integer_dtype(series.dtype)
+        if kind == 'small_int':
+            return pd.api.types.is_numeric_dtype(series.dtype)
+        if kind == 'category':
+            return isinstance(series.dtype, pd.CategoricalDtype)
+        if kind == 'bool':
+            return pd.api.types.is_bool_dtype(series.dtype)
+        if kind in ('money', 'count'):
+            return pd.api.types.is_numeric_dtype(series.dtype)
+        return True
@@ -1,11 +1,24 @@
+import logging
+import math
+import multiprocessing
+import os
 import pandas as pd
 import re
-import locale
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from decimal import Decimal, InvalidOperation
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import streamlit as st
 from dateutil.relativedelta import relativedelta
 
+from .parcelas_memo import get_parcelas_memo
+
+logger = logging.getLogger("jusgestante.parcelas")
+
+DEFAULT_PARALLEL_WORKERS = 0 # Modo paralelo desligado por padrão
+DEFAULT_PARALLEL_MIN_DESCRIPTIONS = 2000 # Abaixo disso a criação do pool custa mais do que economiza
+PARALLEL_CHUNKS_PER_WORKER = 4
+
 def clean_currency(value):
     """Converte uma string de moeda para um valor numérico (Decimal)."""
     if isinstance(value, str):
@@ -129,6 +142,32 @@ def _to_float(s: str) -> float:
     except ValueError:
         return 0.0
 
+# Formato de resumo: "6 parcelas de R$ 2.000,00 ... vencível a primeira dia DD/MM/AAAA"
+_SUMMARY_PATTERN = re.compile(r'(\d+)\s*parcelas\s+de\s+R\$\s*([\d.,]*\d)', re.IGNORECASE)
+_SUMMARY_DATE_PATTERN = re.compile(r'venc[íi]vel\s+a\s+primeira\s*(?:dia)?\s*(\d{2}\/\d{2}\/\d{4})', re.IGNORECASE)
+
+# Itens de uma linha de parcela, reconhecidos em uma única passada (finditer): número da
+# parcela, vencimento ("até ..."), pagamento ("pago em ..."), líquido ("= R$ ...") e valores
+# em R$. Os itens são lookaheads (largura zero), então podem se sobrepor como nas buscas
+# separadas de antes: o líquido também conta como valor e o ano de "até 10/06/2025 parcela"
+# também pode ser lido como número. "R$" é sensível a maiúsculas, como antes. O primeiro
+# lookahead descarta de imediato as posições que não podem iniciar nenhum item, e o número
+# só é tentado no início de uma sequência de dígitos (onde a busca antiga o encontraria)
+_PARCELA_TOKEN_PATTERN = re.compile(
+    r'(?=[\dARPE=])(?='
+    r'(?<!\d)(?P<numero>\d+)[ªº°]?\s*parcela'
+    r'|até\s*(?:o\s+dia\s+|dia\s+)?(?P<vencimento>\d{2}/\d{2}/\d{4})'
+    r'|(?:realizado|reliazado|pago|efetuado|pix)\s*(?:em)?\s*(?P<pagamento>\d{2}/\d{2}/\d{4})'
+    r'|=\s*(?-i:R\$)\s*(?P<liquido>[\d.,]*\d)'
+    r'|(?-i:R\$)\s*(?P<valor>[\d.,]*\d)'
+    r')',
+    re.IGNORECASE
+)
+
+def _parse_date(texto_data: str) -> date:
+    """Converte DD/MM/AAAA (já validado pela regex) em date; datas inexistentes geram ValueError, como no strptime."""
+    return date(int(texto_data[6:10]), int(texto_data[3:5]), int(texto_data[0:2]))
+
 def parse_summary_format(texto):
     """
     Analisa formatos de resumo como "6 parcelas de R$ 2.000,00...".
@@ -136,11 +175,11 @@ def parse_summary_format(texto):
     try:
         texto_limpo = texto.replace('\n', ' ').replace('\r', ' ')
 
-        summary_pattern = re.search(r'(\d+)\s*parcelas\s+de\s+R\$\s*([\d.,]*\d)', texto_limpo, re.IGNORECASE)
+        summary_pattern = _SUMMARY_PATTERN.search(texto_limpo)
         if not summary_pattern:
             return []
 
-        date_pattern = re.search(r'venc[íi]vel\s+a\s+primeira\s*(?:dia)?\s*(\d{2}\/\d{2}\/\d{4})', texto_limpo, re.IGNORECASE)
+        date_pattern = _SUMMARY_DATE_PATTERN.search(texto_limpo)
         if not date_pattern:
             return []
             
@@ -149,7 +188,7 @@ def parse_summary_format(texto):
         valor = _to_float(valor_str)
         data_inicio_str = date_pattern.group(1)
         
-        data_inicio = datetime.strptime(data_inicio_str, '%d/%m/%Y').date()
+        data_inicio = _parse_date(data_inicio_str)
 
         parcelas = []
         for i in range(num_parcelas):
@@ -171,41 +210,45 @@ def parse_summary_format(texto):
 def extract_parcela_info(texto_parcela):
     """
     Extrai informações de uma única linha de parcela.
+    A linha é percorrida uma vez pelos itens de _PARCELA_TOKEN_PATTERN; de número, vencimento,
+    pagamento e líquido vale a primeira ocorrência, e os valores em R$ são guardados em ordem.
     """
-    try:
-        locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
-    except:
-        pass
-
-    numero_pattern = re.search(r'(\d+)[ªº°]?\s*parcela', texto_parcela, re.IGNORECASE)
-    data_pattern = re.search(r'até\s*(?:o\s+dia\s+|dia\s+)?(\d{2}\/\d{2}\/\d{4})', texto_parcela, re.IGNORECASE)
-    realizado_pattern = re.search(r'(?:realizado|reliazado|pago|efetuado|pix)\s*(?:em)?\s*(\d{2}\/\d{2}\/\d{4})', texto_parcela, re.IGNORECASE)
-    
-    # Regex ajustado para não capturar pontuação no final do número
-    valores = re.findall(r'R\$\s*([\d.,]*\d)', texto_parcela)
-    valores_float = [_to_float(v) for v in valores]
+    numero = data_vencimento = data_pagamento = valor_liquido = None
+    valores_float = []
+
+    for token in _PARCELA_TOKEN_PATTERN.finditer(texto_parcela):
+        kind = token.lastgroup
+        if kind == 'valor':
+            valores_float.append(_to_float(token.group('valor')))
+        elif kind == 'numero':
+            if numero is None:
+                numero = int(token.group('numero'))
+        elif kind == 'vencimento':
+            if data_vencimento is None:
+                data_vencimento = token.group('vencimento')
+        elif kind == 'pagamento':
+            if data_pagamento is None:
+                data_pagamento = token.group('pagamento')
+        elif valor_liquido is None:
+            valor_liquido = _to_float(token.group('liquido'))
 
     parcela_info = {
-        'numero': int(numero_pattern.group(1)) if numero_pattern else None,
+        'numero': numero,
         'valor_acordo': None, 'valor_honorarios': None, 'valor_honorarios_adicionais': [], 'valor_liquido': None,
-        'data_vencimento': datetime.strptime(data_pattern.group(1), '%d/%m/%Y').date() if data_pattern else None,
+        'data_vencimento': _parse_date(data_vencimento) if data_vencimento else None,
         'status': 'Pendente', 'data_pagamento': None
     }
 
-    if realizado_pattern:
+    if data_pagamento:
         parcela_info['status'] = 'Pago'
-        if realizado_pattern.group(1):
-            try:
-                parcela_info['data_pagamento'] = datetime.strptime(realizado_pattern.group(1), '%d/%m/%Y').date()
-            except (ValueError, IndexError):
-                pass
+        try:
+            parcela_info['data_pagamento'] = _parse_date(data_pagamento)
+        except ValueError:
+            pass
     
     if valores_float:
         parcela_info['valor_acordo'] = valores_float[0]
-        
-        liquido_match = re.search(r'=\s*R\$\s*([\d.,]*\d)', texto_parcela)
-        if liquido_match:
-            parcela_info['valor_liquido'] = _to_float(liquido_match.group(1))
+        parcela_info['valor_liquido'] = valor_liquido
         
         honorarios_candidatos = []
         if len(valores_float) > 1:
@@ -259,6 +302,56 @@ def analyze_parcelas(texto):
 
     return []
 
+def _analyze_parcelas_chunk(textos):
+    """Analisa um bloco de descrições em um processo do pool (precisa ser de nível de módulo para o pickle)."""
+    return [analyze_parcelas(texto) for texto in textos]
+
+def _pool_context():
+    """
+    Contexto dos processos do pool. O padrão no Linux (fork) copiaria o servidor do
+    Streamlit, com as travas que outras threads seguram no momento (logging, importação,
+    cache compartilhado), e os processos filhos poderiam travar; forkserver (ou spawn,
+    onde não existe) parte de um processo limpo.
+    """
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(start_method)
+
+def _parallel_parsing_settings():
+    """Processos do pool (0 desliga o modo paralelo) e tamanho mínimo do lote para usá-lo."""
+    parsing_settings = st.secrets.get("parcelas", {})
+    return (
+        int(parsing_settings.get("parallel_workers", DEFAULT_PARALLEL_WORKERS)),
+        int(parsing_settings.get("parallel_min_descriptions", DEFAULT_PARALLEL_MIN_DESCRIPTIONS))
+    )
+
+def analyze_parcelas_batch(textos, workers=None, min_parallel=None):
+    """
+    Analisa uma lista de descrições, devolvendo os resultados na mesma ordem.
+    Com o modo paralelo ativo (parcelas.parallel_workers > 0) e lotes de pelo menos
+    parcelas.parallel_min_descriptions textos, os blocos são analisados em processos
+    separados (ProcessPoolExecutor.map preserva a ordem). Lotes menores ficam no próprio
+    processo, onde criar o pool custaria mais do que economiza.
+    """
+    textos = list(textos)
+    if workers is None or min_parallel is None:
+        configured_workers, configured_min_parallel = _parallel_parsing_settings()
+        workers = configured_workers if workers is None else workers
+        min_parallel = configured_min_parallel if min_parallel is None else min_parallel
+
+    workers = min(workers, os.cpu_count() or 1)
+    if workers <= 1 or len(textos) < max(min_parallel, 2):
+        return _analyze_parcelas_chunk(textos)
+
+    # Alguns blocos por processo equilibram a carga quando as descrições têm tamanhos diferentes
+    chunk_size = math.ceil(len(textos) / (workers * PARALLEL_CHUNKS_PER_WORKER))
+    chunks = [textos[start:start + chunk_size] for start in range(0, len(textos), chunk_size)]
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as executor:
+            return [parcela for resultado in executor.map(_analyze_parcelas_chunk, chunks) for parcela in resultado]
+    except (BrokenProcessPool, OSError) as e:
+        logger.warning("Falha no pool de processos das parcelas, analisando no próprio processo: %s", e)
+        return _analyze_parcelas_chunk(textos)
+
 def format_currency(value):
     """
     Formata um valor monetário para o padrão brasileiro.
@@ -307,9 +400,10 @@ def format_parcela_display(parcela):
 
     return texto
 
-def analyse_data(df):
+def prepare_data(df):
     """
-    Realiza a análise completa do DataFrame.
+    Renomeia as colunas principais, confere as obrigatórias e remove as linhas sem CPF.
+    Retorna o DataFrame e a lista de colunas ausentes (vazia quando está tudo certo).
     """
     # Verificar e renomear colunas se necessário
     column_mapping = {
@@ -329,30 +423,33 @@ def analyse_data(df):
     # Verificar se todas as colunas necessárias existem
     required_columns = ['CPF', 'VALOR DO ACORDO', 'HONORÁRIOS (30%)', 'PARCELAS DESCRITIVAS']
     missing_columns = [col for col in required_columns if col not in df.columns]
-    
     if missing_columns:
-        st.error(f"Colunas ausentes na planilha: {', '.join(missing_columns)}")
-        st.write("Colunas disponíveis:", df.columns.tolist())
-        return {
-            "total_acordos": Decimal('0'),
-            "total_honorarios": Decimal('0'),
-            "dataframe": df
-        }
+        return df, missing_columns
 
     # Limpeza de dados
     df = df.copy()
     df.dropna(subset=['CPF'], inplace=True)
     df.reset_index(drop=True, inplace=True)
+    return df, []
 
-    # Criar uma nova coluna com os resultados da análise
+def parcelas_descriptions(df):
+    """
+    Descrições das parcelas de um DataFrame preparado por prepare_data, como texto
+    (None quando não há coluna de parcelas).
+    """
     coluna_parcelas_descritivas = next((col for col in ['PARCELAS', 'PARCELAS DESCRITIVAS'] if col in df.columns), None)
-    
-    if coluna_parcelas_descritivas:
-        # FORÇA a coluna a ser do tipo string, preenchendo valores nulos/NaN com string vazia.
-        # Isso garante que a função de análise sempre receba o tipo de dado correto e não falhe silenciosamente.
-        df['ANALISE_PARCELAS'] = df[coluna_parcelas_descritivas].astype(str).fillna('').apply(analyze_parcelas)
-    else:
-        df['ANALISE_PARCELAS'] = [[] for _ in range(len(df))]
+    if coluna_parcelas_descritivas is None:
+        return None
+    # FORÇA a coluna a ser do tipo string, preenchendo valores nulos/NaN com string vazia.
+    # Isso garante que a função de análise sempre receba o tipo de dado correto e não falhe silenciosamente.
+    return df[coluna_parcelas_descritivas].astype(str).fillna('').tolist()
+
+def complete_analysis(df, analise_parcelas):
+    """
+    Grava as parcelas analisadas (uma lista por linha, na ordem de parcelas_descriptions)
+    e os valores numéricos no DataFrame preparado, e calcula os totais.
+    """
+    df['ANALISE_PARCELAS'] = analise_parcelas
 
     # Análise 1 e 2: Soma de Valores
     df['VALOR_ACORDO_NUM'] = df['VALOR DO ACORDO'].apply(clean_currency)
@@ -365,4 +462,42 @@ def analyse_data(df):
         "total_acordos": total_acordos,
         "total_honorarios": total_honorarios,
         "dataframe": df
-    } 
\ No newline at end of file
+    }
+
+def analyse_data(df):
+    """
+    Realiza a análise completa do DataFrame.
+    """
+    df, missing_columns = prepare_data(df)
+    if missing_columns:
+        st.error(f"Colunas ausentes na planilha: {', '.join(missing_columns)}")
+        st.write("Colunas disponíveis:", df.columns.tolist())
+        return {
+            "total_acordos": Decimal('0'),
+            "total_honorarios": Decimal('0'),
+            "dataframe": df
+        }
+
+    # Criar uma nova coluna com os resultados da análise. Descrições já analisadas (pelo
+    # hash do texto) vêm da memória de parcelas; as novas são analisadas em lote
+    # (em paralelo, se configurado)
+    descricoes = parcelas_descriptions(df)
+    if descricoes is None:
+        analise_parcelas = [[] for _ in range(len(df))]
+    else:
+        analise_parcelas = get_parcelas_memo().parse_many(descricoes, analyze_parcelas_batch)
+    return complete_analysis(df, analise_parcelas)
+
+def summarize_analysed_data(df):
+    """
+    Retorna os totais de um DataFrame já processado por analyse_data (por exemplo, o da
+    planilha financeira em cache), no mesmo formato do retorno de analyse_data.
+    """
+    if 'VALOR_ACORDO_NUM' not in df.columns or 'HONORARIOS_NUM' not in df.columns:
+        return analyse_data(df)
+
+    return {
+        "total_acordos": df['VALOR_ACORDO_NUM'].sum(),
+        "total_honorarios": df['HONORARIOS_NUM'].sum(),
+        "dataframe": df
+    }
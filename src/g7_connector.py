@@ -6,9 +6,13 @@ Responsável por montar e executar consultas otimizadas.
 import streamlit as st
 import requests
 import pandas as pd
+import time
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 
+from .bi_response import UnexpectedBiResponse, read_bi_frame
+from .concurrent_fetch import get_pooled_session, get_request_timing_log
+
 class G7ApiError(Exception):
     """Exceção específica para erros da API G7."""
     pass
@@ -41,34 +45,26 @@ class G7Connector:
             raise G7ApiError(f"Credencial para 'g7_bitrix' não encontrada no secrets.toml: {e}")
 
     def _create_session(self) -> requests.Session:
-        """Cria uma sessão HTTP configurada."""
-        session = requests.Session()
-        session.headers.update({
-            'Accept': 'application/json',
-            'Content-Type': 'application/json',
-            'User-Agent': 'Streamlit-JusGestante/1.0'
-        })
-        return session
+        """Retorna a sessão HTTP configurada, com pool de conexões compartilhado pelo processo."""
+        return get_pooled_session()
 
     def _execute_bi_query(self, table_name: str, payload: Dict) -> pd.DataFrame:
         """Executa uma consulta genérica no BI Connector e retorna um DataFrame."""
         url = f"{self._credentials.base_url}?token={self._credentials.token}&table={table_name}"
         
         for attempt in range(self._credentials.max_retries):
+            started_at = time.perf_counter()
             try:
-                response = self._session.post(url, json=payload, timeout=self._credentials.timeout)
-                response.raise_for_status()
-                response_data = response.json()
-                
-                if isinstance(response_data, list) and len(response_data) > 1:
-                    column_names = response_data[0]
-                    data_rows = response_data[1:]
-                    return pd.DataFrame(data_rows, columns=column_names)
-                elif isinstance(response_data, list) and len(response_data) <= 1:
-                    return pd.DataFrame()
-                else:
-                    raise G7ApiError(f"Formato de resposta inesperado da API para {table_name}: {response_data}")
+                with self._session.post(url, json=payload, timeout=self._credentials.timeout, stream=True) as response:
+                    response.raise_for_status()
+                    df = read_bi_frame(response)
+
+                if not df.empty:
+                    get_request_timing_log().record(f"g7:{table_name}", started_at, len(df))
+                return df
 
+            except UnexpectedBiResponse as e:
+                raise G7ApiError(f"Formato de resposta inesperado da API para {table_name}: {e.payload}")
             except requests.exceptions.RequestException as e:
                 if attempt == self._credentials.max_retries - 1:
                     raise G7ApiError(f"Falha na requisição para {table_name} após {self._credentials.max_retries} tentativas: {e}")
@@ -0,0 +1,150 @@
+"""
+Serviço de dados da G7 Assessoria
+Busca os conjuntos de dados da G7 usados no relatório de entrevista e os publica
+no cache compartilhado, para que a atualização possa rodar fora das páginas
+"""
+
+import logging
+import pandas as pd
+import streamlit as st
+
+from .bitrix_connector import BitrixDataCache
+from .concurrent_fetch import fetch_concurrently
+from .date_index import build_date_indexes
+from .date_normalization import DateColumn, normalize_date_columns
+from .g7_connector import G7Connector
+
+logger = logging.getLogger("jusgestante.g7")
+
+
+class G7DataService:
+    """Fornece os dados da G7 a partir do cache compartilhado, buscando na API quando necessário"""
+
+    CACHE_DURATION_SECONDS = 1800 # 30 minutos até o dado ser revalidado
+    UF_SELECT_FIELDS = ['DEAL_ID', 'UF_CRM_DEAL_ENVIADA_PROCESS', 'UF_CRM_DATA_FECHAMENTO1']
+    DATE_COLUMNS = (
+        DateColumn('UF_CRM_DEAL_ENVIADA_PROCESS'),
+        DateColumn('UF_CRM_DATA_FECHAMENTO1', date_only=True),
+    )
+    DATE_INDEX_COLUMNS = ('UF_CRM_DEAL_ENVIADA_PROCESS',)
+
+    FORMALIZACAO_CACHE_KEY = "g7_deals_formalizacao"
+    VENDAS_CACHE_KEY = "g7_deals_vendas"
+    SYNC_CHECK_CACHE_KEY = "g7_deals_sync_check"
+
+    def __init__(self):
+        self._connector = G7Connector()
+        self._cache = BitrixDataCache()
+
+    def get_formalizacao_data(self) -> pd.DataFrame:
+        """Negócios da G7 na etapa 'ENVIADO P/ FORMALIZAÇÃO' (UC_IV0DI0), usados na sincronização"""
+        cached_data = self._cache.get_cached_data(self.FORMALIZACAO_CACHE_KEY, revalidate=self.refresh_formalizacao_data)
+        if cached_data is not None:
+            return cached_data
+        return self.refresh_formalizacao_data()
+
+    def get_vendas_data(self) -> pd.DataFrame:
+        """Negócios do funil de Vendas da G7 (category_id = 0) sem filtro de etapa"""
+        cached_data = self._cache.get_cached_data(self.VENDAS_CACHE_KEY, revalidate=self.refresh_vendas_data)
+        if cached_data is not None:
+            return cached_data
+        return self.refresh_vendas_data()
+
+    def get_sync_check_data(self) -> pd.DataFrame:
+        """Negócios de Vendas da G7 fora da etapa 'UC_IV0DI0', para a verificação de sincronização"""
+        cached_data = self._cache.get_cached_data(self.SYNC_CHECK_CACHE_KEY, revalidate=self.refresh_sync_check_data)
+        if cached_data is not None:
+            return cached_data
+        return self.refresh_sync_check_data()
+
+    def refresh_formalizacao_data(self) -> pd.DataFrame:
+        """Busca na API e publica no cache os negócios em formalização"""
+        try:
+            full_df = self._fetch_deals_with_uf(
+                filter_params={'STAGE_ID': 'UC_IV0DI0'},
+                main_select_fields=['ID', 'TITLE', 'ASSIGNED_BY', 'OPPORTUNITY']
+            )
+        except Exception as e:
+            st.error(f"Erro ao buscar dados detalhados da G7: {e}")
+            return pd.DataFrame()
+        return self._publish(self.FORMALIZACAO_CACHE_KEY, full_df)
+
+    def refresh_vendas_data(self) -> pd.DataFrame:
+        """Busca na API e publica no cache os negócios do funil de Vendas"""
+        try:
+            full_df = self._fetch_deals_with_uf(
+                filter_params={'CATEGORY_ID': 0},
+                main_select_fields=['ID', 'TITLE', 'ASSIGNED_BY', 'OPPORTUNITY', 'CATEGORY_ID']
+            )
+        except Exception as e:
+            st.error(f"Erro ao buscar dados detalhados da G7 (all): {e}")
+            return pd.DataFrame()
+        return self._publish(self.VENDAS_CACHE_KEY, full_df)
+
+    def refresh_sync_check_data(self) -> pd.DataFrame:
+        """Busca na API e publica no cache os negócios usados na verificação de sincronização"""
+        try:
+            # Buscamos todos os negócios do funil de Vendas, o filtro de etapa será feito em pandas
+            df = self._connector.get_all_entities(
+                entity_name='crm_deal',
+                filter_params={'CATEGORY_ID': 0},
+                select_fields=['ID', 'STAGE_ID']
+            )
+        except Exception as e:
+            logger.warning("Erro ao buscar dados da G7 para verificação de sincronia: %s", e)
+            return pd.DataFrame()
+
+        if not df.empty:
+            # Filtro em pandas para excluir a etapa 'UC_IV0DI0'
+            df = df[df['STAGE_ID'] != 'UC_IV0DI0'].copy()
+        return self._publish(self.SYNC_CHECK_CACHE_KEY, df)
+
+    def refresh_all(self) -> None:
+        """Atualiza todos os conjuntos de dados da G7 no cache compartilhado (consultas em paralelo)"""
+        fetch_concurrently({
+            'g7_formalizacao': self.refresh_formalizacao_data,
+            'g7_vendas': self.refresh_vendas_data,
+            'g7_sincronizacao': self.refresh_sync_check_data,
+        })
+
+    def _fetch_deals_with_uf(self, filter_params: dict, main_select_fields: list) -> pd.DataFrame:
+        """Busca os negócios (crm_deal) e os enriquece com os campos personalizados (crm_deal_uf)"""
+        main_df = self._connector.get_all_entities(
+            entity_name='crm_deal',
+            filter_params=filter_params,
+            select_fields=main_select_fields
+        )
+
+        if main_df.empty:
+            return pd.DataFrame()
+
+        # A chave para filtrar e selecionar os campos UF é DEAL_ID
+        uf_df = self._connector.get_all_entities(
+            entity_name='crm_deal_uf',
+            filter_params={'DEAL_ID': main_df['ID'].tolist()},
+            select_fields=self.UF_SELECT_FIELDS
+        )
+
+        if not uf_df.empty:
+            # Converte IDs para o mesmo tipo para garantir a junção correta
+            main_df['ID'] = main_df['ID'].astype(str)
+            uf_df['DEAL_ID'] = uf_df['DEAL_ID'].astype(str)
+            full_df = pd.merge(main_df, uf_df, left_on='ID', right_on='DEAL_ID', how='left')
+        else:
+            full_df = main_df
+            # Adiciona colunas UF vazias para evitar erros posteriores se não houver dados UF
+            if 'UF_CRM_DEAL_ENVIADA_PROCESS' not in full_df.columns:
+                full_df['UF_CRM_DEAL_ENVIADA_PROCESS'] = pd.NaT
+            if 'UF_CRM_DATA_FECHAMENTO1' not in full_df.columns:
+                full_df['UF_CRM_DATA_FECHAMENTO1'] = pd.NaT
+
+        if 'OPPORTUNITY' in full_df.columns:
+            full_df['OPPORTUNITY'] = pd.to_numeric(full_df['OPPORTUNITY'], errors='coerce').fillna(0)
+
+        full_df = normalize_date_columns(full_df, self.DATE_COLUMNS)
+        return build_date_indexes(full_df, self.DATE_INDEX_COLUMNS)
+
+    def _publish(self, cache_key: str, df: pd.DataFrame) -> pd.DataFrame:
+        self._cache.set_cache_data(cache_key, df, expires_in_seconds=self.CACHE_DURATION_SECONDS)
+        # Cópia rasa: o frame armazenado é compartilhado entre as sessões
+        return df.copy(deep=False)
@@ -1,8 +1,31 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
 import pandas as pd
 from google.oauth2.service_account import Credentials
 import gspread
+from gspread.utils import absolute_range_name, fill_gaps
 import streamlit as st
 
+from .concurrent_fetch import get_request_timing_log
+from .finance_analyzer import analyze_parcelas_batch, complete_analysis, parcelas_descriptions, prepare_data
+from .instrumentation import span
+from .parcelas_memo import get_parcelas_memo
+from .shared_cache import get_shared_cache
+
+logger = logging.getLogger("jusgestante.sheets")
+
+FINANCEIRO_CACHE_KEY = "sheets_financeiro"
+FINANCEIRO_STALE_AFTER_SECONDS = 900 # 15 minutos até o dado ser revalidado
+FINANCEIRO_CACHE_DURATION_SECONDS = 4 * 3600 # depois disso a página espera a nova carga
+SHEETS_RANGES_PER_REQUEST = 100 # Abas por chamada values.batchGet (os ranges vão na URL)
+FINANCEIRO_REQUIRED_COLUMNS = ['CPF', 'NOME', 'VALOR DO ACORDO', 'HONORÁRIOS (30%)', 'PARCELAS DESCRITIVAS']
+
 class GoogleSheetsService:
     def __init__(self):
         """Inicializa o serviço do Google Sheets."""
@@ -33,114 +56,306 @@ class GoogleSheetsService:
             worksheet = spreadsheet.worksheet(worksheet_name)
             
             # Obter todos os valores
-            all_values = worksheet.get_all_values()
-            if not all_values or len(all_values) < 3:  # Precisamos de pelo menos 3 linhas (título, cabeçalho e dados)
-                return pd.DataFrame()
-
-            # Encontrar a linha do cabeçalho real (geralmente a segunda linha)
-            header_row = 1  # índice da linha do cabeçalho (0-based)
-            
-            # Procurar a linha que contém "CPF" ou "NOME"
-            for i, row in enumerate(all_values[:5]):  # Procurar apenas nas primeiras 5 linhas
-                if any(col.strip().upper() in ['CPF', 'NOME'] for col in row):
-                    header_row = i
-                    break
-            
-            # Pegar o cabeçalho e os dados
-            headers = all_values[header_row]
-            data = all_values[header_row + 1:]  # Dados começam após o cabeçalho
-            
-            # Limpar os cabeçalhos
-            headers = [h.strip() for h in headers]
-            
-            # Criar cabeçalhos únicos para colunas não vazias
-            unique_headers = []
-            header_count = {}
-            
-            for i, header in enumerate(headers):
-                if not header:  # Se o cabeçalho estiver vazio
-                    header = f"Coluna_{i}"
-                
-                if header in header_count:
-                    header_count[header] += 1
-                    unique_headers.append(f"{header}_{header_count[header]}")
-                else:
-                    header_count[header] = 1
-                    unique_headers.append(header)
-            
-            # Criar DataFrame
-            df = pd.DataFrame(data, columns=unique_headers)
-            
-            # Remover linhas vazias ou que contenham apenas valores vazios/None
-            df = df.dropna(how='all')
-            
-            # Remover linhas que não contêm dados válidos (ex: linhas de totais, cabeçalhos repetidos, etc)
-            df = df[~df.iloc[:, 0].str.contains('total', case=False, na=False)]
-            
-            # Mapear as colunas principais
-            column_mapping = {
-                'CPF': ['CPF', 'CPF_1', 'CPF_2'],
-                'NOME': ['NOME', 'NOME_1', 'NOME_2'],
-                'VALOR DO ACORDO': ['VALOR DO ACORDO', 'VALOR DO ACORDO_1', 'VALOR DO ACORDO_2', 'VALOR ACORDO'],
-                'HONORÁRIOS (30%)': ['HONORÁRIOS (30%)', 'HONORÁRIOS (30%)_1', 'HONORÁRIOS (30%)_2', 'HONORARIOS'],
-                'PARCELAS DESCRITIVAS': ['PARCELAS DESCRITIVAS', 'PARCELAS DESCRITIVAS_1', 'PARCELAS DESCRITIVAS_2', 'PARCELAS']
-            }
-
-            # Renomear colunas
-            for target_col, possible_names in column_mapping.items():
-                for col_name in possible_names:
-                    if col_name in df.columns:
-                        df = df.rename(columns={col_name: target_col})
-                        break
-            
-            return df
+            return self.build_worksheet_frame(worksheet.get_all_values())
             
         except Exception as e:
             st.error(f"Erro ao obter dados da worksheet {worksheet_name}: {str(e)}")
             return pd.DataFrame()
 
-def carregar_dados():
-    """Carrega todos os dados da planilha do Google Sheets."""
-    try:
-        # Inicializa o serviço
-        service = GoogleSheetsService()
-        
-        # Obtém a URL da planilha dos secrets
-        spreadsheet_url = st.secrets["financeiro"]["spreadsheet_url"]
+    def get_worksheets_values(self, spreadsheet, worksheet_names: List[str]) -> Dict[str, List[List[str]]]:
+        """
+        Obtém os valores de todas as worksheets com values.batchGet (uma chamada a cada
+        SHEETS_RANGES_PER_REQUEST abas, em vez de uma por aba). Cada aba vem como em
+        get_all_values: linhas completadas com "" até a largura da maior linha
+        """
+        values_by_name: Dict[str, List[List[str]]] = {}
+        for start in range(0, len(worksheet_names), SHEETS_RANGES_PER_REQUEST):
+            names = worksheet_names[start:start + SHEETS_RANGES_PER_REQUEST]
+            started_at = time.perf_counter()
+            with span("sheets:values_batch_get"):
+                response = spreadsheet.values_batch_get([absolute_range_name(name) for name in names])
+            get_request_timing_log().record(f"sheets:batchGet ({len(names)} abas)", started_at)
+
+            # valueRanges vem na mesma ordem dos ranges pedidos; abas vazias não têm 'values'
+            for name, value_range in zip(names, response.get('valueRanges', [])):
+                values_by_name[name] = fill_gaps(value_range.get('values', []))
+        return values_by_name
+
+    @staticmethod
+    def build_worksheet_frame(all_values: List[List[str]]) -> pd.DataFrame:
+        """Monta o DataFrame de uma aba a partir dos valores (título, cabeçalho e dados)."""
+        if not all_values or len(all_values) < 3:  # Precisamos de pelo menos 3 linhas (título, cabeçalho e dados)
+            return pd.DataFrame()
+
+        # Encontrar a linha do cabeçalho real (geralmente a segunda linha)
+        header_row = 1  # índice da linha do cabeçalho (0-based)
         
-        # Abre a planilha
-        spreadsheet = service.get_spreadsheet(spreadsheet_url)
-        if not spreadsheet:
-            return None
+        # Procurar a linha que contém "CPF" ou "NOME"
+        for i, row in enumerate(all_values[:5]):  # Procurar apenas nas primeiras 5 linhas
+            if any(col.strip().upper() in ['CPF', 'NOME'] for col in row):
+                header_row = i
+                break
         
-        # Lista todas as worksheets
-        worksheet_titles = [ws.title for ws in spreadsheet.worksheets()]
+        # Pegar o cabeçalho e os dados
+        headers = all_values[header_row]
+        data = all_values[header_row + 1:]  # Dados começam após o cabeçalho
         
-        # Lista para armazenar todos os DataFrames
-        all_data = []
+        # Limpar os cabeçalhos
+        headers = [h.strip() for h in headers]
         
-        # Carrega dados de cada worksheet
-        for month in worksheet_titles:
-            df = service.get_worksheet_data(spreadsheet, month)
-            if not df.empty:
-                # Adiciona uma coluna com o nome do mês
-                df['MÊS'] = month
-                all_data.append(df)
+        # Criar cabeçalhos únicos para colunas não vazias
+        unique_headers = []
+        header_count = {}
         
-        # Combina todos os DataFrames
-        if all_data:
-            df_final = pd.concat(all_data, ignore_index=True)
+        for i, header in enumerate(headers):
+            if not header:  # Se o cabeçalho estiver vazio
+                header = f"Coluna_{i}"
             
-            # Garantir que todas as colunas necessárias existam
-            required_columns = ['CPF', 'NOME', 'VALOR DO ACORDO', 'HONORÁRIOS (30%)', 'PARCELAS DESCRITIVAS']
-            for col in required_columns:
-                if col not in df_final.columns:
-                    df_final[col] = None
-            
-            return df_final
-        else:
+            if header in header_count:
+                header_count[header] += 1
+                unique_headers.append(f"{header}_{header_count[header]}")
+            else:
+                header_count[header] = 1
+                unique_headers.append(header)
+        
+        # Criar DataFrame
+        df = pd.DataFrame(data, columns=unique_headers)
+        
+        # Remover linhas vazias ou que contenham apenas valores vazios/None
+        df = df.dropna(how='all')
+        
+        # Remover linhas que não contêm dados válidos (ex: linhas de totais, cabeçalhos repetidos, etc)
+        df = df[~df.iloc[:, 0].str.contains('total', case=False, na=False)]
+        
+        # Mapear as colunas principais
+        column_mapping = {
+            'CPF': ['CPF', 'CPF_1', 'CPF_2'],
+            'NOME': ['NOME', 'NOME_1', 'NOME_2'],
+            'VALOR DO ACORDO': ['VALOR DO ACORDO', 'VALOR DO ACORDO_1', 'VALOR DO ACORDO_2', 'VALOR ACORDO'],
+            'HONORÁRIOS (30%)': ['HONORÁRIOS (30%)', 'HONORÁRIOS (30%)_1', 'HONORÁRIOS (30%)_2', 'HONORARIOS'],
+            'PARCELAS DESCRITIVAS': ['PARCELAS DESCRITIVAS', 'PARCELAS DESCRITIVAS_1', 'PARCELAS DESCRITIVAS_2', 'PARCELAS']
+        }
+
+        # Renomear colunas
+        for target_col, possible_names in column_mapping.items():
+            for col_name in possible_names:
+                if col_name in df.columns:
+                    df = df.rename(columns={col_name: target_col})
+                    break
+        
+        return df
+
+@dataclass
+class FinanceTab:
+    """Aba da planilha financeira já analisada: hash dos valores baixados e frame resultante"""
+    digest: str
+    frame: pd.DataFrame
+
+
+@dataclass
+class PendingFinanceTab:
+    """
+    Aba alterada já montada, à espera da análise das parcelas em lote com as demais:
+    descricoes são os textos de PARCELAS DESCRITIVAS, na ordem das linhas do frame
+    """
+    digest: str
+    frame: pd.DataFrame
+    descricoes: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+
+class FinanceWorkbookCache:
+    """
+    Planilha financeira analisada, aba por aba, compartilhada pelo processo.
+    O serviço autenticado e a planilha aberta são reaproveitados entre as atualizações.
+    A cada atualização, a data de modificação da planilha no Drive (modifiedTime) diz se
+    há algo novo; se mudou, os valores de todas as abas são baixados em um values.batchGet
+    e só as abas com hash diferente do anterior são montadas e analisadas de novo, com as
+    parcelas de todas elas analisadas em um único lote.
+    Meses fechados são analisados uma única vez por processo
+    """
+
+    def __init__(self):
+        self._service: Optional[GoogleSheetsService] = None
+        self._spreadsheet = None
+        self._revision: Optional[str] = None
+        self._tabs: Dict[str, FinanceTab] = {}
+        self._frame: Optional[pd.DataFrame] = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> Optional[pd.DataFrame]:
+        """Atualiza as abas alteradas e publica o frame analisado no cache compartilhado"""
+        # Uma atualização por vez (revalidação em segundo plano, agendador e página)
+        with self._lock:
+            spreadsheet = self._open_spreadsheet()
+            if spreadsheet is None:
+                return None
+
+            revision = self._get_revision(spreadsheet)
+            if revision is None or revision != self._revision or self._frame is None:
+                try:
+                    self._frame, complete = self._load_changed_tabs(spreadsheet)
+                except Exception:
+                    # Planilha reaberta na próxima tentativa (URL ou permissão podem ter mudado)
+                    self._spreadsheet = None
+                    raise
+                # Com alguma aba com erro, a mesma revisão é carregada de novo na próxima vez
+                self._revision = revision if complete else None
+
+            if self._frame is None:
+                return None
+            get_shared_cache().set(
+                FINANCEIRO_CACHE_KEY, self._frame, FINANCEIRO_CACHE_DURATION_SECONDS,
+                stale_after_seconds=FINANCEIRO_STALE_AFTER_SECONDS
+            )
+            return self._frame.copy(deep=False)
+
+    def _open_spreadsheet(self):
+        if self._service is None or self._service.client is None:
+            self._service = GoogleSheetsService()
+            self._spreadsheet = None
+        if self._spreadsheet is None:
+            self._spreadsheet = self._service.get_spreadsheet(st.secrets["financeiro"]["spreadsheet_url"])
+        return self._spreadsheet
+
+    @staticmethod
+    def _get_revision(spreadsheet) -> Optional[str]:
+        """modifiedTime da planilha no Drive; sem ele, a atualização compara as abas pelo hash"""
+        try:
+            with span("sheets:modified_time"):
+                return spreadsheet.get_lastUpdateTime()
+        except Exception as e:
+            logger.warning("Não foi possível obter a data de modificação da planilha financeira: %s", e)
             return None
-            
+
+    def _load_changed_tabs(self, spreadsheet) -> Tuple[Optional[pd.DataFrame], bool]:
+        """
+        Frame combinado das abas e se todas as abas alteradas foram analisadas. Uma aba com
+        erro fica com a versão anterior (e o hash anterior, para ser tentada de novo)
+        """
+        # Lista todas as worksheets
+        worksheet_titles = [ws.title for ws in spreadsheet.worksheets()]
+
+        # Valores de todas as abas em uma única chamada (values.batchGet)
+        values_by_month = self._service.get_worksheets_values(spreadsheet, worksheet_titles)
+
+        # Monta só as abas alteradas, registrando o tempo de cada uma
+        timing_log = get_request_timing_log()
+        tabs: Dict[str, FinanceTab] = {}
+        pending: Dict[str, PendingFinanceTab] = {}
+        failed: List[str] = []
+        for month in worksheet_titles:
+            values = values_by_month.get(month, [])
+            digest = hashlib.sha256(json.dumps(values, ensure_ascii=False).encode("utf-8")).hexdigest()
+            cached_tab = self._tabs.get(month)
+            if cached_tab is not None and cached_tab.digest == digest:
+                tabs[month] = cached_tab
+                continue
+
+            started_at = time.perf_counter()
+            try:
+                with span(f"sheets:montar:{month}") as current:
+                    pending_tab = self._prepare_tab(values, month, digest)
+                    current.record(pending_tab.frame)
+            except Exception:
+                logger.exception("Erro ao obter dados da worksheet %s", month)
+                failed.append(month)
+                continue
+            pending_tab.elapsed = time.perf_counter() - started_at
+            pending[month] = pending_tab
+
+        # Parcelas de todas as abas alteradas analisadas juntas: uma chamada a parse_many
+        # (e no máximo um pool de processos) em vez de uma por aba
+        descricoes = [texto for tab in pending.values() for texto in tab.descricoes]
+        with span("sheets:analisar_parcelas"):
+            analises = get_parcelas_memo().parse_many(descricoes, analyze_parcelas_batch) if descricoes else []
+
+        # Devolve as análises a cada aba, na ordem em que as descrições foram juntadas
+        offset = 0
+        for month, pending_tab in pending.items():
+            tab_analises = analises[offset:offset + len(pending_tab.descricoes)]
+            offset += len(pending_tab.descricoes)
+
+            # O tempo da aba soma a montagem e as colunas calculadas (sem o lote de parcelas)
+            started_at = time.perf_counter() - pending_tab.elapsed
+            try:
+                with span(f"sheets:analisar:{month}") as current:
+                    df = self._complete_tab(pending_tab, tab_analises)
+                    current.record(df)
+            except Exception:
+                logger.exception("Erro ao obter dados da worksheet %s", month)
+                failed.append(month)
+                continue
+            timing_log.record(f"sheets:{month}", started_at, len(df))
+            tabs[month] = FinanceTab(digest=pending_tab.digest, frame=df)
+
+        # Abas com erro mantêm a versão anterior, se houver
+        for month in failed:
+            if month in self._tabs:
+                tabs[month] = self._tabs[month]
+
+        # Mantém a ordem das abas na planilha
+        tabs = {month: tabs[month] for month in worksheet_titles if month in tabs}
+
+        # Abas removidas da planilha saem junto
+        self._tabs = tabs
+
+        # Parcelas analisadas nesta atualização ficam em disco para o próximo reinício
+        get_parcelas_memo().save()
+
+        # Combina todos os DataFrames
+        all_data = [tab.frame for tab in tabs.values() if not tab.frame.empty]
+        if not all_data:
+            return None, not failed
+        return pd.concat(all_data, ignore_index=True), not failed
+
+    def _prepare_tab(self, values: List[List[str]], month: str, digest: str) -> "PendingFinanceTab":
+        """Frame da aba com MÊS e as colunas obrigatórias, preparado por prepare_data"""
+        df = self._service.build_worksheet_frame(values)
+        if df.empty:
+            return PendingFinanceTab(digest=digest, frame=df)
+
+        # Adiciona uma coluna com o nome do mês
+        df['MÊS'] = month
+
+        # Garantir que todas as colunas necessárias existam
+        for col in FINANCEIRO_REQUIRED_COLUMNS:
+            if col not in df.columns:
+                df[col] = None
+
+        # As colunas obrigatórias acabaram de ser garantidas: não há colunas ausentes
+        df, _ = prepare_data(df)
+        return PendingFinanceTab(digest=digest, frame=df, descricoes=parcelas_descriptions(df))
+
+    @staticmethod
+    def _complete_tab(pending_tab: "PendingFinanceTab", analises: List) -> pd.DataFrame:
+        """Colunas calculadas de analyse_data, com as parcelas já analisadas no lote"""
+        if pending_tab.frame.empty:
+            return pending_tab.frame
+        return complete_analysis(pending_tab.frame, analises)["dataframe"]
+
+
+@st.cache_resource
+def get_finance_workbook_cache() -> FinanceWorkbookCache:
+    """Retorna a instância única da planilha financeira analisada do processo"""
+    return FinanceWorkbookCache()
+
+
+def carregar_dados():
+    """
+    Retorna os dados da planilha financeira, já analisados (ANALISE_PARCELAS,
+    VALOR_ACORDO_NUM e HONORARIOS_NUM), a partir do cache compartilhado,
+    carregando do Google Sheets quando não houver dados em cache.
+    """
+    cached_data = get_shared_cache().get(FINANCEIRO_CACHE_KEY, revalidate=atualizar_dados_financeiros)
+    if cached_data is not None:
+        return cached_data
+    return atualizar_dados_financeiros()
+
+def atualizar_dados_financeiros():
+    """Atualiza as abas alteradas da planilha do Google Sheets e publica os dados no cache compartilhado."""
+    try:
+        return get_finance_workbook_cache().refresh()
     except Exception as e:
         st.error(f"Erro ao carregar dados: {str(e)}")
-        return None 
\ No newline at end of file
+        return None
@@ -0,0 +1,189 @@
+"""
+Sincronização incremental dos negócios (crm_deal)
+Mantém um snapshot por categoria e busca apenas os deals alterados desde a última marca d'água (DATE_MODIFY)
+"""
+
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from .bitrix_connector import BitrixConnector, DateRange
+from .date_normalization import parse_dates
+
+
+@dataclass
+class DealSnapshot:
+    """Snapshot bruto dos deals de um conjunto de categorias"""
+    deals: pd.DataFrame
+    watermark: Optional[pd.Timestamp]
+    last_full_sync: datetime
+
+
+SnapshotKey = Tuple[Tuple[int, ...], Tuple[str, ...]]
+
+
+class DealSnapshotRegistry:
+    """
+    Guarda os snapshots por categoria (e seleção de colunas), compartilhados
+    por todas as sessões do processo
+    """
+
+    def __init__(self):
+        self._snapshots: Dict[SnapshotKey, DealSnapshot] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: SnapshotKey) -> Optional[DealSnapshot]:
+        with self._lock:
+            return self._snapshots.get(key)
+
+    def put(self, key: SnapshotKey, snapshot: DealSnapshot) -> None:
+        with self._lock:
+            self._snapshots[key] = snapshot
+
+    def put_if_absent(self, key: SnapshotKey, snapshot: DealSnapshot) -> bool:
+        with self._lock:
+            if key in self._snapshots:
+                return False
+            self._snapshots[key] = snapshot
+            return True
+
+
+@st.cache_resource
+def get_snapshot_registry() -> DealSnapshotRegistry:
+    """Retorna o registro único de snapshots do processo"""
+    return DealSnapshotRegistry()
+
+
+class IncrementalDealSync:
+    """
+    Sincroniza os deals de uma ou mais categorias de forma incremental.
+    A primeira carga (e a reconciliação periódica) baixa a categoria inteira, o que
+    também remove do snapshot os deals excluídos ou movidos para outra categoria.
+    Nas demais, apenas os deals com DATE_MODIFY a partir da marca d'água são buscados
+    e mesclados pelo ID.
+    """
+
+    WATERMARK_COLUMN = 'DATE_MODIFY'
+    DEFAULT_FULL_RECONCILE_HOURS = 6
+
+    def __init__(self, connector: BitrixConnector):
+        self._connector = connector
+        self._registry = get_snapshot_registry()
+        sync_settings: Dict[str, Any] = st.secrets.get("sync", {})
+        self._enabled = bool(sync_settings.get("incremental", True))
+        self._full_reconcile_interval = timedelta(
+            hours=sync_settings.get("full_reconcile_hours", self.DEFAULT_FULL_RECONCILE_HOURS)
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def sync(self, category_ids: List[int], fields: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Retorna os deals brutos atualizados das categorias informadas.
+        Com fields, o snapshot guarda apenas essas colunas (mais ID e DATE_MODIFY,
+        necessárias para a mesclagem e a marca d'água).
+        """
+        # Cópia rasa para que o processamento não altere as colunas do snapshot
+        return self.sync_snapshot(category_ids, fields).deals.copy(deep=False)
+
+    def sync_snapshot(self, category_ids: List[int], fields: Optional[List[str]] = None) -> DealSnapshot:
+        """
+        Como sync, mas retorna o snapshot resultante: deals, marca d'água e horário da
+        última carga completa, coerentes entre si para serem gravados em disco
+        """
+        fields = self._with_sync_columns(fields)
+        key = self._snapshot_key(category_ids, fields)
+        snapshot = self._registry.get(key)
+
+        if snapshot is None or snapshot.watermark is None or self._needs_full_reconcile(snapshot):
+            snapshot = self._full_sync(category_ids, fields)
+        else:
+            snapshot = self._delta_sync(category_ids, snapshot, fields)
+
+        self._registry.put(key, snapshot)
+        return snapshot
+
+    def seed(self, category_ids: List[int], fields: Optional[List[str]], deals: pd.DataFrame,
+             watermark: Optional[pd.Timestamp], last_full_sync: datetime) -> bool:
+        """
+        Registra deals brutos lidos do disco (snapshot da última sincronização antes do
+        reinício), para que a próxima sincronização busque apenas o delta desde a marca
+        d'água. Não substitui um snapshot que o processo já tenha
+        """
+        if watermark is None or deals.empty:
+            return False
+        snapshot = DealSnapshot(deals=deals, watermark=watermark, last_full_sync=last_full_sync)
+        return self._registry.put_if_absent(self._snapshot_key(category_ids, self._with_sync_columns(fields)), snapshot)
+
+    @staticmethod
+    def _snapshot_key(category_ids: List[int], fields: Optional[List[str]]) -> SnapshotKey:
+        return tuple(sorted(category_ids)), tuple(fields or ())
+
+    def _needs_full_reconcile(self, snapshot: DealSnapshot) -> bool:
+        return datetime.now() - snapshot.last_full_sync >= self._full_reconcile_interval
+
+    @classmethod
+    def _with_sync_columns(cls, fields: Optional[List[str]]) -> Optional[List[str]]:
+        if fields is None:
+            return None
+        return list(dict.fromkeys(['ID', cls.WATERMARK_COLUMN] + list(fields)))
+
+    def _full_sync(self, category_ids: List[int], fields: Optional[List[str]]) -> DealSnapshot:
+        deals_df = self._connector.get_deals_data(category_ids=category_ids, fields=fields)
+        return DealSnapshot(
+            deals=deals_df,
+            watermark=self.compute_watermark(deals_df),
+            last_full_sync=datetime.now()
+        )
+
+    def _delta_sync(self, category_ids: List[int], snapshot: DealSnapshot,
+                    fields: Optional[List[str]]) -> DealSnapshot:
+        # O BI Connector filtra por dia; o dia da marca d'água é buscado de novo e a
+        # mesclagem por ID descarta as repetições. O fim fica um dia à frente porque
+        # o relógio do servidor está adiantado em relação ao local.
+        delta_range = DateRange(
+            start_date=snapshot.watermark.strftime('%Y-%m-%d'),
+            end_date=(date.today() + timedelta(days=1)).strftime('%Y-%m-%d')
+        )
+        delta_df = self._connector.get_deals_data(
+            category_ids=category_ids,
+            date_range=delta_range,
+            time_filter_column=self.WATERMARK_COLUMN,
+            fields=fields
+        )
+
+        if delta_df.empty:
+            return snapshot
+
+        delta_watermark = self.compute_watermark(delta_df)
+        return DealSnapshot(
+            deals=self._merge_by_id(snapshot.deals, delta_df),
+            watermark=snapshot.watermark if delta_watermark is None else max(snapshot.watermark, delta_watermark),
+            last_full_sync=snapshot.last_full_sync
+        )
+
+    @staticmethod
+    def _merge_by_id(base_df: pd.DataFrame, delta_df: pd.DataFrame) -> pd.DataFrame:
+        """Substitui as linhas do snapshot pelas versões mais recentes do delta"""
+        if base_df.empty or 'ID' not in base_df.columns or 'ID' not in delta_df.columns:
+            return delta_df
+
+        merged = pd.concat([base_df, delta_df], ignore_index=True)
+        duplicated = merged['ID'].astype(str).str.strip().duplicated(keep='last')
+        return merged[~duplicated].reset_index(drop=True)
+
+    @classmethod
+    def compute_watermark(cls, deals_df: pd.DataFrame) -> Optional[pd.Timestamp]:
+        """Maior DATE_MODIFY (horário do servidor) presente nos deals brutos"""
+        if deals_df.empty or cls.WATERMARK_COLUMN not in deals_df.columns:
+            return None
+
+        # Sem ajuste de fuso: a marca d'água é comparada com o horário do servidor
+        watermark = parse_dates(deals_df[cls.WATERMARK_COLUMN], cls.WATERMARK_COLUMN).max()
+        return None if pd.isna(watermark) else watermark
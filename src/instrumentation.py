@@ -0,0 +1,188 @@
+"""
+Instrumentação do tempo de execução das páginas
+Spans com tempo, linhas e bytes das consultas ao BI Connector, das etapas de processamento
+dos deals e das funções de renderização. Só há registro quando a execução é amostrada
+(?perf=1 na URL); sem amostragem, cada ponto instrumentado custa uma leitura de ContextVar
+"""
+
+import functools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+
+
+PERF_QUERY_PARAM = "perf"
+PERF_QUERY_VALUES = ("1", "true", "sim")
+
+logger = logging.getLogger("jusgestante.perf")
+_log_handler_lock = threading.Lock()
+
+
+@dataclass
+class Span:
+    """Trecho medido: início relativo ao trace, duração, linhas e bytes do DataFrame envolvido"""
+    name: str
+    depth: int
+    offset_seconds: float
+    thread_name: str
+    seconds: float = 0.0
+    rows: Optional[int] = None
+    bytes: Optional[int] = None
+
+    def record(self, data: Any) -> None:
+        """Registra linhas e bytes (arrays das colunas, sem o conteúdo das strings) de um DataFrame"""
+        if isinstance(data, pd.DataFrame):
+            self.rows = len(data)
+            self.bytes = int(data.memory_usage(index=False, deep=False).sum())
+
+
+class _NullSpan:
+    """Span usado quando a execução não é amostrada: não registra nada"""
+
+    def record(self, data: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """Spans de uma execução da página, em ordem de início"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.created_at = datetime.now()
+        self.seconds: Optional[float] = None
+        self._started_at = time.perf_counter()
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+        self._token: Optional[Token] = None
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started_at
+
+    def add(self, span: Span) -> None:
+        # Spans podem vir das threads de fetch_concurrently
+        with self._lock:
+            self._spans.append(span)
+
+    @property
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return sorted(self._spans, key=lambda span: span.offset_seconds)
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Spans como dicionários (uma linha de log ou da tabela do painel por span)"""
+        return [
+            {
+                'trace': self.name,
+                'span': span.name,
+                'depth': span.depth,
+                'offset_ms': round(span.offset_seconds * 1000, 1),
+                'ms': round(span.seconds * 1000, 1),
+                'rows': span.rows,
+                'bytes': span.bytes,
+                'thread': span.thread_name,
+            }
+            for span in self.spans
+        ]
+
+
+_active_trace: ContextVar[Optional[Trace]] = ContextVar('perf_trace', default=None)
+_span_depth: ContextVar[int] = ContextVar('perf_span_depth', default=0)
+
+
+def sampling_requested() -> bool:
+    """Indica se a execução atual pediu amostragem (?perf=1)"""
+    return str(st.query_params.get(PERF_QUERY_PARAM, "")).lower() in PERF_QUERY_VALUES
+
+
+def start_trace(name: str) -> Trace:
+    """Inicia a amostragem da execução atual; os spans abertos a partir daqui entram no trace"""
+    trace = Trace(name)
+    trace._token = _active_trace.set(trace)
+    return trace
+
+
+def finish_trace(trace: Trace) -> Trace:
+    """Encerra a amostragem e grava um log JSON por span e um com o total"""
+    trace.seconds = trace.elapsed()
+    if trace._token is not None:
+        _active_trace.reset(trace._token)
+        trace._token = None
+
+    _ensure_log_handler()
+    for record in trace.to_records():
+        logger.info(json.dumps(record, ensure_ascii=False))
+    logger.info(json.dumps({'trace': trace.name, 'span': None, 'ms': round(trace.seconds * 1000, 1),
+                            'spans': len(trace.spans)}, ensure_ascii=False))
+    return trace
+
+
+@contextmanager
+def span(name: str) -> Iterator[Any]:
+    """Mede o bloco como um span do trace ativo; sem trace, entrega um span que não registra nada"""
+    trace = _active_trace.get()
+    if trace is None:
+        yield _NULL_SPAN
+        return
+
+    depth = _span_depth.get()
+    depth_token = _span_depth.set(depth + 1)
+    current = Span(name, depth, trace.elapsed(), threading.current_thread().name)
+    started_at = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - started_at
+        _span_depth.reset(depth_token)
+        trace.add(current)
+
+
+def timed(name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """
+    Decorador que mede cada chamada da função como um span (nome padrão: nome qualificado
+    da função). Linhas e bytes vêm do DataFrame retornado ou, nas funções de renderização,
+    do primeiro DataFrame recebido
+    """
+    def decorator(func: Callable) -> Callable:
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(label) as current:
+                result = func(*args, **kwargs)
+                current.record(result if isinstance(result, pd.DataFrame) else _first_frame(args, kwargs))
+                return result
+        return wrapper
+    return decorator
+
+
+def _first_frame(args: Tuple, kwargs: Dict) -> Optional[pd.DataFrame]:
+    for value in (*args, *kwargs.values()):
+        if isinstance(value, pd.DataFrame):
+            return value
+    return None
+
+
+def _ensure_log_handler() -> None:
+    """Logs estruturados vão para stderr, uma linha JSON por registro, mesmo sem configuração de logging"""
+    with _log_handler_lock:
+        if logger.handlers:
+            return
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
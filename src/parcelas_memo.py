@@ -0,0 +1,145 @@
+"""
+Memória das descrições de parcelas já analisadas
+As abas de meses fechados não mudam e muitas descrições se repetem literalmente, então o
+resultado de analyze_parcelas é guardado pelo hash do texto da descrição. A memória é
+limitada (LRU) e gravada em disco ao lado dos snapshots, para que um reinício só precise
+analisar os acordos novos ou editados
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import streamlit as st
+
+from .snapshot_store import get_snapshot_store
+
+logger = logging.getLogger("jusgestante.parcelas")
+
+
+# Incrementar quando o resultado de analyze_parcelas mudar: a memória gravada com outra
+# versão é descartada na leitura
+PARSER_VERSION = 1
+DEFAULT_MAX_ENTRIES = 20000
+MEMO_FILENAME = "parcelas_memo.pkl"
+
+
+class ParcelasMemo:
+    """
+    Cache LRU das parcelas analisadas, com chave no hash (BLAKE2b de 128 bits) do texto.
+    As listas devolvidas são compartilhadas entre as linhas e sessões: somente leitura
+    """
+
+    def __init__(self, max_entries: int, path: Optional[str] = None):
+        self._entries: "OrderedDict[bytes, Any]" = OrderedDict()
+        self._max_entries = max_entries
+        self._path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _key(texto: str) -> bytes:
+        return hashlib.blake2b(texto.encode("utf-8"), digest_size=16).digest()
+
+    def parse_many(self, textos: Iterable[str], parse_batch: Callable[[List[str]], List[Any]]) -> List[Any]:
+        """
+        Resultado da análise de cada texto, na mesma ordem. Textos já vistos vêm da memória;
+        os demais vão em uma única chamada a parse_batch, uma vez cada (repetições no lote
+        contam como acerto)
+        """
+        textos = list(textos)
+        keys = [self._key(texto) for texto in textos]
+
+        with self._lock:
+            found: Dict[bytes, Any] = {}
+            for key in keys:
+                if key in found:
+                    continue
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+
+        missing: Dict[bytes, str] = {}
+        for key, texto in zip(keys, textos):
+            if key not in found and key not in missing:
+                missing[key] = texto
+        parsed = dict(zip(missing, parse_batch(list(missing.values())))) if missing else {}
+
+        with self._lock:
+            self._hits += len(keys) - len(missing)
+            self._misses += len(missing)
+            for key, result in parsed.items():
+                self._entries[key] = result
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+            if parsed:
+                self._dirty = True
+
+        found.update(parsed)
+        return [found[key] for key in keys]
+
+    def load(self) -> int:
+        """Carrega a memória gravada em disco (se existir e for da versão atual do parser)"""
+        if self._path is None or not os.path.exists(self._path):
+            return 0
+        try:
+            with open(self._path, "rb") as memo_file:
+                stored = pickle.load(memo_file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            logger.warning("Não foi possível ler a memória de parcelas '%s': %s", self._path, e)
+            return 0
+
+        if not isinstance(stored, dict) or stored.get("parser_version") != PARSER_VERSION:
+            return 0
+        with self._lock:
+            for key, result in stored.get("entries", []):
+                self._entries[key] = result
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+            return len(self._entries)
+
+    def save(self) -> bool:
+        """Grava a memória em disco de forma atômica, se houver entradas novas desde a última gravação"""
+        if self._path is None:
+            return False
+        with self._lock:
+            if not self._dirty:
+                return False
+            stored = {"parser_version": PARSER_VERSION, "entries": list(self._entries.items())}
+            self._dirty = False
+
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            with open(f"{self._path}.tmp", "wb") as memo_file:
+                pickle.dump(stored, memo_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f"{self._path}.tmp", self._path)
+            return True
+        except (OSError, pickle.PicklingError) as e:
+            with self._lock:
+                self._dirty = True
+            logger.warning("Não foi possível gravar a memória de parcelas '%s': %s", self._path, e)
+            return False
+
+    def get_stats(self) -> Dict[str, int]:
+        """Acertos, faltas e tamanho atual da memória"""
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses, "entries": len(self._entries)}
+
+
+@st.cache_resource
+def get_parcelas_memo() -> ParcelasMemo:
+    """Retorna a memória única do processo, já carregada do diretório de snapshots"""
+    cache_settings: Dict[str, Any] = st.secrets.get("cache", {})
+    store = get_snapshot_store()
+    memo = ParcelasMemo(
+        max_entries=int(cache_settings.get("parcelas_memo_max_entries", DEFAULT_MAX_ENTRIES)),
+        path=os.path.join(store.base_dir, MEMO_FILENAME) if store.enabled else None
+    )
+    memo.load()
+    return memo
@@ -0,0 +1,163 @@
+"""
+Atualização de dados em segundo plano
+Uma thread por processo agenda cada conjunto de dados no seu próprio intervalo e
+publica o resultado no cache compartilhado, de modo que as páginas não esperam pela rede
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import streamlit as st
+
+from config.funis_config import FunilConfig
+from .data_service import DataService
+from .g7_service import G7DataService
+from .google_sheets_service import atualizar_dados_financeiros
+
+logger = logging.getLogger("jusgestante.refresh")
+
+@dataclass
+class RefreshJob:
+    """Conjunto de dados atualizado periodicamente"""
+    name: str
+    interval_seconds: int
+    refresh: Callable[[], Any]
+    next_run_at: float = 0.0 # time.monotonic(); 0 executa na primeira volta
+    last_run_at: Optional[datetime] = None
+    last_duration_seconds: float = 0.0
+    last_error: Optional[str] = None
+    running: bool = False
+
+
+class BackgroundRefresher:
+    """
+    Agenda os RefreshJob em uma thread daemon. Cada job vencido roda no pool de
+    threads sem que o agendador espere por ele: um job lento atrasa só a própria
+    próxima execução. Cada job publica seus dados no cache compartilhado (substituição
+    atômica da entrada), então uma página renderizada durante a atualização continua
+    lendo a versão anterior.
+    """
+
+    def __init__(self, jobs: List[RefreshJob]):
+        self._jobs = jobs
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Inicia a thread de atualização (chamadas repetidas não criam outra thread)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run_loop, name="background-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Sinaliza a parada; os jobs em andamento terminam normalmente"""
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def get_jobs_status(self) -> List[RefreshJob]:
+        """Retorna uma cópia do estado de cada job"""
+        with self._lock:
+            return [replace(job) for job in self._jobs]
+
+    def _run_loop(self) -> None:
+        # Uma thread por job: os jobs são independentes e nenhum espera pelo outro
+        with ThreadPoolExecutor(max_workers=max(len(self._jobs), 1), thread_name_prefix="refresh") as executor:
+            while not self._stop_event.is_set():
+                self._wake_event.clear()
+                for job in self._start_due_jobs():
+                    executor.submit(self._run_job, job)
+
+                # Acorda no próximo vencimento ou quando um job termina (e reagenda)
+                self._wake_event.wait(self._seconds_until_next_job())
+
+    def _start_due_jobs(self) -> List[RefreshJob]:
+        """Jobs vencidos que não estão em andamento, já marcados como em andamento"""
+        now = time.monotonic()
+        with self._lock:
+            due = sorted(
+                (job for job in self._jobs if not job.running and job.next_run_at <= now),
+                key=lambda job: job.next_run_at
+            )
+            for job in due:
+                job.running = True
+        return due
+
+    def _seconds_until_next_job(self) -> float:
+        with self._lock:
+            waiting = [job.next_run_at for job in self._jobs if not job.running]
+        if not waiting:
+            return 60.0
+        return max(min(waiting) - time.monotonic(), 1.0)
+
+    def _run_job(self, job: RefreshJob) -> None:
+        started_at = time.monotonic()
+        error = None
+        try:
+            job.refresh()
+        except Exception as e:
+            error = str(e)
+            logger.exception("Falha na atualização em segundo plano de '%s'", job.name)
+
+        finished_at = time.monotonic()
+        with self._lock:
+            job.last_run_at = datetime.now()
+            job.last_duration_seconds = finished_at - started_at
+            job.last_error = error
+            job.next_run_at = finished_at + job.interval_seconds
+            job.running = False
+        self._wake_event.set()
+
+
+def _build_jobs(refresh_settings: Dict[str, Any]) -> List[RefreshJob]:
+    """Monta os jobs dos funis, da G7 e da planilha financeira conforme os secrets disponíveis"""
+    funnel_interval = int(refresh_settings.get("funnel_minutes", 10) * 60)
+    g7_interval = int(refresh_settings.get("g7_minutes", 10) * 60)
+    sheets_interval = int(refresh_settings.get("sheets_minutes", 5) * 60)
+
+    funnels = [
+        ("funil_comercial", FunilConfig.COMERCIAL_ID, DataService.COMERCIAL_COLUMNS),
+        ("funil_tramites", FunilConfig.TRAMITES_ID, DataService.TRAMITES_COLUMNS),
+        ("funil_audiencia", FunilConfig.AUDIENCIA_ID, DataService.AUDIENCIA_COLUMNS),
+        ("funil_entrevista", FunilConfig.ENTREVISTA_ID, DataService.ENTREVISTA_COLUMNS),
+    ]
+    jobs = [
+        RefreshJob(
+            name=name,
+            interval_seconds=funnel_interval,
+            refresh=lambda category_id=category_id, columns=columns: DataService().refresh_deals([category_id], columns)
+        )
+        for name, category_id, columns in funnels
+    ]
+
+    if "g7_bitrix" in st.secrets:
+        jobs.append(RefreshJob(name="g7", interval_seconds=g7_interval, refresh=lambda: G7DataService().refresh_all()))
+
+    if "financeiro" in st.secrets and "google_sheets" in st.secrets:
+        jobs.append(RefreshJob(name="planilha_financeira", interval_seconds=sheets_interval, refresh=atualizar_dados_financeiros))
+
+    return jobs
+
+
+@st.cache_resource
+def get_background_refresher() -> Optional[BackgroundRefresher]:
+    """
+    Cria e inicia, uma única vez por processo, a atualização em segundo plano.
+    Retorna None quando desabilitada em [refresh] enabled = false.
+    """
+    refresh_settings: Dict[str, Any] = st.secrets.get("refresh", {})
+    if not refresh_settings.get("enabled", True):
+        return None
+
+    refresher = BackgroundRefresher(_build_jobs(refresh_settings))
+    refresher.start()
+    return refresher
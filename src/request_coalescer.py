@@ -0,0 +1,107 @@
+"""
+Coalescência de requisições idênticas (single-flight)
+Quando várias sessões pedem a mesma consulta ao mesmo tempo, apenas uma chamada HTTP é feita
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+import streamlit as st
+
+
+@dataclass
+class SingleFlightStats:
+    """Contadores de coalescência de requisições"""
+    executions: int = 0
+    coalesced_waiters: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+class _InFlightCall:
+    """
+    Chamada em andamento compartilhada entre o executor e os que aguardam.
+    abandoned indica que o executor saiu sem resultado nem Exception (ex.: RerunException
+    ou StopException da sessão dele); os que aguardam tentam de novo
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[Exception] = None
+        self.abandoned = False
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Executa uma única vez as chamadas concorrentes com a mesma chave"""
+
+    def __init__(self):
+        self._calls: Dict[str, _InFlightCall] = {}
+        self._lock = threading.Lock()
+        self._stats = SingleFlightStats()
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        """
+        Executa func para a chave informada. Se já houver uma execução em andamento
+        para a mesma chave, aguarda e devolve o mesmo resultado (ou a mesma Exception).
+        Se o executor for interrompido por outra BaseException, essa exceção fica só com
+        ele e um dos que aguardavam passa a executar func
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                is_leader = call is None
+                if is_leader:
+                    call = _InFlightCall()
+                    self._calls[key] = call
+                    self._stats.executions += 1
+                else:
+                    call.waiters += 1
+                    self._stats.coalesced_waiters += 1
+
+            if is_leader:
+                return self._run(key, call, func)
+            self._wait(call)
+            if call.abandoned:
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+    def get_stats(self) -> SingleFlightStats:
+        """Retorna uma cópia dos contadores"""
+        with self._lock:
+            return SingleFlightStats(**vars(self._stats))
+
+    def _run(self, key: str, call: _InFlightCall, func: Callable[[], Any]) -> Any:
+        try:
+            call.result = func()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException:
+            call.abandoned = True
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _wait(self, call: _InFlightCall) -> None:
+        started_at = time.perf_counter()
+        call.done.wait()
+        waited = time.perf_counter() - started_at
+
+        with self._lock:
+            self._stats.total_wait_seconds += waited
+            self._stats.max_wait_seconds = max(self._stats.max_wait_seconds, waited)
+
+
+@st.cache_resource
+def get_bi_request_group() -> SingleFlight:
+    """Retorna o grupo single-flight único do processo para consultas ao BI Connector"""
+    return SingleFlight()
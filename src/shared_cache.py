@@ -0,0 +1,257 @@
+"""
+Cache de dados compartilhado entre sessões
+Um único armazenamento por processo, usado por todas as sessões do Streamlit
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Set
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+logger = logging.getLogger("jusgestante.cache")
+
+
+@dataclass
+class CacheEntry:
+    """
+    Representa um item armazenado no cache compartilhado.
+    Depois de stale_after_seconds (TTL suave) o item ainda é servido, mas deve ser
+    revalidado; depois de duration_seconds (TTL rígido) ele é descartado.
+    """
+    data: Any
+    timestamp: datetime
+    duration_seconds: int
+    size_bytes: int
+    stale_after_seconds: Optional[int] = None
+
+    def is_expired(self) -> bool:
+        return datetime.now() >= self.timestamp + timedelta(seconds=self.duration_seconds)
+
+    def is_stale(self) -> bool:
+        if self.stale_after_seconds is None:
+            return False
+        return datetime.now() >= self.timestamp + timedelta(seconds=self.stale_after_seconds)
+
+    def age(self) -> timedelta:
+        return datetime.now() - self.timestamp
+
+
+@dataclass
+class CacheStats:
+    """Contadores de uso do cache"""
+    hits: int = 0
+    stale_hits: int = 0
+    revalidations: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    used_bytes: int = 0
+    budget_bytes: int = 0
+
+
+class SharedFrameCache:
+    """
+    Cache LRU de DataFrames compartilhado por todas as sessões do processo.
+    Os DataFrames armazenados são congelados (arrays somente leitura) e cada
+    leitura recebe uma cópia rasa, com cópia própria das colunas de objetos, de modo
+    que uma sessão não altera os dados da outra.
+    """
+
+    def __init__(self, memory_budget_bytes: int):
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._memory_budget_bytes = memory_budget_bytes
+        self._used_bytes = 0
+        self._hits = 0
+        self._stale_hits = 0
+        self._revalidations = 0
+        self._misses = 0
+        self._evictions = 0
+        self._revalidating: Set[str] = set()
+
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        """Retorna a entrada válida para a chave (ou None), atualizando a ordem LRU"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.is_expired():
+                if entry is not None:
+                    self._remove(key)
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def peek(self, key: str) -> Optional[CacheEntry]:
+        """Entrada válida para a chave (ou None), sem contar acerto/falta nem mexer na ordem LRU"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.is_expired():
+                return None
+            return entry
+
+    def get(self, key: str, revalidate: Optional[Callable[[], Any]] = None) -> Optional[Any]:
+        """
+        Obtém o dado armazenado como uma visão somente leitura.
+        Se a entrada passou do TTL suave e revalidate foi informado, o dado antigo é
+        devolvido na hora e revalidate roda em segundo plano (uma única vez por chave);
+        cabe a ele gravar o novo valor no cache.
+        DataFrames recebem em attrs a hora da busca ('cache_fetched_at') e se estão
+        desatualizados ('cache_stale'), para que as páginas mostrem a idade dos dados.
+        """
+        entry = self.get_entry(key)
+        if entry is None:
+            return None
+
+        is_stale = entry.is_stale()
+        if is_stale:
+            with self._lock:
+                self._stale_hits += 1
+            if revalidate is not None:
+                self._revalidate_async(key, revalidate)
+
+        view = self._read_only_view(entry.data)
+        if isinstance(view, pd.DataFrame):
+            view.attrs['cache_fetched_at'] = entry.timestamp
+            view.attrs['cache_stale'] = is_stale
+        return view
+
+    def set(self, key: str, data: Any, duration_seconds: int,
+            stale_after_seconds: Optional[int] = None) -> None:
+        """
+        Armazena um dado, liberando as entradas menos usadas se o orçamento estourar.
+        duration_seconds é o TTL rígido; stale_after_seconds, o TTL suave (opcional).
+        """
+        if isinstance(data, pd.DataFrame):
+            self._freeze_frame(data)
+
+        entry = CacheEntry(
+            data=data,
+            timestamp=datetime.now(),
+            duration_seconds=duration_seconds,
+            size_bytes=self._estimate_size(data),
+            stale_after_seconds=stale_after_seconds
+        )
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._used_bytes += entry.size_bytes
+            self._evict_over_budget(protected_key=key)
+
+    def invalidate(self, key: str) -> None:
+        """Remove uma entrada do cache"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Remove todas as entradas do cache"""
+        with self._lock:
+            self._entries.clear()
+            self._used_bytes = 0
+
+    def get_stats(self) -> CacheStats:
+        """Retorna os contadores de acertos, faltas e remoções"""
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                stale_hits=self._stale_hits,
+                revalidations=self._revalidations,
+                misses=self._misses,
+                evictions=self._evictions,
+                entries=len(self._entries),
+                used_bytes=self._used_bytes,
+                budget_bytes=self._memory_budget_bytes
+            )
+
+    def _revalidate_async(self, key: str, revalidate: Callable[[], Any]) -> None:
+        with self._lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+            self._revalidations += 1
+
+        def run():
+            try:
+                revalidate()
+            except Exception as e:
+                logger.exception("Falha ao revalidar a entrada '%s' do cache", key)
+            finally:
+                with self._lock:
+                    self._revalidating.discard(key)
+
+        threading.Thread(target=run, name=f"cache-revalidate-{key[:40]}", daemon=True).start()
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._used_bytes -= entry.size_bytes
+
+    def _evict_over_budget(self, protected_key: str) -> None:
+        """Remove entradas em ordem LRU até caber no orçamento de memória"""
+        while self._used_bytes > self._memory_budget_bytes and len(self._entries) > 1:
+            oldest_key = next(iter(self._entries))
+            if oldest_key == protected_key:
+                break
+            self._remove(oldest_key)
+            self._evictions += 1
+
+    @staticmethod
+    def _estimate_size(data: Any) -> int:
+        if isinstance(data, pd.DataFrame):
+            return int(data.memory_usage(deep=True).sum())
+        return 0
+
+    @staticmethod
+    def _freeze_frame(df: pd.DataFrame) -> None:
+        """
+        Marca os arrays do DataFrame como somente leitura.
+        Arrays de objetos (colunas object e string) ficam de fora: no pandas 2.x as rotinas
+        em Cython que os recebem (comparações como df['MÊS'] == mes, merge em colunas
+        string) exigem buffer gravável e falhariam. Essas colunas são copiadas a cada
+        leitura por _read_only_view
+        """
+        for array in df._mgr.arrays:
+            # Categóricos, datas e strings guardam os valores em um ndarray interno (_ndarray);
+            # os anuláveis (Int64, boolean, Float64) em _data, com os nulos em _mask
+            if hasattr(array, '_mask'):
+                inner_arrays = [array._data, array._mask]
+            else:
+                inner_arrays = [getattr(array, '_ndarray', array)]
+            for inner in inner_arrays:
+                if isinstance(inner, np.ndarray) and inner.dtype != object:
+                    inner.flags.writeable = False
+
+    @staticmethod
+    def _read_only_view(data: Any) -> Any:
+        # Cópia rasa: atribuições de colunas feitas pelas views não atingem o frame
+        # compartilhado, e escritas in-place falham por causa dos arrays congelados.
+        # As colunas de objetos (não congeladas) ganham um array próprio: sem
+        # copy-on-write, view.loc[0, 'NOME'] = ... escreveria no frame compartilhado.
+        # A cópia é só dos ponteiros; os objetos em si continuam compartilhados
+        if isinstance(data, pd.DataFrame):
+            view = data.copy(deep=False)
+            for position, dtype in enumerate(data.dtypes):
+                if dtype == object or isinstance(dtype, pd.StringDtype):
+                    view.isetitem(position, data.iloc[:, position].copy())
+            return view
+        return data
+
+
+DEFAULT_MEMORY_BUDGET_MB = 512
+
+
+@st.cache_resource
+def get_shared_cache() -> SharedFrameCache:
+    """Retorna a instância única do cache compartilhado do processo"""
+    cache_settings: Dict[str, Any] = st.secrets.get("cache", {})
+    budget_mb = cache_settings.get("memory_budget_mb", DEFAULT_MEMORY_BUDGET_MB)
+    return SharedFrameCache(memory_budget_bytes=int(budget_mb * 1024 * 1024))
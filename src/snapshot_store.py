@@ -0,0 +1,220 @@
+"""
+Armazenamento persistente de snapshots em Parquet
+Guarda em data/ os dados já processados, para que o primeiro acesso após um
+reinício seja servido do disco enquanto uma atualização roda em segundo plano
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Set
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+logger = logging.getLogger("jusgestante.snapshots")
+
+
+@dataclass
+class SnapshotMetadata:
+    """
+    Metadados de cada snapshot, gravados no schema do próprio Parquet.
+    last_full_sync é o horário da última carga completa dos deals brutos (a sincronização
+    incremental conta a reconciliação a partir dele, e não da última gravação)
+    """
+    name: str
+    fetched_at: str
+    watermark: Optional[str]
+    schema_hash: str
+    rows: int
+    last_full_sync: Optional[str] = None
+
+
+@dataclass
+class Snapshot:
+    """Snapshot carregado do disco"""
+    data: pd.DataFrame
+    metadata: SnapshotMetadata
+
+    @property
+    def fetched_at(self) -> datetime:
+        return datetime.fromisoformat(self.metadata.fetched_at)
+
+    @property
+    def watermark(self) -> Optional[pd.Timestamp]:
+        return None if self.metadata.watermark is None else pd.Timestamp(self.metadata.watermark)
+
+    @property
+    def last_full_sync(self) -> Optional[datetime]:
+        return None if self.metadata.last_full_sync is None else datetime.fromisoformat(self.metadata.last_full_sync)
+
+
+class SnapshotStore:
+    """
+    Persiste DataFrames como Parquet comprimido, um arquivo por snapshot com os
+    metadados no próprio schema: dados e metadados são trocados juntos, em um único
+    rename. A leitura usa memory map, e o hash do schema descarta snapshots gravados
+    com outro formato de colunas.
+    """
+
+    COMPRESSION = "zstd"
+    METADATA_KEY = b"snapshot_metadata"
+
+    def __init__(self, base_dir: str, enabled: bool = True, max_age_hours: float = 24):
+        self._base_dir = base_dir
+        self._enabled = enabled
+        self._max_age = timedelta(hours=max_age_hours)
+        self._lock = threading.Lock()
+        self._refreshing: Set[str] = set()
+        self._served: Set[str] = set()
+        self._write_locks: Dict[str, threading.Lock] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    @property
+    def base_dir(self) -> str:
+        return self._base_dir
+
+    def load_on_startup(self, name: str) -> Optional[Snapshot]:
+        """
+        Carrega o snapshot apenas na primeira vez que o nome é pedido no processo
+        (partida a frio) e se ele não for mais antigo que max_age_hours.
+        Depois disso os dados vêm do cache em memória ou da API.
+        """
+        if not self._enabled:
+            return None
+        with self._lock:
+            if name in self._served:
+                return None
+            self._served.add(name)
+
+        snapshot = self.load(name)
+        if snapshot is None or datetime.now() - snapshot.fetched_at > self._max_age:
+            return None
+        return snapshot
+
+    def load(self, name: str) -> Optional[Snapshot]:
+        """Carrega um snapshot do disco (ou None se não existir ou estiver inválido)"""
+        data_path = self._path(name)
+        if not os.path.exists(data_path):
+            return None
+
+        try:
+            table = pq.read_table(data_path, memory_map=True)
+            stored_metadata = (table.schema.metadata or {}).get(self.METADATA_KEY)
+            # Snapshots do formato anterior (metadados em um JSON separado) são descartados
+            if stored_metadata is None:
+                return None
+            metadata = SnapshotMetadata(**json.loads(stored_metadata))
+        except (OSError, ValueError, TypeError, pa.ArrowException) as e:
+            logger.warning("Não foi possível ler o snapshot '%s' do disco: %s", name, e)
+            return None
+
+        if self._schema_hash(table.schema) != metadata.schema_hash:
+            return None
+        return Snapshot(data=table.to_pandas(), metadata=metadata)
+
+    def save(self, name: str, data: pd.DataFrame, watermark: Optional[Any] = None,
+             last_full_sync: Optional[datetime] = None) -> bool:
+        """
+        Grava o snapshot de forma atômica: arquivo temporário próprio de cada gravação e
+        um único rename, com as gravações do mesmo nome em fila (atualização em segundo
+        plano, revalidação e agendador podem gravar o mesmo snapshot ao mesmo tempo).
+        Retorna False se o DataFrame não puder ser convertido para Parquet.
+        """
+        if not self._enabled:
+            return False
+        data_path = self._path(name)
+        temp_path = None
+        try:
+            os.makedirs(self._base_dir, exist_ok=True)
+            table = pa.Table.from_pandas(data, preserve_index=False)
+            metadata = SnapshotMetadata(
+                name=name,
+                fetched_at=datetime.now().isoformat(),
+                watermark=None if watermark is None or pd.isna(watermark) else str(watermark),
+                schema_hash=self._schema_hash(table.schema),
+                rows=table.num_rows,
+                last_full_sync=None if last_full_sync is None else last_full_sync.isoformat()
+            )
+            table = table.replace_schema_metadata({
+                **(table.schema.metadata or {}),
+                self.METADATA_KEY: json.dumps(asdict(metadata), ensure_ascii=False).encode("utf-8")
+            })
+
+            with self._write_lock(name):
+                file_descriptor, temp_path = tempfile.mkstemp(dir=self._base_dir, prefix=f"{name}.", suffix=".tmp")
+                with os.fdopen(file_descriptor, "wb") as temp_file:
+                    pq.write_table(table, temp_file, compression=self.COMPRESSION)
+                os.replace(temp_path, data_path)
+                temp_path = None
+            return True
+        except (OSError, ValueError, TypeError, pa.ArrowException) as e:
+            logger.warning("Não foi possível gravar o snapshot '%s' em disco: %s", name, e)
+            return False
+        finally:
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def refresh_in_background(self, name: str, refresh: Callable[[], None]) -> bool:
+        """
+        Executa refresh em uma thread separada, no máximo uma por snapshot.
+        Retorna False se já houver uma atualização em andamento para o nome.
+        """
+        with self._lock:
+            if name in self._refreshing:
+                return False
+            self._refreshing.add(name)
+
+        def run():
+            try:
+                refresh()
+            except Exception as e:
+                logger.exception("Falha na atualização em segundo plano do snapshot '%s'", name)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(name)
+
+        threading.Thread(target=run, name=f"snapshot-refresh-{name}", daemon=True).start()
+        return True
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self._base_dir, f"{name}.parquet")
+
+    def _write_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._write_locks.setdefault(name, threading.Lock())
+
+    @staticmethod
+    def _schema_hash(schema: pa.Schema) -> str:
+        # Ignora os metadados do pandas embutidos no schema; apenas nomes e tipos contam.
+        # Colunas categóricas contam pelo tipo dos valores: a largura dos índices do
+        # dicionário muda na leitura do Parquet (int8 -> int32)
+        description = [
+            (field.name, f"dictionary<{field.type.value_type}>" if pa.types.is_dictionary(field.type) else str(field.type))
+            for field in schema
+        ]
+        return hashlib.sha256(json.dumps(description).encode("utf-8")).hexdigest()[:16]
+
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "snapshots")
+
+
+@st.cache_resource
+def get_snapshot_store() -> SnapshotStore:
+    """Retorna o armazenamento de snapshots único do processo"""
+    snapshot_settings: Dict[str, Any] = st.secrets.get("snapshots", {})
+    return SnapshotStore(
+        base_dir=snapshot_settings.get("dir", DEFAULT_SNAPSHOT_DIR),
+        enabled=bool(snapshot_settings.get("enabled", True)),
+        max_age_hours=snapshot_settings.get("max_age_hours", 24)
+    )
@@ -0,0 +1,64 @@
+"""
+Tabela de classificação dos estágios
+Pré-calcula, a partir de FunilConfig, o nome, a ordem e a semântica de cada par
+(CATEGORY_ID, STAGE_ID). A classificação dos deals é uma única busca no índice da
+tabela seguida de take nos arrays de atributos, igual para todos os funis
+"""
+
+from functools import lru_cache
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from config.funis_config import Category, FunilConfig
+
+
+class StageTable:
+    """Atributos dos estágios indexados por (CATEGORY_ID, STAGE_ID)"""
+
+    def __init__(self, categories: Iterable[Category]):
+        rows = [
+            (category.category_id, stage.stage_id, stage.stage_name, stage.sort_order, stage.semantics)
+            for category in categories
+            for stage in category.stages
+        ]
+        category_ids, stage_ids, names, sort_orders, semantics = zip(*rows) if rows else ((),) * 5
+
+        self._index = pd.MultiIndex.from_arrays(
+            [np.asarray(category_ids, dtype='int64'), np.asarray(stage_ids, dtype=object)],
+            names=['CATEGORY_ID', 'STAGE_ID']
+        )
+        # A última posição de cada array é a linha "não encontrado": get_indexer devolve
+        # -1 para pares fora da tabela, e take(-1) lê exatamente essa posição
+        self._names = np.array(names + (None,), dtype=object)
+        self._sort_orders = np.array(sort_orders + (np.nan,), dtype='float64')
+        self._semantics = np.array(semantics + (None,), dtype=object)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def classify(self, category_ids: pd.Series, stage_ids: pd.Series) -> pd.DataFrame:
+        """
+        Retorna, alinhado ao índice de stage_ids, o nome (STAGE_NAME), a ordem
+        (STAGE_SORT_ORDER) e a semântica (STAGE_SEMANTICS: 'S', 'F' ou None) de cada deal,
+        e IN_CONFIG indicando se o par existe na configuração dos funis
+        """
+        keys = pd.MultiIndex.from_arrays([
+            pd.to_numeric(category_ids, errors='coerce').to_numpy(dtype='float64'),
+            stage_ids.astype(str).str.strip().to_numpy(dtype=object)
+        ])
+        positions = self._index.get_indexer(keys)
+
+        return pd.DataFrame({
+            'STAGE_NAME': self._names.take(positions),
+            'STAGE_SORT_ORDER': self._sort_orders.take(positions),
+            'STAGE_SEMANTICS': self._semantics.take(positions),
+            'IN_CONFIG': positions >= 0,
+        }, index=stage_ids.index)
+
+
+@lru_cache(maxsize=1)
+def get_stage_table() -> StageTable:
+    """Tabela única do processo, montada com todos os funis de FunilConfig"""
+    return StageTable(FunilConfig.get_all_categories().values())
@@ -0,0 +1,169 @@
+import pandas as pd
+import pytest
+
+from src import finance_analyzer, google_sheets_service
+from src.finance_analyzer import analyse_data
+from src.google_sheets_service import FINANCEIRO_REQUIRED_COLUMNS, FinanceWorkbookCache, GoogleSheetsService
+from src.parcelas_memo import ParcelasMemo
+
+
+HEADER = ['CPF', 'NOME', 'VALOR DO ACORDO', 'HONORÁRIOS (30%)', 'PARCELAS DESCRITIVAS']
+
+
+def _tab(rows):
+    return [['ACORDOS'], HEADER] + rows
+
+
+TABS = {
+    'JANEIRO': _tab([
+        ['111', 'Ana', 'R$ 2.000,00', 'R$ 600,00',
+         '1ª parcela: R$ 1.000,00 até 10/01/2025 - Pago em 10/01/2025\n2ª parcela: R$ 1.000,00 até 10/02/2025'],
+        ['222', 'Bia', 'R$ 900,00', 'R$ 270,00',
+         '3 parcelas de R$ 300,00, sendo vencível a primeira dia 05/01/2025'],
+    ]),
+    'FEVEREIRO': _tab([
+        ['333', 'Cris', 'R$ 1.500,00', 'R$ 450,00', '1ª parcela de R$ 1.500,00 até o dia 20/02/2025'],
+    ]),
+    'MARÇO': _tab([
+        ['444', 'Duda', 'R$ 800,00', 'R$ 240,00', '1ª parcela: R$ 800,00 até 15/03/2025 pix 14/03/2025'],
+        ['555', 'Eva', 'R$ 1.200,00', 'R$ 360,00', 'sem parcelas'],
+    ]),
+}
+
+
+class FakeWorksheet:
+    def __init__(self, title):
+        self.title = title
+
+
+class FakeSpreadsheet:
+    """Planilha com as abas de TABS, respondendo a values.batchGet como a API"""
+
+    def __init__(self, tabs):
+        self.tabs = tabs
+        self.revision = 'r1'
+
+    def worksheets(self):
+        return [FakeWorksheet(title) for title in self.tabs]
+
+    def get_lastUpdateTime(self):
+        return self.revision
+
+    def values_batch_get(self, ranges, params=None):
+        names = [name[1:-1].replace("''", "'") for name in ranges]
+        return {'valueRanges': [{'range': r, 'values': self.tabs[n]} for r, n in zip(ranges, names)]}
+
+
+class CountingExecutor:
+    """Substitui o ProcessPoolExecutor: conta os pools criados e analisa no próprio processo"""
+    created = []
+
+    def __init__(self, max_workers, mp_context=None):
+        self.batch = []
+        self.start_method = mp_context.get_start_method() if mp_context else "fork"
+        CountingExecutor.created.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def map(self, function, chunks):
+        chunks = list(chunks)
+        self.batch.extend(texto for chunk in chunks for texto in chunk)
+        return [function(chunk) for chunk in chunks]
+
+
+@pytest.fixture
+def workbook(monkeypatch):
+    spreadsheet = FakeSpreadsheet({month: [list(row) for row in values] for month, values in TABS.items()})
+    secrets = {
+        'financeiro': {'spreadsheet_url': 'https://example.com/planilha'},
+        'parcelas': {'parallel_workers': 4, 'parallel_min_descriptions': 0},
+    }
+    monkeypatch.setattr(google_sheets_service.st, 'secrets', secrets)
+    monkeypatch.setattr(finance_analyzer.st, 'secrets', secrets)
+    monkeypatch.setattr(finance_analyzer.os, 'cpu_count', lambda: 4)
+    monkeypatch.setattr(finance_analyzer, 'ProcessPoolExecutor', CountingExecutor)
+    monkeypatch.setattr(CountingExecutor, 'created', [])
+
+    memo = ParcelasMemo(max_entries=1000)
+    monkeypatch.setattr(finance_analyzer, 'get_parcelas_memo', lambda: memo)
+    monkeypatch.setattr(google_sheets_service, 'get_parcelas_memo', lambda: memo)
+    monkeypatch.setattr(GoogleSheetsService, '__init__', lambda self: setattr(self, 'client', object()))
+    monkeypatch.setattr(GoogleSheetsService, 'get_spreadsheet', lambda self, url: spreadsheet)
+    return spreadsheet, FinanceWorkbookCache()
+
+
+def _expected_tab(values, month):
+    df = GoogleSheetsService.build_worksheet_frame(values)
+    df['MÊS'] = month
+    for col in FINANCEIRO_REQUIRED_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+    return analyse_data(df)['dataframe']
+
+
+def test_changed_tabs_are_parsed_in_one_parallel_batch(workbook):
+    spreadsheet, cache = workbook
+    frame, complete = cache._load_changed_tabs(cache._open_spreadsheet())
+    assert complete
+
+    # Um único pool para as parcelas das três abas, na ordem das abas
+    assert len(CountingExecutor.created) == 1
+    assert CountingExecutor.created[0].batch == [
+        row[4] for values in TABS.values() for row in values[2:]
+    ]
+    # Sem fork: os processos não herdam as travas das threads do servidor
+    assert CountingExecutor.created[0].start_method in ("forkserver", "spawn")
+
+    # Cada aba recebe de volta as suas parcelas
+    expected = pd.concat([_expected_tab(values, month) for month, values in TABS.items()], ignore_index=True)
+    pd.testing.assert_frame_equal(frame, expected)
+
+
+def test_only_changed_tabs_go_to_the_batch(workbook):
+    spreadsheet, cache = workbook
+    cache.refresh()
+
+    spreadsheet.revision = 'r2'
+    spreadsheet.tabs['FEVEREIRO'][2][4] = '1ª parcela de R$ 1.500,00 até o dia 25/02/2025'
+    spreadsheet.tabs['MARÇO'][3][4] = '1ª parcela: R$ 1.200,00 até 30/03/2025'
+    CountingExecutor.created.clear()
+    frame = cache.refresh()
+
+    # As duas abas alteradas vão juntas; a descrição de MARÇO que não mudou vem da memória
+    assert len(CountingExecutor.created) == 1
+    assert CountingExecutor.created[0].batch == [
+        '1ª parcela de R$ 1.500,00 até o dia 25/02/2025',
+        '1ª parcela: R$ 1.200,00 até 30/03/2025',
+    ]
+    fevereiro = frame.loc[frame['MÊS'] == 'FEVEREIRO', 'ANALISE_PARCELAS'].item()
+    assert fevereiro[0]['data_vencimento'].day == 25
+
+
+def test_failed_tab_keeps_previous_version_and_is_retried(workbook, monkeypatch):
+    spreadsheet, cache = workbook
+    cache.refresh()
+
+    spreadsheet.revision = 'r2'
+    spreadsheet.tabs['FEVEREIRO'][2][2] = 'R$ 1.600,00'
+    prepare_tab = FinanceWorkbookCache._prepare_tab
+
+    def failing_prepare_tab(self, values, month, digest):
+        if month == 'FEVEREIRO':
+            raise ValueError("aba corrompida")
+        return prepare_tab(self, values, month, digest)
+
+    monkeypatch.setattr(FinanceWorkbookCache, '_prepare_tab', failing_prepare_tab)
+    frame = cache.refresh()
+
+    # A aba com erro continua no relatório com a versão anterior
+    assert frame.loc[frame['MÊS'] == 'FEVEREIRO', 'VALOR_ACORDO_NUM'].item() == 1500
+
+    # Mesma revisão no Drive: a próxima atualização tenta a aba de novo
+    monkeypatch.setattr(FinanceWorkbookCache, '_prepare_tab', prepare_tab)
+    frame = cache.refresh()
+
+    assert frame.loc[frame['MÊS'] == 'FEVEREIRO', 'VALOR_ACORDO_NUM'].item() == 1600
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from src import incremental_sync, snapshot_store
+from src.data_service import DataService
+from src.incremental_sync import DealSnapshotRegistry, IncrementalDealSync
+from src.snapshot_store import SnapshotStore
+
+
+class FakeConnector:
+    """Devolve o frame completo sem período e o delta com período, registrando as chamadas"""
+
+    def __init__(self, full_df, delta_df):
+        self.full_df = full_df
+        self.delta_df = delta_df
+        self.calls = []
+
+    def get_deals_data(self, category_ids=None, date_range=None, time_filter_column=None, fields=None):
+        self.calls.append(time_filter_column)
+        return (self.delta_df if date_range is not None else self.full_df).copy()
+
+
+def _deals(ids, modified):
+    return pd.DataFrame({'ID': ids, 'DATE_MODIFY': modified, 'TITLE': [f"deal {i}" for i in ids]})
+
+
+@pytest.fixture
+def sync_factory(monkeypatch):
+    monkeypatch.setattr(incremental_sync.st, "secrets", {})
+    registry = DealSnapshotRegistry()
+    monkeypatch.setattr(incremental_sync, "get_snapshot_registry", lambda: registry)
+    return lambda connector: IncrementalDealSync(connector)
+
+
+def test_seeded_snapshot_makes_first_sync_a_delta(sync_factory):
+    stored = _deals(['1', '2'], ['2024-05-01 10:00:00', '2024-05-02 11:00:00'])
+    connector = FakeConnector(full_df=stored, delta_df=_deals(['2', '3'], ['2024-05-03 09:00:00', '2024-05-03 10:00:00']))
+    sync = sync_factory(connector)
+
+    assert sync.seed([0], None, stored, IncrementalDealSync.compute_watermark(stored), datetime.now())
+    deals = sync.sync([0])
+
+    assert connector.calls == ['DATE_MODIFY']
+    assert sorted(deals['ID']) == ['1', '2', '3']
+    assert deals.loc[deals['ID'] == '2', 'DATE_MODIFY'].item() == '2024-05-03 09:00:00'
+
+
+def test_seed_does_not_replace_snapshot_already_in_process(sync_factory):
+    connector = FakeConnector(full_df=_deals(['1'], ['2024-05-01 10:00:00']), delta_df=_deals([], []))
+    sync = sync_factory(connector)
+    sync.sync([0])
+
+    older = _deals(['9'], ['2023-01-01 00:00:00'])
+    assert not sync.seed([0], None, older, IncrementalDealSync.compute_watermark(older), datetime.now())
+
+
+def test_seed_without_watermark_keeps_full_sync(sync_factory):
+    connector = FakeConnector(full_df=_deals(['1'], ['2024-05-01 10:00:00']), delta_df=_deals([], []))
+    sync = sync_factory(connector)
+
+    assert not sync.seed([0], None, _deals(['1'], ['2024-05-01 10:00:00']), None, datetime.now())
+    sync.sync([0])
+
+    assert connector.calls == [None]
+
+
+class FakeClock(datetime):
+    """datetime com now() controlado pelo teste"""
+    current = datetime(2024, 5, 3, 8, 0, 0)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+def test_restart_keeps_full_reconcile_deadline_after_delta_save(monkeypatch, tmp_path):
+    monkeypatch.setattr(incremental_sync.st, "secrets", {})
+    monkeypatch.setattr(incremental_sync, "datetime", FakeClock)
+    monkeypatch.setattr(snapshot_store, "datetime", FakeClock)
+    monkeypatch.setattr(incremental_sync, "get_snapshot_registry", DealSnapshotRegistry)
+    full_sync_at = FakeClock.current
+
+    stored = _deals(['1', '2'], ['2024-05-01 10:00:00', '2024-05-02 11:00:00'])
+    connector = FakeConnector(full_df=stored, delta_df=_deals(['3'], ['2024-05-03 09:00:00']))
+    service = DataService.__new__(DataService)
+    service._snapshots = SnapshotStore(str(tmp_path))
+    service._incremental_sync = IncrementalDealSync(connector)
+
+    # Carga completa e, 4h depois, um delta gravado em disco
+    service._save_raw_deals([0], None, service._incremental_sync.sync_snapshot([0]))
+    FakeClock.current = full_sync_at + timedelta(hours=4)
+    service._save_raw_deals([0], None, service._incremental_sync.sync_snapshot([0]))
+    assert connector.calls == [None, 'DATE_MODIFY']
+
+    # Reinício: registro vazio, semeado do disco com o horário da carga completa
+    service._snapshots = SnapshotStore(str(tmp_path))
+    service._incremental_sync = IncrementalDealSync(connector)
+    service._seed_incremental_sync([0], None)
+
+    FakeClock.current = full_sync_at + timedelta(hours=5)
+    service._incremental_sync.sync([0])
+    FakeClock.current = full_sync_at + timedelta(hours=6, minutes=1)
+    service._incremental_sync.sync([0])
+
+    assert connector.calls == [None, 'DATE_MODIFY', 'DATE_MODIFY', None]
@@ -0,0 +1,47 @@
+import threading
+import time
+
+from src.refresh_scheduler import BackgroundRefresher, RefreshJob
+
+
+def test_slow_job_does_not_delay_other_jobs(monkeypatch):
+    # Intervalo mínimo entre voltas do agendador reduzido para o teste
+    monkeypatch.setattr(BackgroundRefresher, "_seconds_until_next_job", lambda self: 0.01)
+    release_slow = threading.Event()
+    fast_runs = []
+
+    def slow():
+        release_slow.wait(5)
+
+    refresher = BackgroundRefresher([
+        RefreshJob(name="planilha_financeira", interval_seconds=60, refresh=slow),
+        RefreshJob(name="funil_comercial", interval_seconds=0, refresh=lambda: fast_runs.append(time.monotonic())),
+    ])
+    refresher.start()
+    try:
+        deadline = time.monotonic() + 5
+        while len(fast_runs) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        statuses = {job.name: job for job in refresher.get_jobs_status()}
+    finally:
+        release_slow.set()
+        refresher.stop()
+
+    assert len(fast_runs) >= 3
+    assert statuses["planilha_financeira"].running
+
+
+def test_failed_job_is_logged_and_rescheduled(caplog):
+    def fail():
+        raise RuntimeError("BI indisponível")
+
+    job = RefreshJob(name="g7", interval_seconds=60, refresh=fail, running=True)
+    refresher = BackgroundRefresher([job])
+
+    with caplog.at_level("ERROR", logger="jusgestante.refresh"):
+        refresher._run_job(job)
+
+    assert job.last_error == "BI indisponível"
+    assert not job.running
+    assert job.next_run_at > time.monotonic()
+    assert "Falha na atualização em segundo plano de 'g7'" in caplog.text
@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+
+from src.request_coalescer import SingleFlight
+
+
+class SessionStop(BaseException):
+    """Como RerunException/StopException do Streamlit: não deriva de Exception"""
+
+
+def _run_with_waiter(flight, leader_func, waiter_func):
+    """Executa o líder e, enquanto ele está em andamento, um segundo pedido da mesma chave"""
+    leader_started = threading.Event()
+    release_leader = threading.Event()
+    outcome = {}
+
+    def leader():
+        def func():
+            leader_started.set()
+            release_leader.wait(5)
+            return leader_func()
+        try:
+            outcome['leader'] = flight.do("consulta", func)
+        except BaseException as e:
+            outcome['leader'] = e
+
+    def waiter():
+        try:
+            outcome['waiter'] = flight.do("consulta", waiter_func)
+        except BaseException as e:
+            outcome['waiter'] = e
+
+    leader_thread = threading.Thread(target=leader)
+    leader_thread.start()
+    assert leader_started.wait(5)
+    waiter_thread = threading.Thread(target=waiter)
+    waiter_thread.start()
+    while flight.get_stats().coalesced_waiters == 0:
+        time.sleep(0.001)
+    release_leader.set()
+    leader_thread.join(5)
+    waiter_thread.join(5)
+    return outcome
+
+
+def test_waiter_shares_leader_result():
+    flight = SingleFlight()
+    outcome = _run_with_waiter(flight, lambda: "dados", lambda: pytest.fail("não deveria executar"))
+
+    assert outcome == {'leader': "dados", 'waiter': "dados"}
+    assert flight.get_stats().executions == 1
+
+
+def test_waiter_shares_leader_exception():
+    flight = SingleFlight()
+    error = ValueError("falha no BI")
+
+    def fail():
+        raise error
+
+    outcome = _run_with_waiter(flight, fail, lambda: pytest.fail("não deveria executar"))
+
+    assert outcome == {'leader': error, 'waiter': error}
+
+
+def test_waiter_retries_when_leader_session_stops():
+    flight = SingleFlight()
+
+    def stop():
+        raise SessionStop()
+
+    outcome = _run_with_waiter(flight, stop, lambda: "dados do novo líder")
+
+    assert isinstance(outcome['leader'], SessionStop)
+    assert outcome['waiter'] == "dados do novo líder"
+    assert flight.get_stats().executions == 2
@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+
+from src.shared_cache import SharedFrameCache
+
+
+def _cached_view(df: pd.DataFrame) -> pd.DataFrame:
+    cache = SharedFrameCache(memory_budget_bytes=64 * 1024 * 1024)
+    cache.set("frame", df, duration_seconds=60)
+    return cache.get("frame")
+
+
+@pytest.mark.parametrize("column, value", [
+    (pd.array([1, None, 3], dtype="Int64"), 9),
+    (pd.array([True, None, False], dtype="boolean"), False),
+    (pd.array([1.5, None, 2.5], dtype="Float64"), 9.5),
+    ([1.0, 2.0, 3.0], 9.0),
+])
+def test_shared_view_rejects_in_place_writes(column, value):
+    view = _cached_view(pd.DataFrame({"col": column}))
+
+    with pytest.raises(ValueError):
+        view["col"].values[0] = value
+
+
+@pytest.mark.parametrize("column", [
+    ["JANEIRO", "FEVEREIRO", "JANEIRO"],
+    pd.array(["JANEIRO", "FEVEREIRO", "JANEIRO"], dtype="string"),
+])
+def test_object_columns_stay_usable_in_comparisons_and_merges(column):
+    view = _cached_view(pd.DataFrame({"MÊS": column, "valor": [1.0, 2.0, 3.0]}))
+
+    assert view[view["MÊS"] == "JANEIRO"]["valor"].sum() == 4.0
+    assert len(view.merge(view[["MÊS"]].drop_duplicates(), on="MÊS")) == 3
+
+
+def test_nullable_mask_is_frozen():
+    view = _cached_view(pd.DataFrame({"col": pd.array([1, None, 3], dtype="Int64")}))
+    masked = view["col"].array
+
+    assert not masked._data.flags.writeable
+    assert not masked._mask.flags.writeable
+
+
+def test_column_assignment_does_not_reach_cached_frame():
+    df = pd.DataFrame({"col": pd.array([1, None, 3], dtype="Int64")})
+    view = _cached_view(df)
+
+    view["col"] = pd.array([7, 8, 9], dtype="Int64")
+
+    assert df["col"].isna().sum() == 1
+    assert df["col"].iloc[0] == 1
+
+
+@pytest.mark.parametrize("column", [
+    ["Ana", "Bia", "Cris"],
+    pd.array(["Ana", "Bia", "Cris"], dtype="string"),
+])
+def test_in_place_write_to_object_column_does_not_reach_cache(column):
+    cache = SharedFrameCache(memory_budget_bytes=64 * 1024 * 1024)
+    cache.set("frame", pd.DataFrame({"NOME": column, "valor": [1.0, 2.0, 3.0]}), duration_seconds=60)
+
+    view = cache.get("frame")
+    view.loc[0, "NOME"] = "X"
+
+    assert view["NOME"].iloc[0] == "X"
+    assert cache.get("frame")["NOME"].iloc[0] == "Ana"
+
+
+def test_peek_does_not_count_hits_or_misses():
+    cache = SharedFrameCache(memory_budget_bytes=64 * 1024 * 1024)
+    cache.set("frame", pd.DataFrame({"valor": [1.0]}), duration_seconds=60)
+
+    assert cache.peek("frame") is not None
+    assert cache.peek("outra") is None
+
+    stats = cache.get_stats()
+    assert (stats.hits, stats.misses) == (0, 0)
@@ -0,0 +1,47 @@
+import os
+import threading
+
+import pandas as pd
+
+from src.snapshot_store import SnapshotStore
+
+
+def _frame(version, rows):
+    return pd.DataFrame({'ID': [str(i) for i in range(rows)], 'VERSAO': [version] * rows})
+
+
+def test_snapshot_round_trip_keeps_metadata(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    assert store.save("deals", _frame(1, 3), pd.Timestamp("2024-05-03 09:00:00"))
+
+    snapshot = store.load("deals")
+
+    assert snapshot.data["VERSAO"].tolist() == [1, 1, 1]
+    assert snapshot.watermark == pd.Timestamp("2024-05-03 09:00:00")
+    assert snapshot.metadata.rows == 3
+    assert os.listdir(tmp_path) == ["deals.parquet"]
+
+
+def test_concurrent_saves_leave_a_consistent_snapshot(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    errors = []
+
+    def writer(version):
+        # Cada versão tem tamanho e marca d'água próprios: dados e metadados precisam casar
+        for _ in range(10):
+            if not store.save("deals", _frame(version, 1000 + version), pd.Timestamp(2024, 5, version)):
+                errors.append(version)
+
+    threads = [threading.Thread(target=writer, args=(version,)) for version in range(1, 7)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = store.load("deals")
+    version = snapshot.data["VERSAO"].iloc[0]
+
+    assert not errors
+    assert len(snapshot.data) == snapshot.metadata.rows == 1000 + version
+    assert snapshot.watermark == pd.Timestamp(2024, 5, version)
+    assert os.listdir(tmp_path) == ["deals.parquet"]
@@ -1,7 +1,13 @@
 import streamlit as st
 import pandas as pd
+from typing import Optional
 
-def render_analise_responsaveis_administrativo(df_administrativo: pd.DataFrame, etapas_ordem_completa: list):
+from src.deal_cube import DealCube
+from src.instrumentation import timed
+
+@timed()
+def render_analise_responsaveis_administrativo(df_administrativo: pd.DataFrame, etapas_ordem_completa: list,
+                                               cubo: Optional[DealCube] = None):
     st.subheader("Análise de Desempenho por Responsável (Trâmites Administrativos)")
 
     if df_administrativo.empty:
@@ -20,9 +26,14 @@ def render_analise_responsaveis_administrativo(df_administrativo: pd.DataFrame,
                 st.info("Coluna STAGE_SEMANTIC não encontrada.")
             return
 
+    # Contagens a partir do cubo pré-agregado (já com os filtros da página); sem ele,
+    # o cubo é montado a partir do frame recebido
+    if cubo is None:
+        cubo = DealCube.build(df_administrativo)
+
     # Certificar que ASSIGNED_BY_NAME não tem NaNs para o groupby
-    df_filtrado_resp = df_administrativo.dropna(subset=['ASSIGNED_BY_NAME'])
-    if df_filtrado_resp.empty:
+    cubo_responsaveis = cubo.without_missing('ASSIGNED_BY_NAME')
+    if len(cubo_responsaveis) == 0:
         st.warning("Não há dados de responsáveis para exibir após limpeza de NaNs.")
         return
 
@@ -31,13 +42,7 @@ def render_analise_responsaveis_administrativo(df_administrativo: pd.DataFrame,
     etapas_em_progresso = [etapa for etapa in etapas_ordem_completa if etapa not in ["PROTOCOLADO COM SUCESSO", "CANCELAMENTO"]]
 
     # Agrupar por responsável e contar negócios em cada etapa específica
-    df_pivot_resp = pd.pivot_table(
-        df_filtrado_resp,
-        index='ASSIGNED_BY_NAME',
-        columns='STAGE_NAME',
-        aggfunc='size',
-        fill_value=0
-    )
+    df_pivot_resp = cubo_responsaveis.pivot('ASSIGNED_BY_NAME', 'STAGE_NAME')
 
     # Montar o DataFrame de análise
     df_analise_resp = pd.DataFrame(index=df_pivot_resp.index)
@@ -51,11 +56,11 @@ def render_analise_responsaveis_administrativo(df_administrativo: pd.DataFrame,
     
     # Calcular "PROTOCOLADO COM SUCESSO" por responsável
     # Assumindo que IS_WON == True corresponde a "PROTOCOLADO COM SUCESSO" (via STAGE_ID C2:WON ou STAGE_SEMANTIC S/WON)
-    protocolados_sucesso = df_filtrado_resp[df_filtrado_resp['IS_WON'] == True].groupby('ASSIGNED_BY_NAME').size()
+    protocolados_sucesso = cubo_responsaveis.where(IS_WON=True).totals('ASSIGNED_BY_NAME')
     df_analise_resp['PROTOCOLADO COM SUCESSO'] = protocolados_sucesso.reindex(df_analise_resp.index, fill_value=0)
 
     # Calcular Total de Trâmites por Responsável
-    total_tramites_responsavel = df_filtrado_resp.groupby('ASSIGNED_BY_NAME').size()
+    total_tramites_responsavel = cubo_responsaveis.totals('ASSIGNED_BY_NAME')
     df_analise_resp['Total de Trâmites'] = total_tramites_responsavel.reindex(df_analise_resp.index, fill_value=0)
     
     # Calcular Percentual de Sucesso
@@ -3,6 +3,10 @@ import pandas as pd
 from datetime import date, timedelta
 import plotly.graph_objects as go
 
+from src.data_service import DataService
+from src.date_normalization import date_series
+from src.instrumentation import timed
+
 def render_universo_section(title, df_universo):
     """
     Renderiza uma seção de análise completa para um 'universo' de dados (ex: C/ Ultrassom).
@@ -16,11 +20,12 @@ def render_universo_section(title, df_universo):
 
     # --- Lógica do Responsável da Análise ---
     # Para cards em "Ganho", o responsável é o Assistente Jurídico. Para os demais, é o responsável atual.
-    df_universo['RESPONSAVEL_ANALISE'] = df_universo['ASSIGNED_BY_NAME']
+    # Texto livre (não categórico): recebe nomes de duas colunas diferentes
+    df_universo['RESPONSAVEL_ANALISE'] = df_universo['ASSIGNED_BY_NAME'].astype(object)
     condicao_ganho = df_universo['STATUS_ETAPA'] == 'Ganho'
     if 'UF_CRM_ASSISTENTE_JURIDICO' in df_universo.columns:
         # Aplica a lógica, usando o responsável atual como fallback se o campo de assistente estiver vazio
-        df_universo.loc[condicao_ganho, 'RESPONSAVEL_ANALISE'] = df_universo.loc[condicao_ganho, 'UF_CRM_ASSISTENTE_JURIDICO'].fillna(df_universo.loc[condicao_ganho, 'ASSIGNED_BY_NAME'])
+        df_universo.loc[condicao_ganho, 'RESPONSAVEL_ANALISE'] = df_universo.loc[condicao_ganho, 'UF_CRM_ASSISTENTE_JURIDICO'].astype(object).fillna(df_universo.loc[condicao_ganho, 'RESPONSAVEL_ANALISE'])
 
     # --- Cálculos para o Resumo ---
     # Total recebido no universo
@@ -83,6 +88,7 @@ def render_universo_section(title, df_universo):
         st.plotly_chart(fig_barras, use_container_width=True)
 
 
+@timed()
 def render_distribuicao_clientes_administrativo(df_distribuicao):
     """
     Renderiza a tela de distribuição de clientes.
@@ -99,8 +105,6 @@ def render_distribuicao_clientes_administrativo(df_distribuicao):
     creation_date_col = 'DATE_CREATE' if 'DATE_CREATE' in df_distribuicao.columns else 'BEGINDATE'
     
     if creation_date_col in df_distribuicao.columns:
-        df_distribuicao[creation_date_col] = pd.to_datetime(df_distribuicao[creation_date_col], errors='coerce').dt.date
-        
         data_corte = st.date_input(
             "Mostrar cards criados a partir de:",
             value=date.today(),
@@ -108,7 +112,8 @@ def render_distribuicao_clientes_administrativo(df_distribuicao):
         )
         
         # Aplica o filtro de corte principal no início
-        df_distribuicao = df_distribuicao[df_distribuicao[creation_date_col] >= data_corte].copy()
+        # Recorte pelo índice de datas do frame em cache (sem varrer todas as linhas)
+        df_distribuicao = DataService.filter_by_date_range(df_distribuicao, creation_date_col, data_corte).copy()
 
         if df_distribuicao.empty:
             st.warning("Nenhum card encontrado a partir da data de corte selecionada.")
@@ -148,13 +153,12 @@ def render_distribuicao_clientes_administrativo(df_distribuicao):
     # Filtro de Data da Venda (baseado na data encontrada)
     with col1:
         if date_col_venda:
-            # Garante que a coluna de data esteja no formato correto
-            df_distribuicao[date_col_venda] = pd.to_datetime(df_distribuicao[date_col_venda], errors='coerce').dt.date
-            datas_validas = df_distribuicao[date_col_venda].dropna()
+            # Coluna já normalizada pelo DataService: apenas os limites do período
+            datas_validas = date_series(df_distribuicao, date_col_venda).dropna()
             
             if not datas_validas.empty:
-                min_date = datas_validas.min()
-                max_date = datas_validas.max()
+                min_date = datas_validas.min().date()
+                max_date = datas_validas.max().date()
                 
                 data_venda_inicio = st.date_input(
                     "Data da Venda - Início",
@@ -213,12 +217,7 @@ def render_distribuicao_clientes_administrativo(df_distribuicao):
 
     # Aplicar filtro de data de venda (usando a coluna de data encontrada)
     if data_venda_inicio and data_venda_fim and date_col_venda:
-        # Garante que a coluna no df_filtrado também seja do tipo date para comparação
-        df_filtrado[date_col_venda] = pd.to_datetime(df_filtrado[date_col_venda], errors='coerce').dt.date
-        df_filtrado = df_filtrado[
-            (df_filtrado[date_col_venda] >= data_venda_inicio) &
-            (df_filtrado[date_col_venda] <= data_venda_fim)
-        ]
+        df_filtrado = DataService.filter_by_date_range(df_filtrado, date_col_venda, data_venda_inicio, data_venda_fim)
 
     # Aplicar filtro de ultrassom
     if 'UF_CRM_1742837922053' in df_filtrado.columns:
@@ -325,4 +324,7 @@ def render_distribuicao_clientes_administrativo(df_distribuicao):
         # Garante que apenas colunas existentes sejam selecionadas
         cols_to_display_existing = [col for col in cols_to_display if col in df_filtrado.columns]
 
-        st.dataframe(df_filtrado[cols_to_display_existing].rename(columns=rename_map)) 
\ No newline at end of file
+        df_exibicao = df_filtrado[cols_to_display_existing].copy()
+        if date_col_venda in df_exibicao.columns:
+            df_exibicao[date_col_venda] = date_series(df_exibicao, date_col_venda).dt.date
+        st.dataframe(df_exibicao.rename(columns=rename_map)) 
\ No newline at end of file
@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
+from src.instrumentation import timed
 
+@timed()
 def render_funil_administrativo(df: pd.DataFrame, etapas_ordem: list):
     st.subheader("Visão do Funil de Trâmites Administrativos")
 
@@ -14,7 +16,7 @@ def render_funil_administrativo(df: pd.DataFrame, etapas_ordem: list):
         return
     
     # Agrupa dados por etapa contando os IDs (ou qualquer coluna não nula para contagem)
-    funil_data_adm = df.groupby('STAGE_NAME').size().reset_index(name='Quantidade')
+    funil_data_adm = df.groupby('STAGE_NAME', observed=True).size().reset_index(name='Quantidade')
     funil_data_adm = funil_data_adm.set_index('STAGE_NAME')
 
     # Reordena o dataframe de acordo com a ordem das etapas fornecida
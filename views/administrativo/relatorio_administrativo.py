@@ -9,6 +9,9 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'config'))
 
 from src.data_service import DataService
+from src.instrumentation import timed
+from views.data_freshness import render_data_age
+from views.lazy_tabs import LazyTab, render_lazy_tabs
 from config.funis_config import FunilConfig # Importar FunilConfig
 # Funções dos sub-dashboards que serão criadas
 from views.administrativo.funil_administrativo import render_funil_administrativo
@@ -21,7 +24,6 @@ SUB_PAGE_URL_MAP_ADM = {
     "analise_responsavel_adm": "Análise por Responsável",
     "distribuicao_clientes_adm": "Distribuição de Clientes"
 }
-SUB_PAGE_STATE_TO_URL_MAP_ADM = {v: k for k, v in SUB_PAGE_URL_MAP_ADM.items()}
 
 # Lista de etapas para o funil administrativo (baseado no fornecido pelo usuário)
 ETAPAS_ADMINISTRATIVO_ORDEM = [
@@ -35,6 +37,7 @@ ETAPAS_ADMINISTRATIVO_ORDEM = [
     "CANCELAMENTO"
 ]
 
+@timed()
 def render_relatorio_administrativo():
     """Renderiza o relatório completo de trâmites administrativos."""
     st.title("📋 Relatório de Trâmites Administrativos")
@@ -114,16 +117,24 @@ def render_relatorio_administrativo():
     # Carrega dados do funil administrativo com base nos filtros
     with st.spinner("Carregando dados administrativos..."):
         try:
+            # Trâmites (CATEGORY_ID = 2) carregados uma única vez do cache; a aba de distribuição
+            # usa o frame completo e as demais o período de criação, recortado pelo índice de datas
+            df_distribuicao = data_service.get_tramites_data(None, None)
             if aplicar_filtro_data_criacao_adm:
-                df_administrativo = data_service.get_tramites_data(data_criacao_inicio_adm, data_criacao_fim_adm)
+                df_administrativo = data_service.filter_by_date_range(
+                    df_distribuicao, 'DATE_CREATE', data_criacao_inicio_adm, data_criacao_fim_adm
+                )
             else:
-                df_administrativo = data_service.get_tramites_data(None, None) # Carrega todos os dados se filtro de data não aplicado
-            
-            # Carrega os dados de trâmites (CATEGORY_ID = 2) para a aba de distribuição.
-            # Anteriormente estava buscando get_comercial_data().
-            df_distribuicao = data_service.get_tramites_data()
+                df_administrativo = df_distribuicao.copy(deep=False)
 
             df_administrativo_filtrado = pd.DataFrame() # DataFrame vazio por padrão
+            # Cubo por responsável montado com o frame do cache, com os mesmos filtros da página
+            cubo_administrativo = data_service.get_deal_cube(df_distribuicao).filter(
+                stages=etapas_selecionadas_adm if 'STAGE_NAME' in df_distribuicao.columns else None,
+                responsaveis=responsaveis_selecionados_adm if 'ASSIGNED_BY_NAME' in df_distribuicao.columns else None,
+                created=(data_criacao_inicio_adm, data_criacao_fim_adm) if aplicar_filtro_data_criacao_adm else None
+            )
+            render_data_age(df_administrativo)
 
             if df_administrativo.empty:
                 st.warning("Nenhum dado encontrado para os trâmites administrativos com os filtros atuais.")
@@ -140,29 +151,28 @@ def render_relatorio_administrativo():
                     st.success(f"{len(df_administrativo_filtrado)} trâmites carregados após filtros.")
                 # O aviso de "nenhum dado" será tratado dentro de cada aba
 
-            # --- Lógica de Roteamento para Sub-páginas com st.tabs ---
+            # --- Lógica de Roteamento para Sub-páginas (abas sob demanda) ---
             st.markdown("## ") 
-            tab_titles_adm = list(SUB_PAGE_URL_MAP_ADM.values())
-            default_tab_display_name = tab_titles_adm[0]
-            
-            # st.tabs não suporta `index` ou `value` para seleção inicial programática.
-            # O primeiro tab sempre estará ativo no carregamento da página ou F5.
-            tab_funil_adm, tab_analise_resp_adm, tab_distribuicao_cli_adm = st.tabs(tab_titles_adm)
-
-            with tab_funil_adm:
+
+            def render_visao_funil():
                 if df_administrativo_filtrado.empty:
                     st.warning("Não há dados para exibir o funil administrativo com os filtros selecionados.")
                 else:
                     render_funil_administrativo(df_administrativo_filtrado, ETAPAS_ADMINISTRATIVO_ORDEM)
-            
-            with tab_analise_resp_adm:
+
+            def render_analise_responsavel():
                 if df_administrativo_filtrado.empty:
                     st.warning("Não há dados para exibir a análise por responsável com os filtros selecionados.")
                 else:
-                    render_analise_responsaveis_administrativo(df_administrativo_filtrado, ETAPAS_ADMINISTRATIVO_ORDEM)
-
-            with tab_distribuicao_cli_adm:
-                render_distribuicao_clientes_administrativo(df_distribuicao)
+                    render_analise_responsaveis_administrativo(df_administrativo_filtrado, ETAPAS_ADMINISTRATIVO_ORDEM, cubo_administrativo)
+
+            # Somente a aba ativa (sub_pagina da URL ou a última escolhida) é calculada a cada rerun
+            render_lazy_tabs([
+                LazyTab("visao_funil_adm", SUB_PAGE_URL_MAP_ADM["visao_funil_adm"], render_visao_funil),
+                LazyTab("analise_responsavel_adm", SUB_PAGE_URL_MAP_ADM["analise_responsavel_adm"], render_analise_responsavel),
+                LazyTab("distribuicao_clientes_adm", SUB_PAGE_URL_MAP_ADM["distribuicao_clientes_adm"],
+                        lambda: render_distribuicao_clientes_administrativo(df_distribuicao)),
+            ], state_key="current_administrativo_sub_page")
 
         except Exception as e:
             st.error(f"Erro ao carregar dados administrativos: {str(e)}")
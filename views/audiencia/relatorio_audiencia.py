@@ -11,6 +11,9 @@ import os
 # sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'config'))
 
 from src.data_service import DataService
+from src.instrumentation import timed
+from views.data_freshness import render_data_age
+from views.lazy_tabs import LazyTab, render_lazy_tabs
 # Removido FunilConfig daqui, pois não é mais usado diretamente para stage_distribution
 
 # Importar as funções das abas
@@ -24,7 +27,6 @@ SUB_PAGE_URL_MAP_AUD = {
     "analise_responsavel_aud": "Análise por Responsável",
     "agenda_audiencia_aud": "Agenda de Audiências",
 }
-SUB_PAGE_STATE_TO_URL_MAP_AUD = {v: k for k, v in SUB_PAGE_URL_MAP_AUD.items()}
 
 # Definindo as etapas do funil de Audiência com base no fornecido
 ETAPAS_AUDIENCIA_ORDEM = [
@@ -45,8 +47,8 @@ ETAPAS_AUDIENCIA_ORDEM = [
 
 CATEGORY_ID_AUDIENCIA = 4
 
-# Função cacheada para carregar e processar os dados base
-@st.cache_data(ttl=1800) # Cache por 30 minutos
+# Carrega e processa os dados base. O cache fica no DataService (compartilhado entre
+# sessões e mantido atualizado em segundo plano), por isso não há st.cache_data aqui.
 def load_audiencia_data_base(_data_service_instance, category_id, start_date_str, end_date_str):
     """Carrega e processa os dados base para o relatório de audiência."""
     # Converte strings de data de volta para objetos date, se não forem None
@@ -57,7 +59,8 @@ def load_audiencia_data_base(_data_service_instance, category_id, start_date_str
     return _data_service_instance.get_deals_by_category(
         category_ids=[category_id],
         start_date=start_dt,
-        end_date=end_dt
+        end_date=end_dt,
+        columns=DataService.AUDIENCIA_COLUMNS
     )
 
 # Função cacheada para carregar dados para os seletores da sidebar
@@ -105,6 +108,7 @@ def load_data_for_selectors_audiencia(_data_service_instance, category_id):
     # st.info(f"Seletores: {len(etapas)} etapas, {len(responsaveis)} responsáveis.") # Para depuração
     return etapas, responsaveis
 
+@timed()
 def display_relatorio_audiencia():
     st.title("⚖️ Relatório de Audiências") # Emoji alterado para diferenciar
 
@@ -141,21 +145,21 @@ def display_relatorio_audiencia():
             responsaveis_selecionados_aud = []
             st.markdown("**👤 Responsável (Audiência):** Nenhum responsável encontrado.")
 
-    # Define as datas para a consulta principal com base na checkbox
-    query_start_date = data_criacao_inicio_aud if aplicar_filtro_data_criacao_aud else None
-    query_end_date = data_criacao_fim_aud if aplicar_filtro_data_criacao_aud else None
-
-    # Converte datas para string para a chave do cache (ou None)
-    start_date_key = query_start_date.strftime("%Y-%m-%d") if query_start_date else None
-    end_date_key = query_end_date.strftime("%Y-%m-%d") if query_end_date else None
-
     with st.spinner("Carregando dados de audiências..."):
         try:
-            df_audiencia_base = load_audiencia_data_base(data_service, CATEGORY_ID_AUDIENCIA, start_date_key, end_date_key)
+            # Frame completo do cache; o período de criação é recortado pelo índice de datas
+            df_audiencia_base = load_audiencia_data_base(data_service, CATEGORY_ID_AUDIENCIA, None, None)
+            cubo_audiencia = data_service.get_deal_cube(df_audiencia_base)
+            if aplicar_filtro_data_criacao_aud and not df_audiencia_base.empty:
+                df_audiencia_base = data_service.filter_by_date_range(
+                    df_audiencia_base, 'DATE_CREATE', data_criacao_inicio_aud, data_criacao_fim_aud
+                )
             
             if df_audiencia_base.empty:
                 st.warning("Nenhum dado encontrado para audiências com os filtros de data atuais.")
                 return
+            
+            render_data_age(df_audiencia_base)
 
             # Aplica filtros de etapas e responsáveis no DataFrame já processado e cacheado
             df_audiencia_filtrado = df_audiencia_base.copy()
@@ -169,58 +173,25 @@ def display_relatorio_audiencia():
                 st.warning("Nenhum dado encontrado para audiências após aplicar todos os filtros (etapas, responsáveis).")
                 return
             
-            num_deals_filtrados = len(df_audiencia_filtrado)
+            # Os mesmos filtros aplicados às células do cubo por responsável
+            cubo_audiencia = cubo_audiencia.filter(
+                stages=etapas_selecionadas_aud if 'STAGE_NAME' in df_audiencia_filtrado.columns else None,
+                responsaveis=responsaveis_selecionados_aud if 'ASSIGNED_BY_NAME' in df_audiencia_filtrado.columns else None,
+                created=(data_criacao_inicio_aud, data_criacao_fim_aud) if aplicar_filtro_data_criacao_aud else None
+            )
             
-            # --- Lógica de Roteamento para Sub-páginas com st.tabs ---
-            base_tab_titles_aud = list(SUB_PAGE_URL_MAP_AUD.values()) # Nomes base para lógica e mapeamento
-            display_tab_titles_aud = [
-                f"📊 {base_tab_titles_aud[0]} ({num_deals_filtrados})", 
-                f"👤 {base_tab_titles_aud[1]} ({num_deals_filtrados})",
-                f"🗓️ {base_tab_titles_aud[2]} ({num_deals_filtrados})"
-            ]
-            
-            # st.tabs não suporta `index` ou `value` para seleção inicial programática.
-            # O primeiro tab sempre estará ativo no carregamento da página ou F5.
-            tab_visao_geral, tab_analise_resp, tab_agenda = st.tabs(display_tab_titles_aud)
-
-            # Para manter o URL atualizado com o tab clicado:
-            if 'current_audiencia_sub_page_display_base' not in st.session_state:
-                 # Usa o nome base para o estado, pois os nomes de display são dinâmicos
-                st.session_state.current_audiencia_sub_page_display_base = base_tab_titles_aud[0]
-            
-            current_active_tab_url_key_aud = None
-
-            with tab_visao_geral:
-                # Compara com o nome base do tab
-                if st.session_state.get('current_audiencia_sub_page_display_base') != base_tab_titles_aud[0]:
-                    st.session_state.current_audiencia_sub_page_display_base = base_tab_titles_aud[0]
-                    current_active_tab_url_key_aud = SUB_PAGE_STATE_TO_URL_MAP_AUD.get(base_tab_titles_aud[0])
-                
-                display_visao_geral_audiencia(df_audiencia_filtrado, data_service, ETAPAS_AUDIENCIA_ORDEM)
-            
-            with tab_analise_resp:
-                if st.session_state.get('current_audiencia_sub_page_display_base') != base_tab_titles_aud[1]:
-                    st.session_state.current_audiencia_sub_page_display_base = base_tab_titles_aud[1]
-                    current_active_tab_url_key_aud = SUB_PAGE_STATE_TO_URL_MAP_AUD.get(base_tab_titles_aud[1])
-                
-                display_analise_responsavel_audiencia(df_audiencia_filtrado, data_service, ETAPAS_AUDIENCIA_ORDEM)
+            num_deals_filtrados = len(df_audiencia_filtrado)
             
-            with tab_agenda:
-                if st.session_state.get('current_audiencia_sub_page_display_base') != base_tab_titles_aud[2]:
-                    st.session_state.current_audiencia_sub_page_display_base = base_tab_titles_aud[2]
-                    current_active_tab_url_key_aud = SUB_PAGE_STATE_TO_URL_MAP_AUD.get(base_tab_titles_aud[2])
-                
-                display_agenda_audiencia_tab(df_audiencia_filtrado)
-
-            # Atualiza o URL fora dos blocos 'with'
-            current_url_sub_page_aud = st.query_params.get("sub_pagina")
-            if current_active_tab_url_key_aud and current_url_sub_page_aud != current_active_tab_url_key_aud:
-                st.query_params.sub_pagina = current_active_tab_url_key_aud
-                st.rerun()
-            elif not current_active_tab_url_key_aud and st.session_state.current_audiencia_sub_page_display_base == base_tab_titles_aud[0] and current_url_sub_page_aud is not None:
-                # Se o tab ativo é o primeiro (default) e existe sub_pagina no URL, remove-o
-                del st.query_params["sub_pagina"]
-                st.rerun()
+            # --- Lógica de Roteamento para Sub-páginas (abas sob demanda) ---
+            # Somente a aba ativa (sub_pagina da URL ou a última escolhida) é calculada a cada rerun
+            render_lazy_tabs([
+                LazyTab("visao_geral_aud", f"📊 {SUB_PAGE_URL_MAP_AUD['visao_geral_aud']} ({num_deals_filtrados})",
+                        lambda: display_visao_geral_audiencia(df_audiencia_filtrado, data_service, ETAPAS_AUDIENCIA_ORDEM)),
+                LazyTab("analise_responsavel_aud", f"👤 {SUB_PAGE_URL_MAP_AUD['analise_responsavel_aud']} ({num_deals_filtrados})",
+                        lambda: display_analise_responsavel_audiencia(df_audiencia_filtrado, data_service, ETAPAS_AUDIENCIA_ORDEM, cubo_audiencia)),
+                LazyTab("agenda_audiencia_aud", f"🗓️ {SUB_PAGE_URL_MAP_AUD['agenda_audiencia_aud']} ({num_deals_filtrados})",
+                        lambda: display_agenda_audiencia_tab(df_audiencia_filtrado)),
+            ], state_key="current_audiencia_sub_page")
 
         except Exception as e:
             st.error(f"Erro ao carregar ou processar dados de audiências: {str(e)}")
@@ -2,8 +2,12 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 
+from src.date_normalization import date_series
+from src.instrumentation import timed
+
 DATA_AUDIENCIA_FIELD = 'UF_CRM_1731693426655' # Campo da Data da Audiência
 
+@timed()
 def display_agenda_audiencia_tab(df_audiencia: pd.DataFrame):
     st.subheader("📅 Agenda de Audiências")
 
@@ -11,9 +15,9 @@ def display_agenda_audiencia_tab(df_audiencia: pd.DataFrame):
         st.warning(f"Não há dados de audiência ou a coluna '{DATA_AUDIENCIA_FIELD}' não foi encontrada.")
         return
 
-    # Garante que a coluna de data da audiência é do tipo datetime e remove NaT
+    # Data da audiência já normalizada pelo DataService; remove NaT
     df_agenda = df_audiencia.copy()
-    df_agenda[DATA_AUDIENCIA_FIELD] = pd.to_datetime(df_agenda[DATA_AUDIENCIA_FIELD], errors='coerce')
+    df_agenda[DATA_AUDIENCIA_FIELD] = date_series(df_agenda, DATA_AUDIENCIA_FIELD, date_only=True)
     df_agenda.dropna(subset=[DATA_AUDIENCIA_FIELD], inplace=True)
 
     if df_agenda.empty:
@@ -21,6 +25,49 @@ def display_agenda_audiencia_tab(df_audiencia: pd.DataFrame):
         return
 
     # --- Seção 1: Tabela de Totais Mensais com Filtro de Ano ---
+    _render_audiencias_por_mes(df_agenda)
+
+    # --- Seção 2: Visualização Detalhada (Estilo Calendário/Agenda) ---
+    st.markdown("--- ") # Separador
+    st.markdown("#### Detalhes das Audiências (por Data)")
+
+    # Ordenar pela data da audiência mais recente primeiro, ou mais antiga - a decidir
+    df_agenda_sorted = df_agenda.sort_values(by=DATA_AUDIENCIA_FIELD, ascending=True)
+
+    # Selecionar colunas relevantes para exibição
+    colunas_exibir = [
+        DATA_AUDIENCIA_FIELD,
+        'TITLE', # Título do Deal/Processo
+        'STAGE_NAME', # Etapa atual
+        'ASSIGNED_BY_NAME' # Responsável
+    ]
+    # Adicionar outras colunas se existirem e forem úteis, ex: 'COMPANY_TITLE' ou 'CONTACT_NAME'
+    # if 'COMPANY_TITLE' in df_agenda_sorted.columns: colunas_exibir.append('COMPANY_TITLE')
+
+    df_display_agenda = df_agenda_sorted[[col for col in colunas_exibir if col in df_agenda_sorted.columns]].copy()
+    
+    # Formatar a data para exibição
+    df_display_agenda[DATA_AUDIENCIA_FIELD] = df_display_agenda[DATA_AUDIENCIA_FIELD].dt.strftime('%d/%m/%Y')
+    df_display_agenda.rename(columns={
+        DATA_AUDIENCIA_FIELD: 'Data da Audiência',
+        'TITLE': 'Processo/Deal',
+        'STAGE_NAME': 'Etapa Atual',
+        'ASSIGNED_BY_NAME': 'Responsável'
+    }, inplace=True)
+
+    if df_display_agenda.empty:
+        st.info("Não há detalhes de audiências para exibir.")
+    else:
+        st.dataframe(df_display_agenda, height=600, use_container_width=True)
+
+    # TODO: Adicionar mais interatividade ou visualizações se necessário,
+    # como um calendário visual real (se uma biblioteca for permitida no futuro)
+    # ou agrupar por semana, etc. 
+
+
+# Fragmento: trocar o ano reexecuta só a tabela mensal, sobre as audiências já carregadas
+@st.fragment
+def _render_audiencias_por_mes(df_agenda: pd.DataFrame):
     st.markdown("#### Audiências Agrupadas por Mês")
     
     # Filtro de Ano
@@ -59,40 +106,3 @@ def display_agenda_audiencia_tab(df_audiencia: pd.DataFrame):
         audiencias_por_mes_display = audiencias_por_mes[['Mês', 'Total de Audiências']]
         
         st.table(audiencias_por_mes_display.set_index('Mês'))
-
-    # --- Seção 2: Visualização Detalhada (Estilo Calendário/Agenda) ---
-    st.markdown("--- ") # Separador
-    st.markdown("#### Detalhes das Audiências (por Data)")
-
-    # Ordenar pela data da audiência mais recente primeiro, ou mais antiga - a decidir
-    df_agenda_sorted = df_agenda.sort_values(by=DATA_AUDIENCIA_FIELD, ascending=True)
-
-    # Selecionar colunas relevantes para exibição
-    colunas_exibir = [
-        DATA_AUDIENCIA_FIELD,
-        'TITLE', # Título do Deal/Processo
-        'STAGE_NAME', # Etapa atual
-        'ASSIGNED_BY_NAME' # Responsável
-    ]
-    # Adicionar outras colunas se existirem e forem úteis, ex: 'COMPANY_TITLE' ou 'CONTACT_NAME'
-    # if 'COMPANY_TITLE' in df_agenda_sorted.columns: colunas_exibir.append('COMPANY_TITLE')
-
-    df_display_agenda = df_agenda_sorted[[col for col in colunas_exibir if col in df_agenda_sorted.columns]].copy()
-    
-    # Formatar a data para exibição
-    df_display_agenda[DATA_AUDIENCIA_FIELD] = df_display_agenda[DATA_AUDIENCIA_FIELD].dt.strftime('%d/%m/%Y')
-    df_display_agenda.rename(columns={
-        DATA_AUDIENCIA_FIELD: 'Data da Audiência',
-        'TITLE': 'Processo/Deal',
-        'STAGE_NAME': 'Etapa Atual',
-        'ASSIGNED_BY_NAME': 'Responsável'
-    }, inplace=True)
-
-    if df_display_agenda.empty:
-        st.info("Não há detalhes de audiências para exibir.")
-    else:
-        st.dataframe(df_display_agenda, height=600, use_container_width=True)
-
-    # TODO: Adicionar mais interatividade ou visualizações se necessário,
-    # como um calendário visual real (se uma biblioteca for permitida no futuro)
-    # ou agrupar por semana, etc. 
\ No newline at end of file
@@ -1,8 +1,13 @@
 import streamlit as st
 import pandas as pd
+from typing import Optional
 from src.data_service import DataService
+from src.deal_cube import DealCube
+from src.instrumentation import timed
 
-def display_analise_responsavel_audiencia(df_audiencia: pd.DataFrame, data_service: DataService, etapas_ordem: list):
+@timed()
+def display_analise_responsavel_audiencia(df_audiencia: pd.DataFrame, data_service: DataService, etapas_ordem: list,
+                                          cubo: Optional[DealCube] = None):
     st.subheader("Análise de Deals por Responsável e Etapa")
 
     if df_audiencia.empty:
@@ -16,22 +21,19 @@ def display_analise_responsavel_audiencia(df_audiencia: pd.DataFrame, data_servi
             st.error(f"A coluna necessária '{col}' não foi encontrada nos dados de audiência. Verifique a fonte de dados.")
             return
 
-    # Garantir que ASSIGNED_BY_NAME não tem NaNs para o groupby e pivot
-    df_audiencia_filtrado = df_audiencia.dropna(subset=['ASSIGNED_BY_NAME'])
-    if df_audiencia_filtrado.empty:
+    # Contagens a partir do cubo pré-agregado (já com os filtros da página); sem ele,
+    # o cubo é montado a partir do frame recebido
+    if cubo is None:
+        cubo = data_service.get_deal_cube(df_audiencia)
+
+    # Garantir que ASSIGNED_BY_NAME não tem NaNs para o pivot
+    cubo_responsaveis = cubo.without_missing('ASSIGNED_BY_NAME')
+    if len(cubo_responsaveis) == 0:
         st.info("Não há dados de responsáveis (ASSIGNED_BY_NAME) para exibir após remover valores nulos.")
         return
 
-    # 1. Agrupar por responsável (usando ASSIGNED_BY_NAME) e etapa para contar deals
-    # Usamos pivot_table para transformar STAGE_NAME em colunas
-    pivot_df = pd.pivot_table(
-        df_audiencia_filtrado,
-        index='ASSIGNED_BY_NAME', # Usar diretamente o nome do responsável
-        columns='STAGE_NAME',
-        values='ID', # Contar ocorrências de ID (deals)
-        aggfunc='size', # Equivalente a count() para groupby
-        fill_value=0
-    )
+    # 1. Contar deals por responsável e etapa (STAGE_NAME vira coluna)
+    pivot_df = cubo_responsaveis.pivot('ASSIGNED_BY_NAME', 'STAGE_NAME')
 
     # 2. Reordenar colunas de acordo com etapas_ordem e adicionar etapas faltantes
     # Garante que todas as etapas da lista 'etapas_ordem' estejam presentes como colunas
@@ -2,7 +2,9 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 from src.data_service import DataService
+from src.instrumentation import timed
 
+@timed()
 def display_visao_geral_audiencia(df_audiencia: pd.DataFrame, data_service: DataService, etapas_ordem: list):
     st.subheader("Distribuição por Estágio")
 
@@ -12,7 +14,9 @@ def display_visao_geral_audiencia(df_audiencia: pd.DataFrame, data_service: Data
 
     # Calcular a distribuição de estágios a partir do DataFrame fornecido
     if 'STAGE_NAME' in df_audiencia.columns:
-        stage_distribution = df_audiencia['STAGE_NAME'].value_counts().reset_index()
+        # STAGE_NAME é categórico: value_counts lista também as etapas sem deals
+        stage_counts = df_audiencia['STAGE_NAME'].value_counts()
+        stage_distribution = stage_counts[stage_counts > 0].reset_index()
         stage_distribution.columns = ['STAGE_NAME', 'COUNT']
         
         # Ordenar os estágios de acordo com a etapas_ordem fornecida
@@ -3,7 +3,14 @@ import pandas as pd
 import plotly.express as px # Adicionado para gráficos
 from datetime import date, timedelta # Adicionado para manipulação de datas
 
-def render_analise_responsaveis(df_comercial: pd.DataFrame):
+from typing import Optional
+
+from src.date_normalization import date_series
+from src.deal_cube import DealCube
+from src.instrumentation import timed
+
+@timed()
+def render_analise_responsaveis(df_comercial: pd.DataFrame, cubo: Optional[DealCube] = None):
     st.header("Análise de Desempenho por Responsável")
 
     if df_comercial.empty:
@@ -33,21 +40,19 @@ def render_analise_responsaveis(df_comercial: pd.DataFrame):
             st.error(f"A coluna necessária '{col}' não foi encontrada nos dados.")
             return
 
+    # Contagens a partir do cubo pré-agregado (já com os filtros da página); sem ele,
+    # o cubo é montado a partir do frame recebido
+    if cubo is None:
+        cubo = DealCube.build(df_comercial)
+
     # Certificar que ASSIGNED_BY_NAME não tem NaNs para o groupby
-    df_comercial_filtrado = df_comercial.dropna(subset=['ASSIGNED_BY_NAME'])
-    if df_comercial_filtrado.empty:
+    cubo_responsaveis = cubo.without_missing('ASSIGNED_BY_NAME')
+    if len(cubo_responsaveis) == 0:
         st.warning("Não há dados de responsáveis para exibir.")
         return
         
-    # Agrupar por responsável e contar negócios em cada etapa específica
-    # Usamos pivot_table para transformar STAGE_NAME em colunas
-    df_pivot = pd.pivot_table(
-        df_comercial_filtrado,
-        index='ASSIGNED_BY_NAME',
-        columns='STAGE_NAME',
-        aggfunc='size',
-        fill_value=0
-    )
+    # Contar negócios de cada responsável em cada etapa (STAGE_NAME vira coluna)
+    df_pivot = cubo_responsaveis.pivot('ASSIGNED_BY_NAME', 'STAGE_NAME')
 
     # Selecionar e reordenar as colunas de etapas desejadas
     # Se uma etapa não existir nos dados do pivot, será preenchida com 0
@@ -59,12 +64,12 @@ def render_analise_responsaveis(df_comercial: pd.DataFrame):
             df_analise[etapa] = 0
 
     # Calcular Negócios Fechados (IS_WON == True)
-    negocios_fechados_por_responsavel = df_comercial_filtrado[df_comercial_filtrado['IS_WON'] == True].groupby('ASSIGNED_BY_NAME').size()
+    negocios_fechados_por_responsavel = cubo_responsaveis.where(IS_WON=True).totals('ASSIGNED_BY_NAME')
     df_analise['NEGÓCIO FECHADO'] = negocios_fechados_por_responsavel.reindex(df_analise.index, fill_value=0)
 
     # Calcular Total de Negócios por Responsável
     # O total de negócios inclui todos os negócios, independentemente da etapa final.
-    total_negocios_por_responsavel = df_comercial_filtrado.groupby('ASSIGNED_BY_NAME').size()
+    total_negocios_por_responsavel = cubo_responsaveis.totals('ASSIGNED_BY_NAME')
     df_analise['Total de Negócios'] = total_negocios_por_responsavel.reindex(df_analise.index, fill_value=0)
     
     # Calcular Percentual de Conversão
@@ -107,13 +112,20 @@ def render_analise_responsaveis(df_comercial: pd.DataFrame):
         st.info("Não há dados de vendas fechadas com data para exibir no gráfico.")
         return
 
-    df_vendas_original.loc[:, 'DATA_VENDA'] = pd.to_datetime(df_vendas_original['UF_CRM_DATA_FECHAMENTO1'], errors='coerce').dt.date
+    df_vendas_original.loc[:, 'DATA_VENDA'] = date_series(df_vendas_original, 'UF_CRM_DATA_FECHAMENTO1', date_only=True).dt.date
     df_vendas_original.dropna(subset=['DATA_VENDA'], inplace=True)
 
     if df_vendas_original.empty:
         st.info("Não há dados de vendas válidos após o processamento inicial das datas.")
         return
 
+    _render_vendas_diarias(df_vendas_original)
+
+
+# Fragmento: o filtro de responsável e o período do gráfico reexecutam só este trecho,
+# sobre as vendas já filtradas pela página, sem recarregar os dados nem redesenhar as abas
+@st.fragment
+def _render_vendas_diarias(df_vendas_original: pd.DataFrame):
     # Filtro por pessoa responsável para o gráfico de vendas diárias
     responsaveis_vendas_disponiveis = sorted(df_vendas_original['ASSIGNED_BY_NAME'].dropna().unique())
 
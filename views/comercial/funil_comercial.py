@@ -5,7 +5,9 @@ import plotly.graph_objects as go
 
 # Importações de serviços e configurações
 from config.funis_config import FunilConfig
+from src.instrumentation import timed
 
+@timed()
 def render_funil_comercial(df: pd.DataFrame):
     """Renderiza visualização do funil comercial"""
     st.markdown("---")
@@ -16,7 +18,7 @@ def render_funil_comercial(df: pd.DataFrame):
         return
     
     # Agrupa dados por etapa
-    funil_data = df.groupby('STAGE_NAME').agg({
+    funil_data = df.groupby('STAGE_NAME', observed=True).agg({
         'ID': 'count',
         'OPPORTUNITY': 'sum'
     }).rename(columns={'ID': 'Quantidade', 'OPPORTUNITY': 'Valor_Total'})
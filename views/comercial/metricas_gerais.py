@@ -4,7 +4,9 @@ from datetime import date, timedelta
 
 # Importações de serviços e configurações
 from src.data_service import DataService
+from src.instrumentation import timed
 
+@timed()
 def render_metricas_gerais(df: pd.DataFrame):
     """Renderiza métricas simplificadas do funil comercial"""
     st.markdown("---")
@@ -18,9 +20,6 @@ def render_metricas_gerais(df: pd.DataFrame):
     estrategia_usada = "Nenhuma"
 
     if 'IS_WON' in df.columns and 'UF_CRM_DATA_FECHAMENTO1' in df.columns:
-        # Garante que a coluna de data de venda seja do tipo date
-        df['UF_CRM_DATA_FECHAMENTO1'] = df['UF_CRM_DATA_FECHAMENTO1'].apply(lambda x: x.date() if isinstance(x, pd.Timestamp) else x)
-        
         # Inicia a condição de filtro com IS_WON
         condicao_filtro = (df['IS_WON'] == True)
 
@@ -15,6 +15,10 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'config'))
 
 from src.data_service import DataService
+from src.bitrix_connector import BitrixConnector, BitrixDataCache
+from src.instrumentation import timed
+from views.data_freshness import render_data_age
+from views.lazy_tabs import LazyTab, render_lazy_tabs
 from config.funis_config import FunilConfig
 
 # Importa as novas funções dos sub-dashboards
@@ -29,8 +33,8 @@ SUB_PAGE_URL_MAP = {
     "analise_responsavel": "Análise por Responsável",
     "detalhes_negocios": "Detalhes dos Negócios",
 }
-SUB_PAGE_STATE_TO_URL_MAP = {v: k for k, v in SUB_PAGE_URL_MAP.items()}
 
+@timed()
 def render_relatorio_comercial():
     """Renderiza o relatório completo do funil comercial"""
     
@@ -220,44 +224,63 @@ def render_relatorio_comercial():
             except Exception as e:
                 st.error(f"Erro ao carregar dados brutos: {e}")
 
+            cache_stats = BitrixDataCache.get_cache_stats()
+            st.caption(
+                f"Cache compartilhado: {cache_stats.hits} acertos ({cache_stats.stale_hits} desatualizados, "
+                f"{cache_stats.revalidations} revalidações) | {cache_stats.misses} faltas | "
+                f"{cache_stats.evictions} remoções | {cache_stats.used_bytes / 1024 / 1024:.1f} MB em uso"
+            )
+            coalescing_stats = BitrixConnector.get_coalescing_stats()
+            st.caption(
+                f"Requisições coalescidas: {coalescing_stats.coalesced_waiters} aguardaram "
+                f"{coalescing_stats.executions} chamadas | espera total {coalescing_stats.total_wait_seconds:.2f}s "
+                f"(máx. {coalescing_stats.max_wait_seconds:.2f}s)"
+            )
+            request_timings = BitrixConnector.get_request_timings()
+            if request_timings:
+                st.markdown("**Tempo das últimas requisições**")
+                st.dataframe(
+                    pd.DataFrame([{
+                        'Requisição': timing.label,
+                        'Segundos': round(timing.seconds, 3),
+                        'Linhas': timing.rows,
+                        'Início': timing.started_at.strftime('%H:%M:%S'),
+                        'Thread': timing.thread_name
+                    } for timing in request_timings]),
+                    use_container_width=True,
+                    hide_index=True
+                )
+
     # Carrega dados do funil comercial
     with st.spinner("Carregando dados..."):
         try:
-            # Carrega todos os dados comerciais
-            # Se o filtro de data de criação não estiver aplicado, passe None para as datas
-            if aplicar_filtro_data_criacao:
-                df_comercial = data_service.get_comercial_data(data_criacao_inicio, data_criacao_fim)
-            else:
-                df_comercial = data_service.get_comercial_data(None, None)
+            # Carrega todos os dados comerciais (frame em cache, atualizado em segundo plano)
+            df_comercial = data_service.get_comercial_data(None, None)
             
             if df_comercial.empty:
                 st.warning("Nenhum dado encontrado")
                 return
             
-            # Aplica filtros adicionais
-            if etapas_selecionadas and 'STAGE_NAME' in df_comercial.columns:
-                df_comercial = df_comercial[df_comercial['STAGE_NAME'].isin(etapas_selecionadas)]
+            render_data_age(df_comercial)
             
-            # Aplica filtro por responsável selecionado
-            if responsaveis_selecionados and 'ASSIGNED_BY_NAME' in df_comercial.columns:
-                df_comercial = df_comercial[df_comercial['ASSIGNED_BY_NAME'].isin(responsaveis_selecionados)]
-
-            if df_comercial.empty:
-                st.warning("Nenhum dado após filtros de etapa e responsável.")
-                return
+            # Cubo por responsável pré-agregado junto com o frame do cache
+            cubo_comercial = data_service.get_deal_cube(df_comercial)
+            
+            # Filtros de período primeiro, enquanto o frame ainda é o do cache: cada um usa o
+            # índice ordenado da coluna de data (busca binária em vez de varrer todas as linhas)
+            if aplicar_filtro_data_criacao:
+                df_comercial = data_service.filter_by_date_range(
+                    df_comercial, 'DATE_CREATE', data_criacao_inicio, data_criacao_fim
+                )
+                if df_comercial.empty:
+                    st.warning("Nenhum dado encontrado")
+                    return
 
             # Aplicar filtro de Data de Venda (UF_CRM_DATA_FECHAMENTO1) se estiver ativo
             if aplicar_filtro_data_venda and 'UF_CRM_DATA_FECHAMENTO1' in df_comercial.columns:
-                # Certificar que a coluna de data de venda seja do tipo date para comparação
-                # A conversão para datetime e depois para date é mais robusta
-                df_comercial['UF_CRM_DATA_FECHAMENTO1'] = pd.to_datetime(df_comercial['UF_CRM_DATA_FECHAMENTO1'], errors='coerce').dt.date
-                
-                # Filtrar o DataFrame
-                df_comercial = df_comercial[
-                    df_comercial['UF_CRM_DATA_FECHAMENTO1'].notna() &
-                    (df_comercial['UF_CRM_DATA_FECHAMENTO1'] >= data_venda_inicio) &
-                    (df_comercial['UF_CRM_DATA_FECHAMENTO1'] <= data_venda_fim)
-                ]
+                df_comercial = data_service.filter_by_date_range(
+                    df_comercial, 'UF_CRM_DATA_FECHAMENTO1', data_venda_inicio, data_venda_fim
+                )
                 if df_comercial.empty:
                     st.warning("Nenhum dado após filtro de Data de Venda.")
                     return
@@ -265,71 +288,50 @@ def render_relatorio_comercial():
                 st.warning("Coluna 'UF_CRM_DATA_FECHAMENTO1' não encontrada para aplicar o filtro de Data de Venda.")
                 # Decide-se prosseguir sem este filtro ou retornar, dependendo do requisito.
                 # Aqui, vamos prosseguir, mas com o aviso.
+            
+            # Aplica filtros adicionais
+            if etapas_selecionadas and 'STAGE_NAME' in df_comercial.columns:
+                df_comercial = df_comercial[df_comercial['STAGE_NAME'].isin(etapas_selecionadas)]
+            
+            # Aplica filtro por responsável selecionado
+            if responsaveis_selecionados and 'ASSIGNED_BY_NAME' in df_comercial.columns:
+                df_comercial = df_comercial[df_comercial['ASSIGNED_BY_NAME'].isin(responsaveis_selecionados)]
+
+            if df_comercial.empty:
+                st.warning("Nenhum dado após filtros de etapa e responsável.")
+                return
 
             if df_comercial.empty: # Checagem final após todos os filtros
                 st.warning("Nenhum dado encontrado após a aplicação de todos os filtros.")
                 return
             
-            # --- Lógica de Roteamento para Sub-páginas com st.tabs ---
-            st.markdown("## ") # Espaço para o título das abas
-
-            tab_titles = list(SUB_PAGE_URL_MAP.values())
-            
-            # st.tabs não suporta `index` ou `value` para seleção inicial programática.
-            # O primeiro tab sempre estará ativo no carregamento da página ou F5.
-            # A URL só refletirá o tab clicado pelo usuário, mas não o controlará inicialmente.
-            tab_visao_geral, tab_analise_resp, tab_detalhes = st.tabs(tab_titles)
-
-            # Para manter o URL atualizado com o tab clicado:
-            # Usamos st.session_state para guardar o tab selecionado e atualizar o URL
-            # Isso será atualizado APÓS o usuário clicar em um tab, nao no carregamento inicial.
-            if 'current_commercial_sub_page_display' not in st.session_state:
-                # Inicializa com o primeiro tab por padrao, que é o que st.tabs faz visualmente
-                st.session_state.current_commercial_sub_page_display = tab_titles[0]
+            # Os mesmos filtros aplicados às células do cubo
+            cubo_comercial = cubo_comercial.filter(
+                stages=etapas_selecionadas if 'STAGE_NAME' in df_comercial.columns else None,
+                responsaveis=responsaveis_selecionados if 'ASSIGNED_BY_NAME' in df_comercial.columns else None,
+                created=(data_criacao_inicio, data_criacao_fim) if aplicar_filtro_data_criacao else None,
+                sold=(data_venda_inicio, data_venda_fim)
+                if aplicar_filtro_data_venda and 'UF_CRM_DATA_FECHAMENTO1' in df_comercial.columns else None
+            )
             
-            # Determine qual tab foi clicado e atualize o URL
-            # Isso requer que cada bloco 'with' seja executado para verificar o click
-            current_active_tab_url_key = None
-
-            with tab_visao_geral:
-                # Se este tab está ativo, atualize o estado e URL
-                if st.session_state.get('current_commercial_sub_page_display') != "Visão Geral":
-                    st.session_state.current_commercial_sub_page_display = "Visão Geral"
-                    current_active_tab_url_key = SUB_PAGE_STATE_TO_URL_MAP.get("Visão Geral")
-                    # st.rerun() será chamado no final, se o URL precisar de atualização
+            # --- Lógica de Roteamento para Sub-páginas (abas sob demanda) ---
+            st.markdown("## ") # Espaço para o título das abas
 
+            def render_visao_geral():
                 st.markdown('<div class="visao-geral-content">', unsafe_allow_html=True)
                 render_metricas_gerais(df_comercial)
                 st.markdown("---") # Separador visual
                 render_funil_comercial(df_comercial)
                 st.markdown('</div>', unsafe_allow_html=True)
-            
-            with tab_analise_resp:
-                # Se este tab está ativo, atualize o estado e URL
-                if st.session_state.get('current_commercial_sub_page_display') != "Análise por Responsável":
-                    st.session_state.current_commercial_sub_page_display = "Análise por Responsável"
-                    current_active_tab_url_key = SUB_PAGE_STATE_TO_URL_MAP.get("Análise por Responsável")
-
-                render_analise_responsaveis(df_comercial)
 
-            with tab_detalhes:
-                # Se este tab está ativo, atualize o estado e URL
-                if st.session_state.get('current_commercial_sub_page_display') != "Detalhes dos Negócios":
-                    st.session_state.current_commercial_sub_page_display = "Detalhes dos Negócios"
-                    current_active_tab_url_key = SUB_PAGE_STATE_TO_URL_MAP.get("Detalhes dos Negócios")
-
-                render_tabela_detalhada(df_comercial)
-            
-            # Atualiza o URL fora dos blocos 'with' para evitar múltiplos reruns
-            current_url_sub_page = st.query_params.get("sub_pagina")
-            if current_active_tab_url_key and current_url_sub_page != current_active_tab_url_key:
-                st.query_params.sub_pagina = current_active_tab_url_key
-                st.rerun()
-            elif not current_active_tab_url_key and "sub_pagina" in st.query_params:
-                # Remove sub_pagina se o tab atual não tiver um mapeamento URL (ex: padrao, se for o caso)
-                # ou se o usuario navegou de volta para o tab padrao que nao tem um parametro URL
-                del st.query_params["sub_pagina"]
-                st.rerun()
+            # Somente a aba ativa (sub_pagina da URL ou a última escolhida) é calculada a cada rerun
+            render_lazy_tabs([
+                LazyTab("visao_geral", SUB_PAGE_URL_MAP["visao_geral"], render_visao_geral),
+                LazyTab("analise_responsavel", SUB_PAGE_URL_MAP["analise_responsavel"],
+                        lambda: render_analise_responsaveis(df_comercial, cubo_comercial)),
+                LazyTab("detalhes_negocios", SUB_PAGE_URL_MAP["detalhes_negocios"],
+                        lambda: render_tabela_detalhada(df_comercial)),
+            ], state_key="current_commercial_sub_page")
 
         except Exception as e:
             st.error(f"Erro ao carregar dados: {str(e)}")
@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
 from datetime import date
+from src.instrumentation import timed
 
+@timed()
 def render_tabela_detalhada(df: pd.DataFrame):
     """Renderiza tabela simplificada dos negócios"""
     st.markdown("---")
@@ -0,0 +1,35 @@
+"""
+Indicador de atualização dos dados exibidos nos relatórios
+"""
+
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+import streamlit as st
+
+
+def _format_age(fetched_at: datetime) -> str:
+    seconds = max(int((datetime.now() - fetched_at).total_seconds()), 0)
+    if seconds < 60:
+        return "menos de 1 min"
+    minutes = seconds // 60
+    if minutes < 60:
+        return f"{minutes} min"
+    return f"{minutes // 60} h {minutes % 60:02d} min"
+
+
+def render_data_age(df: Optional[pd.DataFrame]) -> None:
+    """Mostra há quanto tempo os dados do DataFrame (vindos do cache compartilhado) foram buscados"""
+    if df is None or not isinstance(df, pd.DataFrame):
+        return
+
+    fetched_at = df.attrs.get('cache_fetched_at')
+    if fetched_at is None:
+        st.caption("🕒 Dados atualizados agora")
+        return
+
+    text = f"🕒 Dados atualizados há {_format_age(fetched_at)} ({fetched_at.strftime('%d/%m/%Y %H:%M')})"
+    if df.attrs.get('cache_stale'):
+        text += " · atualizando em segundo plano"
+    st.caption(text)
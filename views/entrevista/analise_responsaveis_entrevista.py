@@ -1,8 +1,12 @@
 import streamlit as st
 import pandas as pd
+from typing import Optional
 from config.funis_config import FunilConfig
+from src.deal_cube import DealCube
+from src.instrumentation import timed
 
-def render_analise_responsaveis_entrevista(df_entrevista: pd.DataFrame):
+@timed()
+def render_analise_responsaveis_entrevista(df_entrevista: pd.DataFrame, cubo: Optional[DealCube] = None):
     """
     Renderiza a análise de desempenho por responsável para o funil de entrevista.
     Exibe uma tabela com vendas recebidas, validados e aproveitamento.
@@ -19,13 +23,18 @@ def render_analise_responsaveis_entrevista(df_entrevista: pd.DataFrame):
             st.error(f"A coluna necessária '{col}' não foi encontrada nos dados.")
             return
 
-    df_filtrado = df_entrevista.dropna(subset=['ASSIGNED_BY_NAME'])
-    if df_filtrado.empty:
+    # Contagens a partir do cubo pré-agregado (já com os filtros da página); sem ele,
+    # o cubo é montado a partir do frame recebido
+    if cubo is None:
+        cubo = DealCube.build(df_entrevista)
+
+    cubo_responsaveis = cubo.without_missing('ASSIGNED_BY_NAME')
+    if len(cubo_responsaveis) == 0:
         st.warning("Não há dados de responsáveis para exibir.")
         return
 
     # --- Tabela 1: Aproveitamento por Responsável ---
-    df_analise = _criar_tabela_aproveitamento(df_filtrado)
+    df_analise = _criar_tabela_aproveitamento(cubo_responsaveis)
     st.dataframe(
         df_analise,
         use_container_width=True,
@@ -42,17 +51,16 @@ def render_analise_responsaveis_entrevista(df_entrevista: pd.DataFrame):
 
     # --- Tabela 2: Detalhamento por Etapa e Responsável ---
     st.header("Detalhamento por Etapa")
-    df_detalhe_etapa = _criar_tabela_detalhe_etapa(df_filtrado)
+    df_detalhe_etapa = _criar_tabela_detalhe_etapa(cubo_responsaveis)
     st.dataframe(df_detalhe_etapa, use_container_width=True)
 
 
-def _criar_tabela_aproveitamento(df: pd.DataFrame) -> pd.DataFrame:
+def _criar_tabela_aproveitamento(cubo: DealCube) -> pd.DataFrame:
     """Cria a tabela de resumo de aproveitamento por responsável."""
-    vendas_recebidas = df.groupby('ASSIGNED_BY_NAME').size().reset_index(name='Vendas Recebidas')
-    df_validados = df[df['STAGE_ID'] == 'C11:WON']
-    validados = df_validados.groupby('ASSIGNED_BY_NAME').size().reset_index(name='Validados')
+    vendas_recebidas = cubo.totals('ASSIGNED_BY_NAME').reset_index(name='Vendas Recebidas')
+    validados = cubo.where(STAGE_ID='C11:WON').totals('ASSIGNED_BY_NAME').reset_index(name='Validados')
 
-    df_analise = pd.merge(vendas_recebidas, validados, on='ASSIGNED_BY_NAME', how='left').fillna(0)
+    df_analise = pd.merge(vendas_recebidas, validados, on='ASSIGNED_BY_NAME', how='left').fillna({'Validados': 0})
     df_analise['Validados'] = df_analise['Validados'].astype(int)
 
     df_analise['Aproveitamento (%)'] = (df_analise['Validados'] / df_analise['Vendas Recebidas'].replace(0, pd.NA) * 100).round(2)
@@ -72,20 +80,13 @@ def _criar_tabela_aproveitamento(df: pd.DataFrame) -> pd.DataFrame:
 
     return df_analise[['Responsável', 'Vendas Recebidas', 'Validados', 'Aproveitamento (%)']]
 
-def _criar_tabela_detalhe_etapa(df: pd.DataFrame) -> pd.DataFrame:
+def _criar_tabela_detalhe_etapa(cubo: DealCube) -> pd.DataFrame:
     """Cria a tabela de detalhamento de negócios por etapa e responsável."""
     # Pivot para ter etapas nas linhas e responsáveis nas colunas
-    pivot_df = pd.pivot_table(
-        df,
-        index='STAGE_NAME',
-        columns='ASSIGNED_BY_NAME',
-        aggfunc='size',
-        fill_value=0
-    )
+    pivot_df = cubo.pivot('STAGE_NAME', 'ASSIGNED_BY_NAME')
 
     # Obter a ordem correta das etapas a partir da configuração
-    entrevista_config = FunilConfig.get_entrevista_config()
-    ordem_etapas = [stage.stage_name for stage in sorted(entrevista_config.stages, key=lambda s: s.sort_order)]
+    ordem_etapas = list(FunilConfig.get_stage_names(FunilConfig.ENTREVISTA_ID))
 
     # Reordenar o índice do pivot de acordo com a configuração
     pivot_df = pivot_df.reindex(ordem_etapas).fillna(0).astype(int)
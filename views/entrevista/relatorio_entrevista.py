@@ -9,12 +9,18 @@ import sys
 import os
 import pandas as pd
 from datetime import datetime
+from typing import Optional
 
 # Adiciona src e config ao path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'config'))
 
 from src.data_service import DataService
+from src.concurrent_fetch import fetch_concurrently
+from src.date_normalization import date_series
+from src.deal_cube import DealCube
+from src.instrumentation import timed
+from views.data_freshness import render_data_age
 from views.entrevista.analise_responsaveis_entrevista import render_analise_responsaveis_entrevista
 from views.entrevista.vendas_g7_tab import render_vendas_g7_tab, get_cached_g7_data, get_g7_deals_for_sync_check
 
@@ -114,10 +120,8 @@ def _render_sincronizacao_alerta(df_entrevista: pd.DataFrame):
             # Calcula o tempo parado (horas/dias) usando o novo campo de data
             oldest_time_str = "N/A"
             if 'UF_CRM_DEAL_ENVIADA_PROCESS' in divergencias_df.columns:
-                # Ajusta o fuso horário (-6 horas) ao converter para datetime
-                divergencias_df['FECHAMENTO_DT'] = pd.to_datetime(divergencias_df['UF_CRM_DEAL_ENVIADA_PROCESS'], errors='coerce')
-                if not divergencias_df['FECHAMENTO_DT'].isna().all():
-                    divergencias_df['FECHAMENTO_DT'] = divergencias_df['FECHAMENTO_DT'] - pd.Timedelta(hours=6)
+                # Data já normalizada (ajuste de fuso incluído) pelo G7DataService
+                divergencias_df['FECHAMENTO_DT'] = date_series(divergencias_df, 'UF_CRM_DEAL_ENVIADA_PROCESS')
                 
                 # Calcula o tempo parado para cada linha
                 now = datetime.now()
@@ -229,6 +233,17 @@ def _render_sincronizacao_jusgestante_para_g7_alerta(df_entrevista: pd.DataFrame
         st.error(f"Ocorreu um erro ao verificar a sincronização para a G7: {e}")
 
 
+def _pre_carregar(carregar):
+    """Envolve um carregamento antecipado; falhas são tratadas quando a seção usar os dados."""
+    def executar():
+        try:
+            return carregar()
+        except Exception:
+            return None
+    return executar
+
+
+@timed()
 def render_relatorio_entrevista():
     """Renderiza um relatório consolidado com a análise de desempenho, as vendas da G7 e a análise de validação."""
     st.title("Relatório de Entrevista")
@@ -239,8 +254,16 @@ def render_relatorio_entrevista():
     df_entrevista_sync = None
     with st.spinner("Verificando sincronização de dados..."):
         try:
-            # Carrega todos os dados do funil de entrevista para garantir que a sincronização seja completa
-            df_entrevista_sync = data_service.get_entrevista_data(start_date=None, end_date=None)
+            # Carrega todos os dados do funil de entrevista para garantir que a sincronização seja completa.
+            # As consultas da G7 usadas nos alertas são independentes e rodam em paralelo;
+            # os alertas depois as leem do cache.
+            resultados, _ = fetch_concurrently({
+                'entrevista': lambda: data_service.get_entrevista_data(start_date=None, end_date=None),
+                'g7_formalizacao': _pre_carregar(get_cached_g7_data),
+                'g7_sincronizacao': _pre_carregar(get_g7_deals_for_sync_check),
+            })
+            df_entrevista_sync = resultados['entrevista']
+            render_data_age(df_entrevista_sync)
         except Exception as e:
             st.error(f"Falha ao carregar dados para a verificação de sincronização: {e}")
             # O relatório continua, mas as seções de sincronização podem não aparecer.
@@ -258,59 +281,31 @@ def render_relatorio_entrevista():
 
     # --- Carregamento de Dados para Análise (com filtros) ---
     df_entrevista_analise = None
+    cubo_entrevista = None
     with st.spinner("Carregando dados da análise de desempenho..."):
         try:
             if aplicar_filtro_data_criacao:
+                # Mesma entrada do cache usada na sincronização, recortada localmente pelo
+                # período de criação: nenhuma requisição a mais
                 df_entrevista_analise = data_service.get_entrevista_data(data_criacao_inicio, data_criacao_fim)
             else:
                 # Se o filtro não for aplicado, usamos os dados já carregados para a sincronização
                 df_entrevista_analise = df_entrevista_sync
+            
+            # Cubo por responsável montado com o frame do cache, com o mesmo período de criação
+            if df_entrevista_sync is not None:
+                cubo_entrevista = data_service.get_deal_cube(df_entrevista_sync).filter(
+                    created=(data_criacao_inicio, data_criacao_fim) if aplicar_filtro_data_criacao else None
+                )
         except Exception as e:
             st.error(f"Ocorreu um erro ao carregar os dados para análise: {e}")
             st.stop()
 
-    # Força e verifica o filtro localmente (redundância segura)
     if df_entrevista_analise is not None and not df_entrevista_analise.empty:
-        if aplicar_filtro_data_criacao:
-            try:
-                # Usa dados brutos para calcular a data de criação corrigida (-6h) e filtrar por IDs
-                deals_raw, _uf_raw = data_service.get_raw_entrevista_data(None, None)
-                if isinstance(deals_raw, pd.DataFrame) and not deals_raw.empty and 'ID' in deals_raw.columns and 'DATE_CREATE' in deals_raw.columns:
-                    df_ids = deals_raw[['ID', 'DATE_CREATE']].copy()
-                    df_ids['ID'] = df_ids['ID'].astype(str).str.strip()
-                    df_ids['DATE_CREATE'] = pd.to_datetime(df_ids['DATE_CREATE'], errors='coerce')
-                    df_ids['DATE_CREATE_MINUS_6H_DATE'] = (df_ids['DATE_CREATE'] - pd.Timedelta(hours=6)).dt.date
-                    eligible_ids = set(
-                        df_ids[
-                            (df_ids['DATE_CREATE_MINUS_6H_DATE'] >= data_criacao_inicio) &
-                            (df_ids['DATE_CREATE_MINUS_6H_DATE'] <= data_criacao_fim)
-                        ]['ID'].astype(str)
-                    )
-
-                    # Filtra o DF processado pelos IDs elegíveis
-                    df_entrevista_analise['ID'] = df_entrevista_analise['ID'].astype(str).str.strip()
-                    df_entrevista_analise = df_entrevista_analise[df_entrevista_analise['ID'].isin(eligible_ids)].copy()
-                else:
-                    # Fallback: mantém o filtro pelo DATE_CREATE processado
-                    if 'DATE_CREATE' in df_entrevista_analise.columns:
-                        df_tmp = df_entrevista_analise.copy()
-                        df_tmp['DATE_CREATE'] = pd.to_datetime(df_tmp['DATE_CREATE'], errors='coerce')
-                        df_tmp_date = df_tmp['DATE_CREATE'].dt.date
-                        mask_local = (df_tmp_date >= data_criacao_inicio) & (df_tmp_date <= data_criacao_fim)
-                        df_entrevista_analise = df_entrevista_analise[mask_local].copy()
-            except Exception as _e:
-                # Em caso de falha, não quebra a página; tenta o filtro pelo processado
-                if 'DATE_CREATE' in df_entrevista_analise.columns:
-                    df_tmp = df_entrevista_analise.copy()
-                    df_tmp['DATE_CREATE'] = pd.to_datetime(df_tmp['DATE_CREATE'], errors='coerce')
-                    df_tmp_date = df_tmp['DATE_CREATE'].dt.date
-                    mask_local = (df_tmp_date >= data_criacao_inicio) & (df_tmp_date <= data_criacao_fim)
-                    df_entrevista_analise = df_entrevista_analise[mask_local].copy()
-
         # Resumo pós-filtro
         try:
-            min_dt = pd.to_datetime(df_entrevista_analise.get('DATE_CREATE'), errors='coerce').min()
-            max_dt = pd.to_datetime(df_entrevista_analise.get('DATE_CREATE'), errors='coerce').max()
+            datas_criacao = date_series(df_entrevista_analise, 'DATE_CREATE')
+            min_dt, max_dt = datas_criacao.min(), datas_criacao.max()
             st.caption(f"Registros após filtro: {len(df_entrevista_analise)} | Intervalo DATE_CREATE: {min_dt} ~ {max_dt}")
         except Exception:
             st.caption(f"Registros após filtro: {len(df_entrevista_analise)}")
@@ -331,7 +326,7 @@ def render_relatorio_entrevista():
     if df_entrevista_analise is not None and not df_entrevista_analise.empty:
         st.markdown("---")
         st.subheader("Análise de Desempenho (Funil de Entrevista)")
-        _render_analise_desempenho(df_entrevista_analise)
+        _render_analise_desempenho(df_entrevista_analise, cubo_entrevista)
 
         st.markdown("---")
         render_vendas_g7_tab()
@@ -343,9 +338,9 @@ def render_relatorio_entrevista():
         st.warning("Nenhum dado de análise para exibir com os filtros atuais.")
 
 
-def _render_analise_desempenho(df_entrevista: pd.DataFrame):
+def _render_analise_desempenho(df_entrevista: pd.DataFrame, cubo: Optional[DealCube] = None):
     """Renderiza a seção de análise de desempenho do funil de entrevista."""
-    render_analise_responsaveis_entrevista(df_entrevista)
+    render_analise_responsaveis_entrevista(df_entrevista, cubo)
 
 
 def _render_analise_validacao(df_entrevista: pd.DataFrame):
@@ -381,29 +376,20 @@ def _render_analise_validacao(df_entrevista: pd.DataFrame):
         key="entrevista_aplicar_filtro_validacao"
     )
 
-    df_validados = df_entrevista[df_entrevista['STAGE_ID'] == 'C11:WON'].copy()
-
+    # O período de validação é recortado primeiro, pelo índice de datas do frame em cache
     if aplicar_filtro_validacao:
-        df_filtrado_val = df_validados.dropna(subset=['UF_CRM_VALIDADO_DATA'])
-        if not df_filtrado_val.empty:
-            # A data já vem ajustada do data_service. Apenas garanta que é datetime.
-            df_filtrado_val['UF_CRM_VALIDADO_DATA'] = pd.to_datetime(df_filtrado_val['UF_CRM_VALIDADO_DATA'], errors='coerce')
-            
-            # Converte as datas do filtro para datetime para uma comparação correta
-            start_date_dt = datetime.combine(data_validacao_inicio, datetime.min.time())
-            end_date_dt = datetime.combine(data_validacao_fim, datetime.max.time())
+        df_entrevista = DataService.filter_by_date_range(
+            df_entrevista, 'UF_CRM_VALIDADO_DATA', data_validacao_inicio, data_validacao_fim
+        )
 
-            df_validados = df_filtrado_val[
-                (df_filtrado_val['UF_CRM_VALIDADO_DATA'] >= start_date_dt) &
-                (df_filtrado_val['UF_CRM_VALIDADO_DATA'] <= end_date_dt)
-            ]
+    df_validados = df_entrevista[df_entrevista['STAGE_ID'] == 'C11:WON'].copy()
 
     if df_validados.empty:
         st.info("Nenhum cliente convertido (validado) encontrado com os filtros selecionados.")
     else:
         st.markdown("##### Total de Clientes Validados por Responsável")
         
-        tabela_validados = df_validados.groupby('ASSIGNED_BY_NAME').agg(
+        tabela_validados = df_validados.groupby('ASSIGNED_BY_NAME', observed=True).agg(
             TOTAL_VALIDADOS=('ID', 'count')
         ).reset_index().rename(columns={'ASSIGNED_BY_NAME': 'Responsável'})
 
@@ -2,7 +2,9 @@ import streamlit as st
 import locale
 from decimal import Decimal
 from src.google_sheets_service import GoogleSheetsService, carregar_dados
-from src.finance_analyzer import analyse_data, clean_currency, format_parcela_display, analyze_parcelas
+from views.data_freshness import render_data_age
+from src.finance_analyzer import summarize_analysed_data, clean_currency, format_parcela_display, analyze_parcelas
+from src.instrumentation import timed
 import pandas as pd
 import plotly.express as px
 
@@ -72,6 +74,7 @@ def exibir_parcelas(parcelas):
         return "\n".join(parcelas_analisadas)
     return str(parcelas)
 
+@timed()
 def render_relatorio_financeiro():
     """Renderiza a página completa do relatório financeiro."""
     st.title("Relatório Financeiro")
@@ -90,9 +93,10 @@ def render_relatorio_financeiro():
         if df is None or df.empty:
             st.error("Não foi possível carregar os dados. Verifique a conexão com o Google Sheets.")
             return
+        render_data_age(df)
             
-        # Análise dos dados
-        resultado = analyse_data(df)
+        # Totais (a análise das parcelas já vem feita do cache, por aba da planilha)
+        resultado = summarize_analysed_data(df)
         df = resultado["dataframe"]  # Usar o DataFrame processado
         
         # Exibir métricas globais
@@ -0,0 +1,76 @@
+"""
+Abas com renderização sob demanda para os relatórios
+st.tabs executa o corpo de todas as abas a cada rerun. Aqui a aba ativa vem do parâmetro
+sub_pagina da URL (ou da sessão) e somente a função dela é executada
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Sequence
+
+import streamlit as st
+
+
+SUB_PAGE_PARAM = "sub_pagina"
+
+
+@dataclass(frozen=True)
+class LazyTab:
+    """Aba do relatório: chave usada em sub_pagina, rótulo exibido e função que desenha o conteúdo"""
+    url_key: str
+    label: str
+    render: Callable[[], None]
+
+
+def _active_state_key(state_key: str) -> str:
+    return f"{state_key}_ativa"
+
+
+def _on_tab_change(state_key: str, default_url_key: str) -> None:
+    """Guarda a aba escolhida na sessão e na URL (a aba padrão fica sem sub_pagina)"""
+    selected = st.session_state.get(state_key)
+    if selected is None:
+        # Clique na aba já selecionada desmarca o controle: mantém a aba ativa
+        st.session_state[state_key] = st.session_state[_active_state_key(state_key)]
+        return
+
+    st.session_state[_active_state_key(state_key)] = selected
+    if selected == default_url_key:
+        if SUB_PAGE_PARAM in st.query_params:
+            del st.query_params[SUB_PAGE_PARAM]
+    else:
+        st.query_params[SUB_PAGE_PARAM] = selected
+
+
+def render_lazy_tabs(tabs: Sequence[LazyTab], state_key: str) -> str:
+    """
+    Desenha o seletor de abas e executa apenas a função da aba ativa.
+    A aba ativa é a de sub_pagina, quando válida para este relatório; senão a última escolhida
+    na sessão; senão a primeira. Retorna a url_key da aba exibida
+    """
+    tabs_by_key = {tab.url_key: tab for tab in tabs}
+    default_url_key = tabs[0].url_key
+    active_key = _active_state_key(state_key)
+
+    url_sub_page = st.query_params.get(SUB_PAGE_PARAM)
+    if url_sub_page in tabs_by_key and url_sub_page != st.session_state.get(active_key):
+        # URL aberta diretamente (ou alterada): a aba dela prevalece sobre a sessão
+        st.session_state[active_key] = url_sub_page
+        st.session_state[state_key] = url_sub_page
+    elif st.session_state.get(active_key) not in tabs_by_key:
+        st.session_state[active_key] = default_url_key
+    if st.session_state.get(state_key) not in tabs_by_key:
+        st.session_state[state_key] = st.session_state[active_key]
+
+    st.segmented_control(
+        "Seção do relatório",
+        options=list(tabs_by_key),
+        format_func=lambda url_key: tabs_by_key[url_key].label,
+        key=state_key,
+        on_change=_on_tab_change,
+        args=(state_key, default_url_key),
+        label_visibility="collapsed"
+    )
+
+    active_url_key = st.session_state[active_key]
+    tabs_by_key[active_url_key].render()
+    return active_url_key
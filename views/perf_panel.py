@@ -0,0 +1,31 @@
+"""
+Painel de tempo de execução da página (visível com ?perf=1 na URL)
+"""
+
+import pandas as pd
+import streamlit as st
+
+from src.instrumentation import Trace
+
+
+def render_timing_panel(trace: Trace) -> None:
+    """Mostra os spans do trace: etapa (recuada pela profundidade), tempo, linhas e tamanho"""
+    spans = trace.spans
+    with st.expander(f"⏱️ Tempo da página: {trace.seconds or trace.elapsed():.2f}s ({len(spans)} etapas)", expanded=True):
+        if not spans:
+            st.caption("Nenhuma etapa instrumentada nesta execução.")
+            return
+
+        st.dataframe(
+            pd.DataFrame([{
+                'Etapa': " " * span.depth + span.name,
+                'Início (ms)': round(span.offset_seconds * 1000, 1),
+                'Tempo (ms)': round(span.seconds * 1000, 1),
+                'Linhas': span.rows,
+                'MB': round(span.bytes / 1024 / 1024, 2) if span.bytes is not None else None,
+                'Thread': span.thread_name,
+            } for span in spans]),
+            use_container_width=True,
+            hide_index=True
+        )
+        st.caption("Os mesmos registros vão para o log (uma linha JSON por etapa). Remova ?perf=1 da URL para desativar.")